@@ -0,0 +1,15 @@
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+
+@pytest.fixture(scope="session")
+def luminar():
+    """luminar1.3.py loaded as a module; the dot in its name keeps it from being imported directly."""
+    spec = importlib.util.spec_from_file_location("luminar", Path(__file__).with_name("luminar1.3.py"))
+    module = importlib.util.module_from_spec(spec)
+    sys.modules["luminar"] = module
+    spec.loader.exec_module(module)
+    return module
@@ -1,17 +1,52 @@
-import tkinter as tk
-from tkinter import ttk
-from tkinter import simpledialog, messagebox
+import time
+_MODULE_START = time.perf_counter()
+
+import importlib
 import threading
-import cv2
-from PIL import Image, ImageEnhance, ImageOps
-import numpy as np
 import subprocess
-import time
 import json
+import re
+import csv
+import tempfile
+import queue
+import sqlite3
+import functools
+import heapq
+import math
+import bisect
+import itertools
+from collections import deque, namedtuple
+from collections.abc import MutableMapping
 import os
-from datetime import datetime
+import shutil
+import stat
+from datetime import datetime, timedelta
 from pathlib import Path
-import tkinter.font as tkFont
+
+class _LazyModule:
+    """Stand-in for a module that is imported on first attribute access."""
+
+    def __init__(self, name):
+        self._name = name
+
+    def __getattr__(self, attr):
+        module = importlib.import_module(self._name)
+        # Later lookups find the module's attributes without coming back here
+        self.__dict__.update(module.__dict__)
+        return getattr(module, attr)
+
+# GUI and vision modules load on first use, so the headless daemon can start
+# without importing tkinter, OpenCV or NumPy
+tk = _LazyModule("tkinter")
+ttk = _LazyModule("tkinter.ttk")
+simpledialog = _LazyModule("tkinter.simpledialog")
+messagebox = _LazyModule("tkinter.messagebox")
+filedialog = _LazyModule("tkinter.filedialog")
+tkFont = _LazyModule("tkinter.font")
+cv2 = _LazyModule("cv2")
+np = _LazyModule("numpy")
+Image = _LazyModule("PIL.Image")
+ImageEnhance = _LazyModule("PIL.ImageEnhance")
 
 # Define paths for assets and fonts
 OUTPUT_PATH = Path(__file__).parent
@@ -19,14 +54,256 @@ ITALIANAFONT_PATH = OUTPUT_PATH / Path(r"Italiana\Italiana-Regular.ttf")
 ISTOKREGFONT_PATH = OUTPUT_PATH / Path(r"Istok_Web\IstokWeb-Regular.ttf")
 ISTOKBOLDFONT_PATH = OUTPUT_PATH / Path(r"Istok_Web\IstokWeb-Bold.ttf")
 
-# Global variable for treeview
+# Fonts used by the window; each falls back to Arial if the preferred font fails
+FONT_SPECS = {
+    'title': (("Italiana", 70), ("Arial", 20)),
+    'regular': (("Istok Web", 17), ("Arial", 20)),
+    'bold': (("Istok Web", 20, "bold"), ("Arial", 20, "bold")),
+}
+_fonts = {}
+
+def get_font(name):
+    """Return the cached tkinter font registered under name in FONT_SPECS."""
+    font = _fonts.get(name)
+    if font is None:
+        for family, size, *weight in FONT_SPECS[name]:
+            try:
+                font = tkFont.Font(family=family, size=size, weight=weight[0] if weight else "normal")
+                break
+            except Exception:
+                continue
+        _fonts[name] = font
+    return font
+
+# Global variables for treeview and its incremental view model
 treeview = None
+history_view = None
+
+PROFILE_PATH = 'profiles.json'
+
+# Persistent session log (SessionStore) and its rollups (UsageAggregates),
+# opened at startup by open_usage_logs
+USAGE_DB_PATH = 'usage_history.db'
+SESSION_HEARTBEAT = 60.0  # Seconds between "still running" marks on the open session
+usage_logs = None
+usage_stats = None
+
+class Histogram:
+    """Latency histogram in a fixed number of exponential buckets (seconds)."""
+
+    # 50 us doubling up to ~26 s; the last bucket catches everything slower
+    BOUNDS = tuple(0.00005 * 2 ** i for i in range(20))
+
+    def __init__(self):
+        self.buckets = [0] * (len(self.BOUNDS) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.buckets[bisect.bisect_left(self.BOUNDS, value)] += 1
+        self.count += 1
+        self.sum += value
+        if value > self.max:
+            self.max = value
+
+    def quantile(self, q):
+        """Upper bound of the bucket holding the q-th observation (0 <= q <= 1)."""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, n in zip(self.BOUNDS, self.buckets):
+            seen += n
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def summary(self):
+        return {'count': self.count, 'sum': self.sum, 'mean': self.sum / self.count if self.count else 0.0,
+                'p50': self.quantile(0.5), 'p90': self.quantile(0.9), 'p99': self.quantile(0.99), 'max': self.max,
+                'buckets': list(self.buckets)}
+
+class _Timer:
+    __slots__ = ("metrics", "name", "start")
+
+    def __init__(self, metrics, name):
+        self.metrics = metrics
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        self.metrics.observe(self.name, time.perf_counter() - self.start)
+
+class _NullTimer:
+    __slots__ = ()
+
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+_NULL_TIMER = _NullTimer()
+
+class Metrics:
+    """Counters, latency histograms and gauges describing what Luminar spends time on.
+
+    Disabled by default: timer() then hands out a shared no-op context manager
+    and incr()/observe() return after one attribute check. Gauges are callables
+    sampled only when a snapshot is taken. Memory is fixed per metric name.
+    """
+
+    def __init__(self, enabled=False):
+        self.enabled = enabled
+        self.started_at = time.time()
+        self._histograms = {}
+        self._counters = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+        self._dump_stop = None
+
+    def timer(self, name):
+        """Context manager recording the duration of its block under name."""
+        return _Timer(self, name) if self.enabled else _NULL_TIMER
+
+    def observe(self, name, seconds):
+        if not self.enabled:
+            return
+        with self._lock:
+            histogram = self._histograms.get(name)
+            if histogram is None:
+                histogram = self._histograms[name] = Histogram()
+            histogram.observe(seconds)
 
-# List to store session logs in-memory
-usage_logs = []
+    def incr(self, name, amount=1):
+        if not self.enabled:
+            return
+        with self._lock:
+            self._counters[name] = self._counters.get(name, 0) + amount
+
+    def gauge(self, name, func):
+        """Register func() as the current value of name; replaces an earlier gauge."""
+        self._gauges[name] = func
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+            self.started_at = time.time()
+
+    def snapshot(self):
+        with self._lock:
+            histograms = {name: h.summary() for name, h in self._histograms.items()}
+            counters = dict(self._counters)
+        gauges = {'process_cpu_seconds': time.process_time(), 'threads': threading.active_count()}
+        for name, func in list(self._gauges.items()):
+            try:
+                gauges[name] = float(func())
+            except Exception:
+                continue
+        return {'enabled': self.enabled, 'since': self.started_at, 'counters': counters,
+                'timers': histograms, 'gauges': gauges}
+
+    def dump(self, path):
+        write_metrics(path, self.snapshot())
+
+    def dump_every(self, path, interval=10.0):
+        """Rewrite the dump file every interval seconds from a background thread."""
+        self.stop_dumping()
+        stop = self._dump_stop = threading.Event()
+
+        def run():
+            while not stop.wait(interval):
+                try:
+                    self.dump(path)
+                except OSError as e:
+                    print(f"Failed to write metrics to {path}: {e}")
+
+        threading.Thread(target=run, name="metrics-dump", daemon=True).start()
+
+    def stop_dumping(self):
+        if self._dump_stop is not None:
+            self._dump_stop.set()
+            self._dump_stop = None
+
+def _metric_name(name):
+    return "luminar_" + "".join(c if c.isalnum() else "_" for c in name).lower()
+
+def metrics_to_prometheus(snapshot):
+    """Render a Metrics snapshot in the Prometheus text exposition format."""
+    lines = []
+    for name, timer in sorted(snapshot['timers'].items()):
+        metric = _metric_name(name) + "_seconds"
+        lines.append(f"# TYPE {metric} histogram")
+        for bound, cumulative in zip(Histogram.BOUNDS, itertools.accumulate(timer['buckets'])):
+            lines.append(f'{metric}_bucket{{le="{bound:g}"}} {cumulative}')
+        lines.append(f'{metric}_bucket{{le="+Inf"}} {timer["count"]}')
+        lines.append(f"{metric}_sum {timer['sum']}")
+        lines.append(f"{metric}_count {timer['count']}")
+    for name, value in sorted(snapshot['counters'].items()):
+        metric = _metric_name(name) + "_total"
+        lines.append(f"# TYPE {metric} counter")
+        lines.append(f"{metric} {value}")
+    for name, value in sorted(snapshot['gauges'].items()):
+        metric = _metric_name(name)
+        lines.append(f"# TYPE {metric} gauge")
+        lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+def write_metrics(path, snapshot):
+    """Write a snapshot atomically; JSON for *.json paths, Prometheus text otherwise."""
+    if str(path).endswith(".json"):
+        text = json.dumps(snapshot, indent=2)
+    else:
+        text = metrics_to_prometheus(snapshot)
+    directory = os.path.dirname(os.path.abspath(path))
+    fd, tmp_path = tempfile.mkstemp(dir=directory, prefix=".metrics-", suffix=".tmp")
+    try:
+        with os.fdopen(fd, "w") as f:
+            f.write(text)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+# Process-wide instrumentation; enabled with --metrics or from the settings window
+metrics = Metrics()
+
+# Gradient images already converted for Tk, keyed by (colors, width, height)
+_gradient_images = {}
+
+@functools.lru_cache(maxsize=8)
+def gradient_pixels(colors, width, height):
+    """RGB array (height x width x 3) of a horizontal gradient through the color stops."""
+    sections = len(colors) - 1
+    section_width = width // sections
+    stops = np.array(colors, dtype=np.float64)
+
+    # Color stop pairs and blend ratio for every pixel column
+    ratio = np.tile(np.linspace(0.0, 1.0, section_width, endpoint=False), sections)
+    section = np.repeat(np.arange(sections), section_width)
+    row = np.empty((width, 3), np.uint8)
+    used = sections * section_width
+    row[:used] = (stops[section] * (1 - ratio[:, None]) + stops[section + 1] * ratio[:, None]).astype(np.uint8)
+    row[used:] = stops[-1]  # Columns left over by the integer division
+    return np.ascontiguousarray(np.broadcast_to(row, (height, width, 3)))
 
 def create_horizontal_gradient(canvas, colors, width, height):
-    """Creates a horizontal gradient with the given list of colors on the canvas."""
+    """Draws a horizontal gradient with the given list of colors as a single canvas image."""
+    key = (tuple(tuple(color) for color in colors), width, height)
+    image = _gradient_images.get(key)
+    if image is None:
+        header = f"P6 {width} {height} 255\n".encode()
+        image = tk.PhotoImage(data=header + gradient_pixels(*key).tobytes(), format="PPM")
+        _gradient_images[key] = image
+    canvas.gradient_image = image  # Tk does not keep its own reference
+    return canvas.create_image(0, 0, anchor="nw", image=image)
+
+def create_horizontal_gradient_lines(canvas, colors, width, height):
+    """Previous gradient renderer with one line item per column; kept for benchmark_gradient."""
     sections = len(colors) - 1
     section_width = width // sections
 
@@ -41,232 +318,3792 @@ def create_horizontal_gradient(canvas, colors, width, height):
             color = f"#{r:02x}{g:02x}{b:02x}"
             canvas.create_line(i * section_width + x, 0, i * section_width + x, height, fill=color)
 
-def rgb_to_tuple(hex_color):
-    """Convert a hex color to an RGB tuple."""
-    hex_color = hex_color.lstrip('#')
-    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+def benchmark_gradient(repeats=5, width=1000, height=700):
+    """Print the time to draw the startup gradient with the line and image renderers."""
+    colors = [rgb_to_tuple("#89CFF0"), rgb_to_tuple("#96D8B9"), rgb_to_tuple("#C9A0DC")]
+    root = tk.Tk()
+    root.withdraw()
+    for name, render in (("lines", create_horizontal_gradient_lines), ("image", create_horizontal_gradient)):
+        timings = []
+        for i in range(repeats):
+            if render is create_horizontal_gradient and i == 0:
+                gradient_pixels.cache_clear()
+                _gradient_images.clear()
+            canvas = tk.Canvas(root, width=width, height=height)
+            start = time.perf_counter()
+            render(canvas, colors, width, height)
+            root.update_idletasks()
+            timings.append(time.perf_counter() - start)
+            canvas.destroy()
+        print(f"{name:>6}: first {timings[0] * 1000:.1f} ms, "
+              f"median {sorted(timings)[len(timings) // 2] * 1000:.1f} ms over {repeats} runs")
+    root.destroy()
+
+def rgb_to_tuple(hex_color):
+    """Convert a hex color to an RGB tuple."""
+    hex_color = hex_color.lstrip('#')
+    return tuple(int(hex_color[i:i+2], 16) for i in (0, 2, 4))
+
+def center_window(window):
+    """Center the window on the screen."""
+    window.update_idletasks()
+    screen_width = window.winfo_screenwidth()
+    screen_height = window.winfo_screenheight()
+    window_width = window.winfo_width()
+    window_height = window.winfo_height()
+
+    x = (screen_width // 2) - (window_width // 2)
+    y = (screen_height // 2) - (window_height // 2)
+    window.geometry(f'{window_width}x{window_height}+{x}+{y}')
+
+def rounded_rectangle(canvas, x1, y1, x2, y2, radius=25, **kwargs):
+    """Draws a rounded rectangle with the given radius."""
+    points = [x1 + radius, y1,
+              x1 + radius, y1,
+              x2 - radius, y1,
+              x2 - radius, y1,
+              x2, y1,
+              x2, y1 + radius,
+              x2, y1 + radius,
+              x2, y2 - radius,
+              x2, y2 - radius,
+              x2, y2,
+              x2 - radius, y2,
+              x2 - radius, y2,
+              x1 + radius, y2,
+              x1 + radius, y2,
+              x1, y2,
+              x1, y2 - radius,
+              x1, y2 - radius,
+              x1, y1 + radius,
+              x1, y1 + radius,
+              x1, y1]
+    return canvas.create_polygon(points, smooth=True, **kwargs)
+
+def log_session_start(profile=None):
+    """Logs the start of a session with the current timestamp."""
+    # Only the latest session may be open; close a dangling one first
+    log_session_stop()
+    usage_logs.start_session(datetime.now(), profile)
+
+def log_session_stop():
+    """Logs the stop time of the latest session."""
+    if usage_logs and usage_logs[-1]['end_time'] is None:
+        # Load the rollups first; a first-time backfill would otherwise count this session too
+        stats = load_usage_stats()
+        session = usage_logs.stop_session(datetime.now())
+        if stats:
+            stats.add_session(session['start_time'], session['end_time'], session['profile'])
+        if history_view:
+            history_view.mark_dirty(len(usage_logs) - 1)
+
+def log_session_heartbeat():
+    """Scheduler job marking the open session as still running; ends with the session."""
+    if usage_logs and usage_logs[-1]['end_time'] is None:
+        usage_logs.touch(datetime.now())
+        return SESSION_HEARTBEAT
+    return None
+
+def seconds_until_next(hours, now=None):
+    """Seconds from now until the next full hour in the given list (e.g. 8 and 18)."""
+    now = now or datetime.now()
+    today = [now.replace(hour=h, minute=0, second=0, microsecond=0) for h in hours]
+    upcoming = [t for t in today if t > now] or [t + timedelta(days=1) for t in today]
+    return (min(upcoming) - now).total_seconds()
+
+def calculate_duration(start_time, end_time):
+    """Calculates the duration between start and stop times."""
+    duration = end_time - start_time
+    hours, remainder = divmod(duration.total_seconds(), 3600)
+    minutes, _ = divmod(remainder, 60)
+    return f"{int(hours)} hours {int(minutes)} minutes"
+
+def update_treeview():
+    """Update the Treeview with new session data."""
+    if history_view:
+        history_view.refresh()
+
+class UsageHistoryView:
+    """Incremental, virtualized view model for the usage history Treeview.
+
+    Completed sessions are the log entries before the (at most one) open
+    session at the end. Only the rows in view plus a small buffer exist as
+    Treeview items; scrolling reassigns their values instead of inserting
+    rows. Log changes mark entries dirty so refresh() only touches the items
+    whose content changed, and formatted rows are cached per entry.
+    """
+
+    def __init__(self, tree, logs, scrollbar=None, buffer=4):
+        self.tree = tree
+        self.logs = logs
+        self.scrollbar = scrollbar
+        self.buffer = buffer
+        self.visible = int(tree.cget('height'))
+        self.offset = 0
+        self.follow = True  # Keep the newest session in view
+        self._items = []  # Treeview item ids, top to bottom
+        self._shown = []  # Log index displayed by each item
+        self._rows = {}
+        self._dirty = set()
+        tree.bind("<Configure>", self._on_configure)
+        for sequence in ("<MouseWheel>", "<Button-4>", "<Button-5>"):
+            tree.bind(sequence, self._on_wheel)
+
+    def total(self):
+        if self.logs and self.logs[-1]['end_time'] is None:
+            return len(self.logs) - 1
+        return len(self.logs)
+
+    def mark_dirty(self, index):
+        self._dirty.add(index)
+        self._rows.pop(index, None)
+
+    def row(self, index):
+        values = self._rows.get(index)
+        if values is None:
+            log = self.logs[index]
+            values = (log['start_time'].strftime('%m/%d/%Y'),
+                      calculate_duration(log['start_time'], log['end_time']))
+            self._rows[index] = values
+        return values
+
+    def refresh(self):
+        total = self.total()
+        last_page = max(total - self.visible, 0)
+        self.offset = last_page if self.follow else min(self.offset, last_page)
+        wanted = range(self.offset, min(self.offset + self.visible + self.buffer, total))
+
+        for position, index in enumerate(wanted):
+            if position < len(self._items):
+                if self._shown[position] != index or index in self._dirty:
+                    self.tree.item(self._items[position], values=self.row(index))
+                    self._shown[position] = index
+            else:
+                self._items.append(self.tree.insert('', 'end', values=self.row(index)))
+                self._shown.append(index)
+        if len(self._items) > len(wanted):
+            self.tree.delete(*self._items[len(wanted):])
+            del self._items[len(wanted):], self._shown[len(wanted):]
+        self._dirty.clear()
+
+        if self.scrollbar:
+            if total:
+                self.scrollbar.set(self.offset / total, min((self.offset + self.visible) / total, 1.0))
+            else:
+                self.scrollbar.set(0.0, 1.0)
+
+    def scroll_to(self, offset):
+        last_page = max(self.total() - self.visible, 0)
+        self.offset = max(min(int(offset), last_page), 0)
+        self.follow = self.offset == last_page
+        self.refresh()
+
+    def yview(self, *args):
+        """Scrollbar command; moves the window over the whole history."""
+        if args[0] == 'moveto':
+            self.scroll_to(float(args[1]) * self.total())
+        elif args[0] == 'scroll':
+            step = self.visible if args[2] == 'pages' else 1
+            self.scroll_to(self.offset + int(args[1]) * step)
+
+    def _on_wheel(self, event):
+        if event.num == 4 or event.delta > 0:
+            self.scroll_to(self.offset - 1)
+        else:
+            self.scroll_to(self.offset + 1)
+        return "break"
+
+    def _on_configure(self, event):
+        row_height = ttk.Style().lookup("Treeview", "rowheight") or 20
+        visible = max((event.height - 25) // int(row_height), 1)
+        if visible != self.visible:
+            self.visible = visible
+            self.refresh()
+
+def on_start(profile=None):
+    """Callback when the user starts the session."""
+    log_session_start(profile)
+    print("Session started!")
+    update_treeview()
+
+def on_stop():
+    """Callback when the user stops the session and updates the Treeview."""
+    log_session_stop()
+    print("Session stopped!")
+    update_treeview()
+
+def bind_button(canvas, button_rect, button_text, hover_color, original_color, on_click_action):
+    """Bind hover and click events to both button rectangle and button text."""
+    def on_enter_combined(event):
+        canvas.master.config(cursor="hand2")
+        canvas.itemconfig(button_rect, fill=hover_color)
+    
+    def on_leave_combined(event):
+        canvas.master.config(cursor="")
+        canvas.itemconfig(button_rect, fill=original_color)
+
+    for item in (button_rect, button_text):
+        canvas.tag_bind(item, "<Enter>", on_enter_combined)
+        canvas.tag_bind(item, "<Leave>", on_leave_combined)
+        canvas.tag_bind(item, "<Button-1>", lambda event: on_click_action())
+
+def create_treeview(canvas, parent_frame):
+    """Create and configure the Treeview widget."""
+    global treeview, history_view
+
+    treeview_frame = tk.Frame(parent_frame, bg='#ADD8E6')
+    treeview_frame.pack(expand=True, fill="both") 
+
+    treeview = ttk.Treeview(treeview_frame, columns=("date", "duration"), show='headings', height=3)
+
+    treeview.heading("date", text="DATE")
+    treeview.heading("duration", text="DURATION")
+
+    treeview.column("date", width=250, anchor="center")
+    treeview.column("duration", width=250, anchor="center")
+
+    scrollbar = ttk.Scrollbar(treeview_frame, orient="vertical")
+    scrollbar.pack(side="right", fill="y", pady=10)
+    treeview.pack(expand=True, fill="both", padx=10, pady=10)
+
+    history_view = UsageHistoryView(treeview, usage_logs, scrollbar)
+    scrollbar.configure(command=history_view.yview)
+    history_view.refresh()
+
+    canvas.create_window(100, 400, anchor="nw", window=treeview_frame, width=800, height=200)
+
+class SessionStore:
+    """Append-only session history in SQLite (WAL mode), indexed on start time.
+
+    The store behaves like the old in-memory list of session dicts: len() and
+    indexing work, but rows are fetched by id on demand, so opening it does not
+    read the history. Sessions get contiguous ids, and index i is id i + 1.
+    Writes are queued to a background thread that commits them in batches;
+    a flush() cuts the batch window short instead of waiting it out. touch()
+    records when the open session was last seen running, so a session left
+    open by a crash can be closed then rather than when Luminar next starts.
+    """
+
+    PAGE_SIZE = 64
+
+    def __init__(self, path, batch_window=0.5):
+        self.path = path
+        self.batch_window = batch_window
+        self._writes = queue.Queue()
+        self._flush_requested = threading.Event()
+        self._recent = {}  # Rows written by this process, visible before commit
+        self._pages = {}
+        writer = sqlite3.connect(path, check_same_thread=False)
+        writer.execute("PRAGMA journal_mode=WAL")
+        writer.execute("PRAGMA synchronous=NORMAL")
+        with writer:
+            writer.execute("CREATE TABLE IF NOT EXISTS sessions (id INTEGER PRIMARY KEY, "
+                           "start_time REAL NOT NULL, end_time REAL, profile TEXT, last_seen REAL)")
+            if "last_seen" not in (row[1] for row in writer.execute("PRAGMA table_info(sessions)")):
+                writer.execute("ALTER TABLE sessions ADD COLUMN last_seen REAL")
+            writer.execute("CREATE INDEX IF NOT EXISTS sessions_start ON sessions(start_time)")
+            writer.execute("CREATE INDEX IF NOT EXISTS sessions_profile ON sessions(profile, start_time)")
+        self._count = writer.execute("SELECT COALESCE(MAX(id), 0) FROM sessions").fetchone()[0]
+        self._reader = sqlite3.connect(path, check_same_thread=False)
+        self._read_lock = threading.Lock()
+        threading.Thread(target=self._write_loop, args=(writer,), name="session-writer", daemon=True).start()
+
+    @staticmethod
+    def _row(start_time, end_time, profile):
+        return {'start_time': datetime.fromtimestamp(start_time),
+                'end_time': datetime.fromtimestamp(end_time) if end_time is not None else None,
+                'profile': profile}
+
+    def __len__(self):
+        return self._count
+
+    def __getitem__(self, index):
+        if index < 0:
+            index += self._count
+        if not 0 <= index < self._count:
+            raise IndexError("session index out of range")
+        session_id = index + 1
+        if session_id in self._recent:
+            return self._recent[session_id]
+        page = self._pages.get(index // self.PAGE_SIZE)
+        if page is None:
+            first = index // self.PAGE_SIZE * self.PAGE_SIZE + 1
+            page = dict((row[0], self._row(*row[1:])) for row in self._query(
+                "SELECT id, start_time, end_time, profile FROM sessions WHERE id BETWEEN ? AND ?",
+                (first, first + self.PAGE_SIZE - 1)))
+            if len(self._pages) > 32:
+                self._pages.clear()
+            self._pages[index // self.PAGE_SIZE] = page
+        return page[session_id]
+
+    def _query(self, sql, params=()):
+        with self._read_lock:
+            return self._reader.execute(sql, params).fetchall()
+
+    def start_session(self, start_time, profile=None):
+        self._count += 1
+        self._recent[self._count] = {'start_time': start_time, 'end_time': None, 'profile': profile}
+        self._writes.put(("INSERT INTO sessions (id, start_time, profile) VALUES (?, ?, ?)",
+                          (self._count, start_time.timestamp(), profile)))
+        return self._count - 1
+
+    def stop_session(self, end_time):
+        """Close the latest session."""
+        session = dict(self[-1], end_time=end_time)
+        self._recent[self._count] = session
+        self._writes.put(("UPDATE sessions SET end_time = ? WHERE id = ?", (end_time.timestamp(), self._count)))
+        return session
+
+    def touch(self, when):
+        """Record that the latest session was still running at when."""
+        self._writes.put(("UPDATE sessions SET last_seen = ? WHERE id = ? AND end_time IS NULL",
+                          (when.timestamp(), self._count)))
+
+    def close_orphan(self):
+        """Close a session left open by an earlier run when it was last seen; returns it, or None."""
+        if not self._count or self[-1]['end_time'] is not None:
+            return None
+        self.flush()
+        start_time, last_seen = self._query("SELECT start_time, last_seen FROM sessions WHERE id = ?",
+                                            (self._count,))[0]
+        return self.stop_session(datetime.fromtimestamp(last_seen if last_seen is not None else start_time))
+
+    def execute_later(self, sql, params=()):
+        """Queue a statement for the writer thread's next batch."""
+        self._writes.put((sql, params))
+
+    def between(self, start, end):
+        """Sessions that started in [start, end), using the start-time index."""
+        self.flush()
+        return [self._row(*row) for row in self._query(
+            "SELECT start_time, end_time, profile FROM sessions WHERE start_time >= ? AND start_time < ? "
+            "ORDER BY start_time", (start.timestamp(), end.timestamp()))]
+
+    def today(self):
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        return self.between(midnight, midnight + timedelta(days=1))
+
+    def this_week(self):
+        midnight = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+        monday = midnight - timedelta(days=midnight.weekday())
+        return self.between(monday, monday + timedelta(days=7))
+
+    def profile_total(self, profile, start=None, end=None):
+        """Seconds of completed sessions for a profile, optionally within a start-time range."""
+        self.flush()
+        start = start.timestamp() if start else 0.0
+        end = end.timestamp() if end else float("inf")
+        return self._query("SELECT COALESCE(SUM(end_time - start_time), 0) FROM sessions "
+                           "WHERE profile IS ? AND start_time >= ? AND start_time < ? AND end_time IS NOT NULL",
+                           (profile, start, end))[0][0]
+
+    def _write_loop(self, connection):
+        while True:
+            batch = [self._writes.get()]
+            metrics.incr("wakeups_session_store")
+            # Collect whatever else arrives shortly after into the same transaction
+            self._flush_requested.wait(self.batch_window)
+            self._flush_requested.clear()
+            while True:
+                try:
+                    batch.append(self._writes.get_nowait())
+                except queue.Empty:
+                    break
+            closing = None in batch
+            try:
+                with connection:
+                    for statement in batch:
+                        if statement is not None:
+                            connection.execute(*statement)
+            except sqlite3.Error as e:
+                print(f"Failed to save session history: {e}")
+            for _ in batch:
+                self._writes.task_done()
+            if closing:
+                connection.close()
+                return
+
+    def flush(self):
+        """Block until every queued write has been committed."""
+        self._flush_requested.set()
+        self._writes.join()
+
+    def close(self):
+        self._writes.put(None)
+        self.flush()
+        self._reader.close()
+
+class UsageAggregates:
+    """Rollups of completed sessions, updated as sessions stop.
+
+    Keeps running totals, per-day seconds and session counts (NumPy arrays
+    indexed by day), per-profile totals and a histogram of session lengths.
+    The rollups are persisted in their own tables next to the sessions, so
+    loading them costs one row per day rather than a scan of the history.
+    """
+
+    # Session length histogram bin edges, in minutes
+    LENGTH_BINS = (0, 5, 15, 30, 60, 120, 240, 480)
+
+    def __init__(self, store):
+        self.store = store
+        self.length_bins = np.array(self.LENGTH_BINS)
+        self.total_seconds = 0.0
+        self.session_count = 0
+        self.profiles = {}
+        self.length_counts = np.zeros(len(self.LENGTH_BINS), np.int64)
+        self._origin = None  # Ordinal of the first day in the daily arrays
+        self._last = None  # Ordinal of the last day with usage; the arrays extend past it
+        self._day_seconds = np.zeros(0)
+        self._day_sessions = np.zeros(0, np.int64)
+
+        store.execute_later("CREATE TABLE IF NOT EXISTS daily_usage (day INTEGER NOT NULL, profile TEXT NOT NULL, "
+                            "seconds REAL NOT NULL, sessions INTEGER NOT NULL, PRIMARY KEY (day, profile))")
+        store.execute_later("CREATE TABLE IF NOT EXISTS session_lengths (bin INTEGER PRIMARY KEY, sessions INTEGER NOT NULL)")
+        store.flush()
+        if store._query("SELECT 1 FROM session_lengths LIMIT 1"):
+            self._load()
+        else:
+            self._backfill()
+
+    def _load(self):
+        for day, profile, seconds, sessions in self.store._query("SELECT day, profile, seconds, sessions FROM daily_usage"):
+            self._add_day(day, seconds, sessions)
+            self._add_profile(profile or None, seconds, sessions)
+        for index, sessions in self.store._query("SELECT bin, sessions FROM session_lengths"):
+            self.length_counts[index] = sessions
+
+    def _backfill(self):
+        # One-time migration for histories recorded before the rollup tables existed
+        rows = self.store._query("SELECT start_time, end_time, profile FROM sessions WHERE end_time IS NOT NULL")
+        for start_time, end_time, profile in rows:
+            self.add_session(datetime.fromtimestamp(start_time), datetime.fromtimestamp(end_time), profile)
+
+    def _day_index(self, day):
+        if self._origin is None:
+            self._origin = day
+        self._last = day if self._last is None else max(self._last, day)
+        if day < self._origin:
+            pad = self._origin - day
+            self._day_seconds = np.concatenate([np.zeros(pad), self._day_seconds])
+            self._day_sessions = np.concatenate([np.zeros(pad, np.int64), self._day_sessions])
+            self._origin = day
+        index = day - self._origin
+        if index >= len(self._day_seconds):
+            grow = max(index + 1, 2 * len(self._day_seconds)) - len(self._day_seconds)
+            self._day_seconds = np.concatenate([self._day_seconds, np.zeros(grow)])
+            self._day_sessions = np.concatenate([self._day_sessions, np.zeros(grow, np.int64)])
+        return index
+
+    def _add_day(self, day, seconds, sessions):
+        index = self._day_index(day)
+        self._day_seconds[index] += seconds
+        self._day_sessions[index] += sessions
+        self.total_seconds += seconds
+        self.session_count += sessions
+
+    def _add_profile(self, profile, seconds, sessions):
+        totals = self.profiles.setdefault(profile, [0.0, 0])
+        totals[0] += seconds
+        totals[1] += sessions
+
+    def add_session(self, start_time, end_time, profile=None):
+        """Fold a completed session into the rollups and queue their update."""
+        seconds = max((end_time - start_time).total_seconds(), 0.0)
+        day = start_time.date().toordinal()
+        length_bin = int(np.searchsorted(self.length_bins, seconds / 60, side='right')) - 1
+        self._add_day(day, seconds, 1)
+        self._add_profile(profile, seconds, 1)
+        self.length_counts[length_bin] += 1
+
+        self.store.execute_later("INSERT INTO daily_usage VALUES (?, ?, ?, 1) ON CONFLICT (day, profile) DO UPDATE "
+                                 "SET seconds = seconds + excluded.seconds, sessions = sessions + 1",
+                                 (day, profile or '', seconds))
+        self.store.execute_later("INSERT INTO session_lengths VALUES (?, 1) ON CONFLICT (bin) DO UPDATE "
+                                 "SET sessions = sessions + 1", (length_bin,))
+
+    def average_session(self):
+        return self.total_seconds / self.session_count if self.session_count else 0.0
+
+    def daily_totals(self, days=None):
+        """(dates, seconds, sessions) arrays per calendar day, optionally the last `days` days up to today."""
+        if days is None:
+            if self._origin is None:
+                return np.array([], 'datetime64[D]'), np.zeros(0), np.zeros(0, np.int64)
+            first, count = self._origin, self._last - self._origin + 1
+        else:
+            first, count = datetime.now().date().toordinal() - days + 1, days
+        seconds = np.zeros(count)
+        sessions = np.zeros(count, np.int64)
+        if self._origin is not None:
+            lo = max(first, self._origin)
+            hi = min(first + count, self._origin + len(self._day_seconds))
+            if lo < hi:
+                seconds[lo - first:hi - first] = self._day_seconds[lo - self._origin:hi - self._origin]
+                sessions[lo - first:hi - first] = self._day_sessions[lo - self._origin:hi - self._origin]
+        # date.toordinal() counts from 0001-01-01 = 1; datetime64[D] counts from 1970-01-01
+        epoch = datetime(1970, 1, 1).toordinal()
+        dates = np.arange(first - epoch, first - epoch + count).astype('datetime64[D]')
+        return dates, seconds, sessions
+
+    def weekly_totals(self, weeks=None):
+        """(week start dates, seconds) for Monday-based weeks."""
+        dates, seconds, _ = self.daily_totals(None if weeks is None else weeks * 7)
+        if not len(dates):
+            return dates, seconds
+        # Pad to whole weeks; 1970-01-01 (day 0) was a Thursday
+        lead = int((dates[0].astype(np.int64) + 3) % 7)
+        trail = -(lead + len(seconds)) % 7
+        totals = np.concatenate([np.zeros(lead), seconds, np.zeros(trail)]).reshape(-1, 7).sum(axis=1)
+        starts = dates[0] - lead + 7 * np.arange(len(totals))
+        if weeks is not None:
+            starts, totals = starts[-weeks:], totals[-weeks:]
+        return starts, totals
+
+    def daily_average(self, days=90):
+        """Average screen time per day over the last `days` days, in seconds."""
+        return float(self.daily_totals(days)[1].mean())
+
+    def length_histogram(self):
+        """(bin edges in minutes, session counts); the last bin is open-ended."""
+        return self.length_bins.copy(), self.length_counts.copy()
+
+def open_usage_logs(path=USAGE_DB_PATH):
+    """Open the persistent session history used by the log_session_* functions."""
+    global usage_logs, usage_stats
+    usage_logs = SessionStore(path)
+    usage_stats = None
+    if len(usage_logs) and usage_logs[-1]['end_time'] is None:
+        # The last run never stopped its session; count it only up to its last heartbeat,
+        # loading the rollups first as log_session_stop does
+        stats = load_usage_stats()
+        session = usage_logs.close_orphan()
+        stats.add_session(session['start_time'], session['end_time'], session['profile'])
+    return usage_logs
+
+_usage_stats_lock = threading.Lock()
+
+def load_usage_stats():
+    """Load the usage rollups on first use (they need NumPy); returns them."""
+    global usage_stats
+    with _usage_stats_lock:
+        if usage_stats is None and usage_logs is not None:
+            usage_stats = UsageAggregates(usage_logs)
+    return usage_stats
+
+class CameraSession:
+    """Long-lived capture device shared by every consumer of camera frames.
+
+    A background grabber thread keeps grabbing from the device so the driver
+    queue never goes stale, but only grabs: a frame is decoded (retrieved)
+    into a small ring buffer when a consumer reads it, so frames nobody asks
+    for are never decoded. The first frames after opening are discarded
+    while auto-exposure settles, and the device is reopened with exponential
+    backoff if it disappears. Each new error is passed to error_listeners,
+    on the grabber thread.
+    """
+
+    def __init__(self, index=0, warmup_frames=5, buffer_size=3, max_backoff=30.0):
+        self.index = index
+        self.warmup_frames = warmup_frames
+        self.max_backoff = max_backoff
+        self.connected = False
+        self.last_error = None
+        self._frames = [None] * max(buffer_size, 2)
+        self._seq = 0  # Frames grabbed since the device was opened
+        self._decoded = 0  # Value of _seq when the newest slot was decoded
+        self._newest = 0
+        self._cap = None
+        self._cap_lock = threading.Lock()  # VideoCapture is not safe to grab and retrieve concurrently
+        self._refs = 0
+        self._lock = threading.Lock()
+        self._frame_ready = threading.Condition(self._lock)
+        self._stop_event = None
+        self.error_listeners = []
+
+    def acquire(self):
+        """Register a consumer, starting the grabber thread if needed."""
+        with self._lock:
+            self._refs += 1
+            if self._stop_event is None:
+                self._stop_event = threading.Event()
+                threading.Thread(target=self._grab_frames, args=(self._stop_event,),
+                                 name="camera-grabber", daemon=True).start()
+        return self
+
+    def release(self):
+        """Unregister a consumer; the device is closed once nobody uses it."""
+        with self._lock:
+            self._refs = max(self._refs - 1, 0)
+            if self._refs == 0 and self._stop_event is not None:
+                self._stop_event.set()
+                self._stop_event = None
+                self._seq = 0
+                self._decoded = 0
+                self._frame_ready.notify_all()
+
+    def read(self, timeout=None, copy=True):
+        """Return the newest frame (BGR ndarray) or None if none arrived in time."""
+        with self._lock:
+            if timeout:
+                self._frame_ready.wait_for(lambda: self.connected and self._seq, timeout)
+            if not (self.connected and self._seq):
+                return None
+            if self._decoded != self._seq:
+                # Decode into the slot after the newest one, so a frame handed out uncopied stays intact
+                slot = self._seq % len(self._frames)
+                with self._cap_lock:
+                    if self._cap is None:
+                        return None
+                    ret, frame = self._cap.retrieve(self._frames[slot])
+                if not ret:
+                    return None
+                self._frames[slot] = frame
+                self._newest = slot
+                self._decoded = self._seq
+                metrics.incr("camera_frames")
+            frame = self._frames[self._newest]
+            return frame.copy() if copy else frame
+
+    def _open(self):
+        cap = cv2.VideoCapture(self.index)
+        if not cap.isOpened():
+            cap.release()
+            raise IOError(f"Cannot open camera {self.index}")
+        for _ in range(self.warmup_frames):
+            cap.grab()
+        return cap
+
+    def _grab_frames(self, stop_event):
+        backoff = 0.5
+        cap = None
+        while not stop_event.is_set():
+            if cap is None:
+                try:
+                    cap = self._open()
+                except Exception as e:
+                    self._set_error(e)
+                    stop_event.wait(backoff)
+                    backoff = min(backoff * 2, self.max_backoff)
+                    continue
+                with self._cap_lock:
+                    self._cap = cap
+                self.connected = True
+                self.last_error = None
+                backoff = 0.5
+
+            # Grab without decoding; read() retrieves the newest grab on demand
+            with self._cap_lock:
+                ret = cap.grab()
+            if not ret:
+                with self._cap_lock:
+                    if self._cap is cap:
+                        self._cap = None
+                    cap.release()
+                cap = None
+                self._set_error(IOError("Failed to capture image"))
+                continue
+            with self._lock:
+                if stop_event.is_set():
+                    break
+                self._seq += 1
+                metrics.incr("camera_grabs")
+                self._frame_ready.notify_all()
+
+        if cap is not None:
+            with self._cap_lock:
+                # A quick release/acquire may already have a new grabber with its own device
+                if self._cap is cap:
+                    self._cap = None
+                cap.release()
+        with self._lock:
+            if self._stop_event is None:
+                self.connected = False
+
+    def _set_error(self, error):
+        new = self.connected or str(error) != str(self.last_error)
+        self.connected = False
+        self.last_error = error
+        if new:
+            print(f"Camera error: {error}")
+            for listener in self.error_listeners:
+                listener(error)
+
+# One capture session per device index, shared by all consumers
+_camera_sessions = {}
+
+def get_camera_session(index=0):
+    """Return the shared CameraSession for the given device index."""
+    session = _camera_sessions.get(index)
+    if session is None:
+        session = _camera_sessions.setdefault(index, CameraSession(index))
+    return session
+
+class LuminanceHistogram:
+    """256-bin luminance histogram and the frame statistics derived from it.
+
+    Every statistic is computed from the counts alone, so nothing per-pixel
+    is allocated once the histogram exists.
+    """
+
+    __slots__ = ("counts", "total", "_tail")
+
+    def __init__(self, counts):
+        self.counts = counts
+        self.total = int(counts.sum())
+        self._tail = None
+
+    @classmethod
+    def of(cls, gray):
+        """Histogram of a uint8 image; calcHist needs no index temporaries, unlike np.bincount."""
+        counts = cv2.calcHist([gray], [0], None, [256], [0, 256])
+        return cls(counts.ravel().astype(np.int64))
+
+    def remap(self, lut):
+        """Histogram of the image after applying a 256-entry lookup table to it."""
+        return LuminanceHistogram(np.bincount(lut, weights=self.counts, minlength=256).astype(np.int64))
+
+    def mean(self):
+        return int(np.dot(np.arange(256), self.counts)) / self.total
+
+    def count_at_least(self, level):
+        """Number of pixels whose value is >= level (level may be fractional)."""
+        first = math.ceil(level)
+        if first <= 0:
+            return self.total
+        if first > 255:
+            return 0
+        if self._tail is None:
+            self._tail = np.cumsum(self.counts[::-1])[::-1]
+        return int(self._tail[first])
+
+    def fraction_at_least(self, level):
+        return self.count_at_least(level) / self.total
+
+    def percentile(self, q):
+        """Lowest level with at least q percent of the pixels at or below it."""
+        rank = max(math.ceil(q / 100 * self.total), 1)
+        return int(np.searchsorted(np.cumsum(self.counts), rank))
+
+    def median(self):
+        return self.percentile(50)
+
+    def trimmed_mean(self, proportion=0.1):
+        """Mean after discarding proportion of the pixels at each end."""
+        cumulative = np.cumsum(self.counts)
+        low, high = proportion * self.total, (1 - proportion) * self.total
+        kept = np.clip(np.minimum(cumulative, high) - np.maximum(cumulative - self.counts, low), 0, None)
+        return float(np.dot(np.arange(256), kept) / kept.sum()) if kept.sum() else self.mean()
+
+    def stats(self):
+        return {'mean': self.mean(), 'median': self.median(), 'p10': self.percentile(10),
+                'p90': self.percentile(90), 'trimmed_mean': self.trimmed_mean()}
+
+class HistogramRing:
+    """The luminance histograms of the last capacity estimated frames, oldest first."""
+
+    def __init__(self, capacity=64):
+        self.capacity = capacity
+        self.count = 0
+        self._counts = None  # Allocated on first append, like BrightnessFilter's ring
+
+    def append(self, histogram):
+        if self._counts is None:
+            self._counts = np.zeros((self.capacity, 256), np.int64)
+        self._counts[self.count % self.capacity] = histogram.counts
+        self.count += 1
+
+    def recent(self, n=None):
+        """Counts of the newest n histograms as an (n, 256) array, oldest first."""
+        n = min(n or self.capacity, self.count, self.capacity)
+        if not n:
+            return np.zeros((0, 256), np.int64)
+        return self._counts[np.arange(self.count - n, self.count) % self.capacity]
+
+    def latest(self):
+        return LuminanceHistogram(self._counts[(self.count - 1) % self.capacity]) if self.count else None
+
+    def combined(self, n=None):
+        """One histogram pooling the newest n frames."""
+        return LuminanceHistogram(self.recent(n).sum(axis=0)) if self.count else None
+
+    def clear(self):
+        self.count = 0
+
+LuminanceEstimate = namedtuple("LuminanceEstimate", ["ratio", "threshold", "mean", "histogram"])
+
+class LuminanceEstimator:
+    """Fused brightness estimation working directly on a BGR uint8 frame.
+
+    Reproduces the preprocess_image -> adaptive_threshold -> count_bright_pixels
+    chain (PIL grayscale, contrast enhance, mean threshold, bright-pixel count).
+    Only the grayscale conversion touches every pixel; the contrast stretch is
+    applied to the 256-bin histogram and both thresholds are read off it.
+    """
+
+    def __init__(self, contrast=2.0):
+        self.contrast = contrast
+        self._shape = None
+
+    def _allocate(self, shape):
+        self._acc = np.empty(shape, np.uint32)
+        self._tmp = np.empty(shape, np.uint32)
+        self._gray = np.empty(shape, np.uint8)
+        self._shape = shape
+
+    def grayscale(self, frame):
+        """ITU-R 601-2 luma with the same fixed-point rounding as PIL's convert('L')."""
+        shape = frame.shape[:2]
+        if shape != self._shape:
+            self._allocate(shape)
+        acc, tmp = self._acc, self._tmp
+        np.multiply(frame[..., 2], np.uint32(19595), out=acc)
+        np.multiply(frame[..., 1], np.uint32(38470), out=tmp)
+        acc += tmp
+        np.multiply(frame[..., 0], np.uint32(7471), out=tmp)
+        acc += tmp
+        acc += 0x8000
+        acc >>= 16
+        np.copyto(self._gray, acc, casting='unsafe')
+        return self._gray
+
+    def contrast_lut(self, histogram):
+        """Lookup table equivalent to ImageEnhance.Contrast for the frame with this histogram."""
+        mean = int(histogram.mean() + 0.5)
+        levels = np.arange(256, dtype=np.float32)
+        lut = np.float32(mean) + np.float32(self.contrast) * (levels - np.float32(mean))
+        return np.clip(lut, 0, 255).astype(np.uint8)
+
+    def estimate(self, frame):
+        """Return the bright-pixel ratio, the threshold it was measured against,
+        the mean of the contrast-stretched frame and the frame's luminance histogram."""
+        with metrics.timer("estimate_grayscale"):
+            gray = self.grayscale(frame)
+        with metrics.timer("estimate_histogram"):
+            histogram = LuminanceHistogram.of(gray)
+        with metrics.timer("estimate_threshold"):
+            enhanced = histogram.remap(self.contrast_lut(histogram))
+            mean = enhanced.mean()
+            # Mean of the binarized image, i.e. 255 * fraction of pixels above the mean
+            threshold = 255 * enhanced.fraction_at_least(mean)
+            ratio = enhanced.fraction_at_least(threshold)
+        return LuminanceEstimate(ratio, threshold, mean, histogram)
+
+class FrameSampler:
+    """Reduces a frame before brightness estimation.
+
+    Modes: "full" (every pixel), "stride" (every factor-th row and column),
+    "pyramid" (INTER_AREA downscale by factor) and "roi" (a region given as
+    fractions (x, y, width, height) of the frame). Every calibrate_every samples
+    the full frame is estimated too, and the difference in bright-pixel ratio is
+    recorded so the accuracy given up by the mode can be reported.
+    """
+
+    MODES = ("full", "stride", "pyramid", "roi")
+
+    def __init__(self, mode="full", factor=4, roi=None, calibrate_every=60):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown sampling mode: {mode}")
+        if mode == "roi" and roi is None:
+            raise ValueError("Sampling mode 'roi' needs a region")
+        self.mode = mode
+        self.factor = max(int(factor), 1)
+        self.roi = roi
+        self.calibrate_every = calibrate_every
+        self.estimator = LuminanceEstimator()
+        self._reference = LuminanceEstimator()
+        self._resized = None
+        self.samples = 0
+        self.calibrations = 0
+        self.error_total = 0.0
+        self.error_max = 0.0
+
+    @classmethod
+    def for_profile(cls, profile):
+        """The profile's sampler ("sampling": {"mode", "factor", "roi"}), else default_sampler()."""
+        spec = profile.get("sampling")
+        return cls(**spec) if spec else default_sampler()
+
+    def sample(self, frame):
+        """Return the pixels the estimate is computed from (a view where possible)."""
+        if self.mode == "stride":
+            return frame[::self.factor, ::self.factor]
+        if self.mode == "pyramid":
+            height, width = frame.shape[:2]
+            size = (max(width // self.factor, 1), max(height // self.factor, 1))
+            if self._resized is None or self._resized.shape[1::-1] != size:
+                self._resized = np.empty((size[1], size[0], 3), np.uint8)
+            return cv2.resize(frame, size, dst=self._resized, interpolation=cv2.INTER_AREA)
+        if self.mode == "roi":
+            height, width = frame.shape[:2]
+            x, y, w, h = self.roi
+            x0, y0 = int(x * width), int(y * height)
+            x1 = min(max(int((x + w) * width), x0 + 1), width)
+            y1 = min(max(int((y + h) * height), y0 + 1), height)
+            return frame[y0:y1, x0:x1]
+        return frame
+
+    def estimate(self, frame):
+        with metrics.timer("estimate_sample"):
+            sampled = self.sample(frame)
+        result = self.estimator.estimate(sampled)
+        if self.mode != "full" and self.calibrate_every and self.samples % self.calibrate_every == 0:
+            error = float(abs(result.ratio - self._reference.estimate(frame).ratio))
+            self.calibrations += 1
+            self.error_total += error
+            self.error_max = max(self.error_max, error)
+        self.samples += 1
+        return result
+
+    def accuracy(self):
+        """Bright-pixel ratio error against full-frame estimates seen so far."""
+        mean_error = self.error_total / self.calibrations if self.calibrations else 0.0
+        return {'mode': self.mode, 'calibrations': self.calibrations,
+                'mean_error': mean_error, 'max_error': self.error_max}
+
+def default_sampler():
+    """The sampler the live loop and --replay estimate with."""
+    # Every 4th row and column: 1/16 of the pixels, at most 0.0065 off the
+    # full-frame ratio (under 2 brightness points) on every benchmark scene.
+    # Area averaging ("pyramid") softens hard edges and was 0.04 off on "backlit".
+    return FrameSampler(mode="stride", factor=4)
+
+class ChangeGate:
+    """Skips brightness estimation while the camera keeps seeing the same scene.
+
+    Each frame is reduced to a tiny thumbnail of its green channel (a cheap
+    stand-in for luma) taken from a strided view. "thumbnail" mode scores
+    the mean absolute difference between thumbnails. "histogram" mode
+    scores the L1 distance between their luminance histograms, which ignores
+    things moving around in view. Both scores lie in 0..1. Frames scoring
+    below threshold against the last estimated frame are skipped, so slow
+    drift still adds up to an estimate. max_skips forces one now and then
+    regardless. A gate that is not enabled passes every frame.
+    """
+
+    MODES = ("thumbnail", "histogram")
+    DEFAULT_THRESHOLDS = {"thumbnail": 0.01, "histogram": 0.1}
+
+    def __init__(self, mode="thumbnail", threshold=None, size=(32, 24), bins=32, max_skips=30, enabled=True):
+        if mode not in self.MODES:
+            raise ValueError(f"Unknown change detection mode: {mode}")
+        self.enabled = enabled
+        self.mode = mode
+        self.threshold = self.DEFAULT_THRESHOLDS[mode] if threshold is None else threshold
+        self.size = size
+        self.bins = bins
+        self.max_skips = max_skips
+        self.frames = 0
+        self.skipped = 0
+        self.last_score = None
+        self._reference = None
+        self._skips = 0
+
+    def signature(self, frame):
+        height, width = frame.shape[:2]
+        # Keep about 8 source pixels per thumbnail pixel in each direction to average out sensor noise
+        step = max(min(height // (self.size[1] * 8), width // (self.size[0] * 8)), 1)
+        green = np.ascontiguousarray(frame[::step, ::step, 1])
+        thumbnail = cv2.resize(green, self.size, interpolation=cv2.INTER_AREA)
+        if self.mode == "histogram":
+            counts = np.bincount((thumbnail.ravel().astype(np.uint16) * self.bins) >> 8, minlength=self.bins)
+            return counts / thumbnail.size
+        return thumbnail
+
+    def score(self, signature):
+        if self.mode == "histogram":
+            return float(np.abs(signature - self._reference).sum()) / 2
+        return float(cv2.absdiff(signature, self._reference).mean()) / 255
+
+    @classmethod
+    def for_profile(cls, profile):
+        """The profile's gate ("change_gate": {"mode", "threshold", "max_skips"}, or false to turn it off)."""
+        spec = profile.get("change_gate")
+        if spec is False:
+            return cls(enabled=False)
+        return cls(**(spec or {}))
+
+    def changed(self, frame):
+        """True if frame needs a fresh estimate, False to reuse the previous one."""
+        self.frames += 1
+        if not self.enabled:
+            return True
+        with metrics.timer("change_gate"):
+            signature = self.signature(frame)
+            if self._reference is not None and self._skips < self.max_skips:
+                self.last_score = self.score(signature)
+                if self.last_score < self.threshold:
+                    self._skips += 1
+                    self.skipped += 1
+                    return False
+        self._reference = signature
+        self._skips = 0
+        return True
+
+    def skip_rate(self):
+        return self.skipped / self.frames if self.frames else 0.0
+
+    def stats(self):
+        return {'enabled': self.enabled, 'mode': self.mode, 'threshold': self.threshold, 'frames': self.frames,
+                'skipped': self.skipped, 'skip_rate': self.skip_rate(), 'last_score': self.last_score}
+
+    def reset(self):
+        self._reference = None
+        self._skips = 0
+
+class Scheduler:
+    """Runs timed jobs on one worker thread instead of a sleeping thread per loop.
+
+    A job is a callable returning the delay in seconds until it should run
+    again, or None when it is done. Deadlines are kept in a heap and the
+    worker waits on a condition, so stop() wakes it immediately.
+
+    Deadlines are kept on both the monotonic and the wall clock, and a job
+    runs when either says it is due. The monotonic clock stops while the
+    machine is suspended, so the worker wakes at least every
+    WALL_CLOCK_CHECK seconds to catch deadlines the wall clock has passed.
+    Otherwise an 18:00 job would run late by the whole suspend time.
+
+    A job that raises is retried after FAILURE_RETRY seconds, doubling up to
+    FAILURE_RETRY_MAX while it keeps failing.
+    """
+
+    WALL_CLOCK_CHECK = 60.0
+    FAILURE_RETRY = 5.0
+    FAILURE_RETRY_MAX = 300.0
+
+    def __init__(self, name="scheduler"):
+        self.name = name
+        self._jobs = []
+        self._seq = itertools.count()
+        self._cond = threading.Condition()
+        self._generation = 0
+        self._running = False
+        self._failures = {}  # Consecutive failures per job name
+
+    def start(self):
+        with self._cond:
+            if self._running:
+                return
+            self._running = True
+            self._generation += 1
+            threading.Thread(target=self._run, args=(self._generation,),
+                             name=self.name, daemon=True).start()
+
+    def stop(self):
+        """Drop all jobs and wake the worker so it exits right away."""
+        with self._cond:
+            self._running = False
+            self._generation += 1
+            self._jobs.clear()
+            self._failures.clear()
+            self._cond.notify_all()
+
+    def add(self, name, job, delay=0.0):
+        """Schedule job to run after delay seconds, replacing a job of the same name."""
+        with self._cond:
+            self._jobs = [entry for entry in self._jobs if entry[2] != name]
+            heapq.heapify(self._jobs)
+            heapq.heappush(self._jobs, self._entry(delay, name, job))
+            self._cond.notify_all()
+
+    def _entry(self, delay, name, job):
+        return (time.monotonic() + delay, next(self._seq), name, job, time.time() + delay)
+
+    def _catch_up(self):
+        """Move deadlines earlier where the wall clock has advanced more than the monotonic one."""
+        now, wall = time.monotonic(), time.time()
+        moved = False
+        for i, (due, seq, name, job, wall_due) in enumerate(self._jobs):
+            if wall_due - wall < due - now - 1.0:
+                self._jobs[i] = (now + max(wall_due - wall, 0.0), seq, name, job, wall_due)
+                moved = True
+        if moved:
+            heapq.heapify(self._jobs)
+
+    def cancel(self, name):
+        with self._cond:
+            self._jobs = [entry for entry in self._jobs if entry[2] != name]
+            heapq.heapify(self._jobs)
+
+    def _run(self, generation):
+        while True:
+            with self._cond:
+                while generation == self._generation:
+                    if self._jobs:
+                        self._catch_up()
+                        timeout = self._jobs[0][0] - time.monotonic()
+                        if timeout <= 0:
+                            break
+                        timeout = min(timeout, self.WALL_CLOCK_CHECK)
+                    else:
+                        timeout = None
+                    self._cond.wait(timeout)
+                if generation != self._generation:
+                    return
+                due, _, name, job, _ = heapq.heappop(self._jobs)
+
+            metrics.incr("wakeups_scheduler")
+            metrics.observe("scheduler_lag", time.monotonic() - due)
+            try:
+                with metrics.timer("job_" + name):
+                    delay = job()
+                self._failures.pop(name, None)
+            except Exception as e:
+                failures = self._failures[name] = self._failures.get(name, 0) + 1
+                delay = min(self.FAILURE_RETRY * 2 ** (failures - 1), self.FAILURE_RETRY_MAX)
+                metrics.incr("job_failures")
+                print(f"Scheduled job '{name}' failed: {e}; retrying in {delay:.0f} s")
+            if delay is not None:
+                with self._cond:
+                    if generation != self._generation:
+                        return
+                    # Only re-arm if the job was not rescheduled while it ran
+                    if not any(entry[2] == name for entry in self._jobs):
+                        heapq.heappush(self._jobs, self._entry(delay, name, job))
+
+class AdaptiveInterval:
+    """Sampling interval that snaps to the minimum after a large change in the
+    measured value and backs off exponentially while it stays stable."""
+
+    def __init__(self, minimum=1.0, maximum=60.0, change_threshold=0.05, backoff=2.0):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.change_threshold = change_threshold
+        self.backoff = backoff
+        self.interval = minimum
+        self.last_value = None
+
+    def update(self, value):
+        if self.last_value is None or abs(value - self.last_value) >= self.change_threshold:
+            self.interval = self.minimum
+        else:
+            self.interval = min(self.interval * self.backoff, self.maximum)
+        self.last_value = value
+        return self.interval
+
+    def reset(self):
+        self.interval = self.minimum
+        self.last_value = None
+
+# Process names that switch on the brightness override (video conferencing apps),
+# as case-insensitive regular expressions matched against the whole name
+OVERRIDE_APPS = (r"zoom(\.exe)?", r"(ms-)?teams(\.exe)?", r"googletalk(\.exe)?")
+
+class ProcessWatcher:
+    """Reports processes matching a set of name patterns as they start and stop.
+
+    On Linux each scan lists /proc and diffs the PIDs against the previous
+    scan, reading comm (and cmdline when comm does not match, since comm is
+    cut to 15 characters) only for PIDs it has not seen before. Elsewhere the
+    process table comes from tasklist's CSV output, run without a shell. The
+    patterns are compiled into one regex. on_start(name, pid) and
+    on_stop(name, pid) run on the scanning thread.
+    """
+
+    PROC = "/proc"
+
+    def __init__(self, patterns=OVERRIDE_APPS, on_start=None, on_stop=None):
+        self.matcher = re.compile("|".join(f"(?:{pattern})" for pattern in patterns), re.IGNORECASE)
+        self.on_start = on_start
+        self.on_stop = on_stop
+        self.matches = {}  # pid -> name of running matching processes
+        self._seen = {}  # pid -> matching name or None, for every PID of the last scan
+
+    def _snapshot(self):
+        # PIDs mapped to their name, or to None where the name is read only if the PID is new
+        if os.path.isdir(self.PROC):
+            return dict.fromkeys(int(entry) for entry in os.listdir(self.PROC) if entry.isdigit())
+        output = subprocess.run(["tasklist", "/fo", "csv", "/nh"], capture_output=True, text=True,
+                                check=True).stdout
+        return {int(row[1]): row[0] for row in csv.reader(output.splitlines()) if len(row) > 1 and row[1].isdigit()}
+
+    def _name(self, pid):
+        try:
+            with open(f"{self.PROC}/{pid}/comm") as f:
+                name = f.read().strip()
+            if self.matcher.fullmatch(name):
+                return name
+            with open(f"{self.PROC}/{pid}/cmdline", "rb") as f:
+                argv0 = f.read().split(b"\0", 1)[0].decode(errors="replace")
+            return os.path.basename(argv0) or name
+        except OSError:
+            return None  # Exited while we looked, or not ours to read
+
+    def scan(self):
+        """Diff the process table against the last scan; returns (started, stopped) as (name, pid) lists."""
+        with metrics.timer("process_scan"):
+            current = self._snapshot()
+            started, stopped = [], []
+            for pid in self._seen.keys() - current.keys():
+                if self._seen.pop(pid):
+                    stopped.append((self.matches.pop(pid), pid))
+            for pid in current.keys() - self._seen.keys():
+                name = current[pid] or self._name(pid)
+                matched = name if name and self.matcher.fullmatch(name) else None
+                self._seen[pid] = matched
+                if matched:
+                    self.matches[pid] = matched
+                    started.append((matched, pid))
+        for name, pid in stopped:
+            if self.on_stop:
+                self.on_stop(name, pid)
+        for name, pid in started:
+            if self.on_start:
+                self.on_start(name, pid)
+        return started, stopped
+
+class FakeIdleSource:
+    """Idle time set by hand, for tests and benchmarks."""
+
+    name = "fake"
+    poll_interval = None
+
+    def __init__(self, idle=0.0):
+        self.idle = idle
+
+    @classmethod
+    def available(cls):
+        return True
+
+    def touch(self):
+        self.idle = 0.0
+
+    def idle_seconds(self):
+        return self.idle
+
+    def close(self):
+        pass
+
+class XScreenSaverIdleSource:
+    """Time since the last keyboard or pointer event from the X server's
+    MIT-SCREEN-SAVER extension, through libXss with ctypes."""
+
+    name = "x11"
+    poll_interval = None  # The server tracks input itself; no need to poll while active
+
+    def __init__(self):
+        import ctypes
+        import ctypes.util
+
+        class Info(ctypes.Structure):
+            _fields_ = [("window", ctypes.c_ulong), ("state", ctypes.c_int), ("kind", ctypes.c_int),
+                        ("til_or_since", ctypes.c_ulong), ("idle", ctypes.c_ulong), ("event_mask", ctypes.c_ulong)]
+
+        x11_path, xss_path = ctypes.util.find_library("X11"), ctypes.util.find_library("Xss")
+        if not (os.environ.get("DISPLAY") and x11_path and xss_path):
+            raise IOError("X11 screen saver extension not available")
+        self._x11 = ctypes.cdll.LoadLibrary(x11_path)
+        self._xss = ctypes.cdll.LoadLibrary(xss_path)
+        self._x11.XOpenDisplay.restype = ctypes.c_void_p
+        self._x11.XDefaultRootWindow.argtypes = [ctypes.c_void_p]
+        self._x11.XDefaultRootWindow.restype = ctypes.c_ulong
+        self._x11.XCloseDisplay.argtypes = [ctypes.c_void_p]
+        self._xss.XScreenSaverAllocInfo.restype = ctypes.POINTER(Info)
+        self._xss.XScreenSaverQueryInfo.argtypes = [ctypes.c_void_p, ctypes.c_ulong, ctypes.POINTER(Info)]
+        self._display = self._x11.XOpenDisplay(None)
+        if not self._display:
+            raise IOError("Cannot open X display")
+        # The display connection and info struct are reused by every query
+        self._root = self._x11.XDefaultRootWindow(self._display)
+        self._info = self._xss.XScreenSaverAllocInfo()
+
+    @classmethod
+    def available(cls):
+        return bool(os.environ.get("DISPLAY")) and os.name != "nt"
+
+    def idle_seconds(self):
+        if not self._xss.XScreenSaverQueryInfo(self._display, self._root, self._info):
+            raise IOError("XScreenSaverQueryInfo failed")
+        return self._info.contents.idle / 1000
+
+    def close(self):
+        if self._display:
+            self._x11.XFree(self._info)
+            self._x11.XCloseDisplay(self._display)
+            self._display = None
+
+class InterruptsIdleSource:
+    """Idle time inferred from input device interrupt counts in /proc/interrupts.
+
+    Works without X (consoles, Wayland). Input is only noticed when the
+    counts are read, so the monitor polls this source every poll_interval
+    seconds. USB host controllers are not matched: a webcam on the same
+    controller would look like constant activity.
+    """
+
+    name = "interrupts"
+    poll_interval = 5.0
+    PATH = "/proc/interrupts"
+    DEVICES = r"i8042|hid|keyboard|mouse|touchpad|elan|syna"
+
+    def __init__(self, devices=DEVICES):
+        self.matcher = re.compile(devices, re.IGNORECASE)
+        self._last_total = self._total()
+        if self._last_total is None:
+            raise IOError("No input device interrupts found in /proc/interrupts")
+        self._last_change = time.monotonic()
+
+    @classmethod
+    def available(cls):
+        return os.path.exists(cls.PATH)
+
+    def _total(self):
+        total = None
+        with open(self.PATH) as f:
+            cpus = len(f.readline().split())
+            for line in f:
+                fields = line.split()
+                # IRQ number, one count per CPU, then the controller and device names
+                if len(fields) > cpus + 1 and self.matcher.search(" ".join(fields[cpus + 1:])):
+                    total = (total or 0) + sum(int(count) for count in fields[1:cpus + 1])
+        return total
+
+    def idle_seconds(self):
+        total = self._total()
+        now = time.monotonic()
+        if total != self._last_total:
+            self._last_total = total
+            self._last_change = now
+        return now - self._last_change
+
+    def close(self):
+        pass
+
+class WindowsIdleSource:
+    """Time since the last input event from GetLastInputInfo."""
+
+    name = "windows"
+    poll_interval = None
+
+    def __init__(self):
+        import ctypes
+
+        class LastInputInfo(ctypes.Structure):
+            _fields_ = [("cbSize", ctypes.c_uint), ("dwTime", ctypes.c_uint)]
+
+        self._info = LastInputInfo(cbSize=ctypes.sizeof(LastInputInfo))
+        self._info_ref = ctypes.byref(self._info)
+        self._user32 = ctypes.windll.user32
+        self._kernel32 = ctypes.windll.kernel32
+
+    @classmethod
+    def available(cls):
+        return os.name == "nt"
+
+    def idle_seconds(self):
+        if not self._user32.GetLastInputInfo(self._info_ref):
+            raise OSError("GetLastInputInfo failed")
+        # Both are 32-bit millisecond tick counts that wrap after 49 days
+        return ((self._kernel32.GetTickCount() - self._info.dwTime) & 0xFFFFFFFF) / 1000
+
+    def close(self):
+        pass
+
+# Auto-detection order for the last-input time; fake is only used when asked for
+IDLE_SOURCES = {
+    "windows": WindowsIdleSource,
+    "x11": XScreenSaverIdleSource,
+    "interrupts": InterruptsIdleSource,
+    "fake": FakeIdleSource,
+}
+
+def create_idle_source(name=None):
+    """Create the named idle source, or the first available one; None if nothing works."""
+    if name is not None:
+        return IDLE_SOURCES[name]()
+    for kind, source in IDLE_SOURCES.items():
+        if kind != "fake" and source.available():
+            try:
+                return source()
+            except Exception as e:
+                print(f"Idle source '{kind}' unavailable: {e}")
+    print("No idle source available; the screen will not dim when you step away")
+    return None
+
+class IdleMonitor:
+    """Turns an idle source's readings into idle/active transitions.
+
+    poll() returns the delay until the next check: while active it sleeps
+    until idle_after could first be reached (or the source's poll_interval,
+    if shorter); while idle it checks every active_poll seconds so sampling
+    resumes promptly when the user returns.
+    """
+
+    def __init__(self, source, idle_after=300.0, on_idle=None, on_active=None, active_poll=1.0):
+        self.source = source
+        self.idle_after = idle_after
+        self.on_idle = on_idle
+        self.on_active = on_active
+        self.active_poll = active_poll
+        self.idle = False
+        self.last_idle_seconds = 0.0
+
+    def poll(self):
+        seconds = self.last_idle_seconds = self.source.idle_seconds()
+        if not self.idle and seconds >= self.idle_after:
+            self.idle = True
+            if self.on_idle:
+                self.on_idle(seconds)
+        elif self.idle and seconds < self.idle_after:
+            self.idle = False
+            if self.on_active:
+                self.on_active()
+        if self.idle:
+            return self.active_poll
+        delay = self.idle_after - seconds
+        if self.source.poll_interval:
+            delay = min(delay, self.source.poll_interval)
+        return max(delay, self.active_poll)
+
+# Color temperatures are rounded to this many kelvin, so a whole day of
+# transitions needs only a handful of distinct gamma ramps
+COLOR_TEMPERATURE_STEP = 100
+NEUTRAL_TEMPERATURE = 6500
+
+def blackbody_whitepoint(kelvin):
+    """Relative red, green and blue output (0-1) for a blackbody at kelvin.
+
+    Uses Tanner Helland's fit to the Planckian locus, normalized so the
+    neutral 6500 K comes out as pure white. kelvin may be an array.
+    """
+    def rgb(kelvin):
+        t = np.asarray(kelvin, np.float64) / 100
+        warm = t <= 66
+        hot = np.maximum(t - 60, 1e-9)
+        red = np.where(warm, 255.0, 329.698727446 * hot ** -0.1332047592)
+        green = np.where(warm, 99.4708025861 * np.log(t) - 161.1195681661, 288.1221695283 * hot ** -0.0755148492)
+        blue = np.where(t >= 66, 255.0, np.where(t <= 19, 0.0, 138.5177312231 * np.log(np.maximum(t - 10, 1e-9)) - 305.0447927307))
+        return np.clip(np.stack([red, green, blue], axis=-1), 0, 255)
+    return np.clip(rgb(kelvin) / rgb(NEUTRAL_TEMPERATURE), 0.0, 1.0)
+
+def quantize_temperature(kelvin):
+    kelvin = min(max(kelvin, 1000), 10000)
+    return int(round(kelvin / COLOR_TEMPERATURE_STEP) * COLOR_TEMPERATURE_STEP)
+
+@functools.lru_cache(maxsize=128)
+def _gamma_ramp(kelvin, size):
+    ramp = np.rint(np.outer(blackbody_whitepoint(kelvin), np.linspace(0.0, 65535.0, size))).astype(np.uint16)
+    ramp.flags.writeable = False
+    return ramp
+
+def gamma_ramp(kelvin, size=256):
+    """Read-only (3 x size) uint16 red, green and blue gamma ramps for a color temperature.
+
+    The temperature is rounded to COLOR_TEMPERATURE_STEP and the ramps come
+    from a bounded LRU cache, so repeated and gradual changes reuse tables.
+    """
+    return _gamma_ramp(quantize_temperature(kelvin), size)
+
+def color_temperature_at(now, day=6500, night=3000, sunrise=8, sunset=18, duration=3600):
+    """Target color temperature for a time of day, and seconds until it next changes.
+
+    The day temperature holds from sunrise to sunset and the night one
+    otherwise. For duration seconds after each boundary the temperature moves
+    linearly between the two, one COLOR_TEMPERATURE_STEP at a time.
+    """
+    for hour, start, end in ((sunrise, night, day), (sunset, day, night)):
+        elapsed = (now - now.replace(hour=hour, minute=0, second=0, microsecond=0)).total_seconds()
+        if 0 <= elapsed < duration:
+            kelvin = start + (end - start) * elapsed / duration
+            step = duration * COLOR_TEMPERATURE_STEP / max(abs(end - start), COLOR_TEMPERATURE_STEP)
+            return kelvin, min(step, duration - elapsed)
+    kelvin = day if sunrise <= now.hour < sunset else night
+    return kelvin, seconds_until_next((sunrise, sunset), now)
+
+class DisplayBackend:
+    """Base class for display controls. Backends keep their device handle open
+    between writes instead of reconnecting for every adjustment.
+
+    discover() lists the devices a backend can drive (the argument its
+    constructor takes); capabilities names the settings it can write.
+    """
+
+    name = "none"
+    capabilities = frozenset({'brightness'})
+    # Seconds a single write may take before the display is reported as hung
+    timeout = 0.5
+
+    @classmethod
+    def available(cls):
+        return False
+
+    @classmethod
+    def discover(cls):
+        return [None] if cls.available() else []
+
+    def set_brightness(self, percent):
+        raise NotImplementedError(f"The {self.name} backend cannot adjust brightness")
+
+    def set_color_temperature(self, kelvin):
+        raise NotImplementedError(f"The {self.name} backend cannot adjust color temperature")
+
+    def close(self):
+        pass
+
+class FakeDisplayBackend(DisplayBackend):
+    """In-memory backend that records every write, for tests and benchmarks.
+
+    delay makes each write take that many seconds, to stand in for slow buses.
+    Color temperatures are turned into gamma ramps as a real screen would be.
+    """
+
+    name = "fake"
+    capabilities = frozenset({'brightness', 'color_temperature'})
+
+    def __init__(self, device="fake0", delay=0.0):
+        self.device = device
+        self.delay = delay
+        self.writes = []
+        self.brightness = None
+        self.color_temperature = None
+        self.ramp = None
+
+    @classmethod
+    def available(cls):
+        return True
+
+    @classmethod
+    def discover(cls):
+        return ["fake0"]
+
+    def set_brightness(self, percent):
+        if self.delay:
+            time.sleep(self.delay)
+        self.writes.append(('brightness', percent))
+        self.brightness = percent
+
+    def set_color_temperature(self, kelvin):
+        if self.delay:
+            time.sleep(self.delay)
+        self.writes.append(('color_temperature', kelvin))
+        self.color_temperature = kelvin
+        self.ramp = gamma_ramp(kelvin)
+
+DRM_ROOT = Path("/sys/class/drm")
+
+def drm_connectors():
+    """(name, sysfs directory, EDID bytes) of every connected DRM connector.
+
+    Names are the kernel's (eDP-1, HDMI-A-1). X drivers name the same outputs
+    differently (HDMI-1, or HDMI-A-0 and DisplayPort-0 counting from zero), so
+    a screen is matched across the two by its EDID, never by name.
+    """
+    found = []
+    if DRM_ROOT.is_dir():
+        for connector in sorted(DRM_ROOT.glob("card*-*")):
+            try:
+                if (connector / "status").read_text().strip() != "connected":
+                    continue
+                edid = (connector / "edid").read_bytes()
+            except OSError:
+                continue
+            found.append((connector.name.split("-", 1)[1], connector, edid))
+    return found
+
+class SysfsBacklightBackend(DisplayBackend):
+    """Laptop panel backlight through /sys/class/backlight."""
+
+    name = "sysfs"
+    ROOT = Path("/sys/class/backlight")
+    # A backlight always belongs to the built-in panel, on one of these DRM connector types
+    PANEL_CONNECTORS = ("eDP", "LVDS", "DSI")
+
+    def __init__(self, device=None):
+        devices = self.devices()
+        if device is not None:
+            devices = [d for d in devices if d.name == device]
+        if not devices:
+            raise IOError("No writable backlight device found")
+        self.device = devices[0]
+        self.max_brightness = int((self.device / "max_brightness").read_text())
+        self._file = open(self.device / "brightness", "w")
+
+    @classmethod
+    def devices(cls):
+        if not cls.ROOT.is_dir():
+            return []
+        return sorted(d for d in cls.ROOT.iterdir() if os.access(d / "brightness", os.W_OK))
+
+    @classmethod
+    def available(cls):
+        return bool(cls.devices())
+
+    @classmethod
+    def discover(cls):
+        return [d.name for d in cls.devices()]
+
+    @classmethod
+    def panel_edids(cls):
+        """EDIDs of the built-in panels, the screens a backlight dims."""
+        return {edid for name, _, edid in drm_connectors()
+                if edid and name.rsplit("-", 1)[0] in cls.PANEL_CONNECTORS}
+
+    def set_brightness(self, percent):
+        self._file.seek(0)
+        self._file.write(str(round(percent * self.max_brightness / 100)))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+class DdcciBackend(DisplayBackend):
+    """External monitor brightness over DDC/CI, written straight to /dev/i2c-*."""
+
+    name = "ddcci"
+    timeout = 2.0  # DDC/CI monitors take tens to hundreds of milliseconds per command
+    I2C_SLAVE = 0x0703
+    DDC_ADDRESS = 0x37
+    VCP_BRIGHTNESS = 0x10
+
+    def __init__(self, bus=None):
+        buses = [bus] if bus is not None else self.buses()
+        if not buses:
+            raise IOError("No DDC/CI capable display found")
+        import fcntl
+        self.bus = buses[0]
+        self._fd = os.open(self.bus, os.O_RDWR)
+        fcntl.ioctl(self._fd, self.I2C_SLAVE, self.DDC_ADDRESS)
+
+    @classmethod
+    def connectors(cls):
+        """(connector name, I2C device, EDID) of connected DRM outputs that expose a DDC channel."""
+        found = []
+        for name, connector, edid in drm_connectors():
+            try:
+                bus = "/dev/" + os.path.basename(os.readlink(connector / "ddc"))
+            except OSError:
+                continue
+            if os.access(bus, os.R_OK | os.W_OK):
+                found.append((name, bus, edid))
+        return found
+
+    @classmethod
+    def buses(cls):
+        return [bus for _, bus, _ in cls.connectors()]
+
+    @classmethod
+    def available(cls):
+        return bool(cls.buses())
+
+    @classmethod
+    def discover(cls):
+        return cls.buses()
+
+    def set_brightness(self, percent):
+        value = int(percent)
+        # Set VCP feature: source address, length, opcode, feature, value, checksum
+        packet = [0x51, 0x84, 0x03, self.VCP_BRIGHTNESS, value >> 8, value & 0xFF]
+        checksum = self.DDC_ADDRESS << 1
+        for byte in packet:
+            checksum ^= byte
+        os.write(self._fd, bytes(packet + [checksum]))
+
+    def close(self):
+        os.close(self._fd)
+
+class XrandrBackend(DisplayBackend):
+    """Software brightness through the X server (RandR output gamma scaling)."""
+
+    name = "xrandr"
+    timeout = 1.0
+
+    def __init__(self, output=None):
+        self.output = output or self.outputs()[0]
+
+    @staticmethod
+    def outputs():
+        result = subprocess.run(["xrandr", "--query"], capture_output=True, text=True, check=True)
+        outputs = [line.split()[0] for line in result.stdout.splitlines() if " connected" in line]
+        if not outputs:
+            raise IOError("xrandr reports no connected outputs")
+        return outputs
+
+    @classmethod
+    def available(cls):
+        return bool(os.environ.get("DISPLAY")) and shutil.which("xrandr") is not None
+
+    @classmethod
+    def discover(cls):
+        return cls.outputs() if cls.available() else []
+
+    @staticmethod
+    def edids():
+        """{output: EDID bytes} of connected outputs, from the EDID property of xrandr --prop."""
+        result = subprocess.run(["xrandr", "--prop"], capture_output=True, text=True, check=True)
+        found = {}
+        output = lines = None
+        for line in result.stdout.splitlines():
+            text = line.strip()
+            if not line[:1].isspace():
+                output = line.split()[0] if " connected" in line else None
+                lines = None
+            elif output and text == "EDID:":
+                lines = found.setdefault(output, [])
+            elif lines is not None and re.fullmatch(r"[0-9a-fA-F]+", text):
+                lines.append(text)
+            else:
+                lines = None
+        return {output: bytes.fromhex("".join(lines)) for output, lines in found.items() if lines}
+
+    def set_brightness(self, percent):
+        # Never go fully black; a zero scale makes the screen unreadable
+        scale = max(percent, 10) / 100
+        subprocess.run(["xrandr", "--output", self.output, "--brightness", f"{scale:.2f}"], check=True)
+
+class WmiBackend(DisplayBackend):
+    """Windows WMI brightness through one long-lived PowerShell process."""
+
+    name = "wmi"
+    timeout = 2.0
+    QUERY = "Get-WmiObject -Namespace root/WMI -Class WmiMonitorBrightnessMethods"
+
+    def __init__(self, instance=0):
+        self.instance = int(instance)
+        self._shell = subprocess.Popen(["powershell", "-NoLogo", "-NoProfile", "-Command", "-"],
+                                       stdin=subprocess.PIPE, stdout=subprocess.DEVNULL,
+                                       stderr=subprocess.DEVNULL, text=True)
+        # Look this monitor's WMI object up once; later writes reuse $luminar
+        self._send(f"$luminar = @({self.QUERY})[{self.instance}]")
+
+    @classmethod
+    def available(cls):
+        return os.name == "nt"
+
+    @classmethod
+    def discover(cls):
+        if not cls.available():
+            return []
+        result = subprocess.run(["powershell", "-NoLogo", "-NoProfile", "-Command", f"@({cls.QUERY}).Count"],
+                                capture_output=True, text=True, timeout=10)
+        return list(range(int(result.stdout.strip() or 0)))
+
+    def _send(self, line):
+        if self._shell.poll() is not None:
+            raise IOError("PowerShell backend process exited")
+        self._shell.stdin.write(line + "\n")
+        self._shell.stdin.flush()
+
+    def set_brightness(self, percent):
+        # The first argument is WMI's timeout in seconds, not a monitor index
+        self._send(f"$luminar.WmiSetBrightness(1, {int(percent)}) | Out-Null")
+
+    def close(self):
+        if self._shell.poll() is None:
+            self._shell.stdin.close()
+            self._shell.wait(timeout=2)
+
+@functools.lru_cache(maxsize=1)
+def _randr_api():
+    """(ctypes, libX11, libXrandr) with the RandR calls the gamma backend uses declared."""
+    import ctypes
+    import ctypes.util
+    x11_path, xrandr_path = ctypes.util.find_library("X11"), ctypes.util.find_library("Xrandr")
+    if not (x11_path and xrandr_path):
+        raise IOError("libX11 or libXrandr not found")
+    c_ulong, c_int, c_void_p = ctypes.c_ulong, ctypes.c_int, ctypes.c_void_p
+
+    class ScreenResources(ctypes.Structure):
+        _fields_ = [("timestamp", c_ulong), ("config_timestamp", c_ulong), ("ncrtc", c_int),
+                    ("crtcs", ctypes.POINTER(c_ulong)), ("noutput", c_int), ("outputs", ctypes.POINTER(c_ulong)),
+                    ("nmode", c_int), ("modes", c_void_p)]
+
+    class OutputInfo(ctypes.Structure):
+        _fields_ = [("timestamp", c_ulong), ("crtc", c_ulong), ("name", ctypes.c_char_p), ("name_len", c_int),
+                    ("mm_width", c_ulong), ("mm_height", c_ulong), ("connection", ctypes.c_ushort),
+                    ("subpixel_order", ctypes.c_ushort), ("ncrtc", c_int), ("crtcs", ctypes.POINTER(c_ulong)),
+                    ("nclone", c_int), ("clones", ctypes.POINTER(c_ulong)), ("nmode", c_int),
+                    ("npreferred", c_int), ("modes", ctypes.POINTER(c_ulong))]
+
+    class CrtcGamma(ctypes.Structure):
+        _fields_ = [("size", c_int)] + [(channel, ctypes.POINTER(ctypes.c_ushort)) for channel in ("red", "green", "blue")]
+
+    x11 = ctypes.cdll.LoadLibrary(x11_path)
+    xrandr = ctypes.cdll.LoadLibrary(xrandr_path)
+    x11.XOpenDisplay.argtypes = [ctypes.c_char_p]
+    x11.XOpenDisplay.restype = c_void_p
+    x11.XDefaultRootWindow.argtypes = [c_void_p]
+    x11.XDefaultRootWindow.restype = c_ulong
+    x11.XInternAtom.argtypes = [c_void_p, ctypes.c_char_p, c_int]
+    x11.XInternAtom.restype = c_ulong
+    x11.XFree.argtypes = [c_void_p]
+    x11.XFlush.argtypes = [c_void_p]
+    x11.XCloseDisplay.argtypes = [c_void_p]
+    xrandr.XRRGetScreenResourcesCurrent.argtypes = [c_void_p, c_ulong]
+    xrandr.XRRGetScreenResourcesCurrent.restype = ctypes.POINTER(ScreenResources)
+    xrandr.XRRFreeScreenResources.argtypes = [ctypes.POINTER(ScreenResources)]
+    xrandr.XRRGetOutputInfo.argtypes = [c_void_p, ctypes.POINTER(ScreenResources), c_ulong]
+    xrandr.XRRGetOutputInfo.restype = ctypes.POINTER(OutputInfo)
+    xrandr.XRRFreeOutputInfo.argtypes = [ctypes.POINTER(OutputInfo)]
+    xrandr.XRRGetOutputProperty.argtypes = [c_void_p, c_ulong, c_ulong, ctypes.c_long, ctypes.c_long, c_int, c_int,
+                                            c_ulong, ctypes.POINTER(c_ulong), ctypes.POINTER(c_int),
+                                            ctypes.POINTER(c_ulong), ctypes.POINTER(c_ulong),
+                                            ctypes.POINTER(ctypes.POINTER(ctypes.c_ubyte))]
+    xrandr.XRRGetCrtcGammaSize.argtypes = [c_void_p, c_ulong]
+    xrandr.XRRGetCrtcGammaSize.restype = c_int
+    xrandr.XRRAllocGamma.argtypes = [c_int]
+    xrandr.XRRAllocGamma.restype = ctypes.POINTER(CrtcGamma)
+    xrandr.XRRSetCrtcGamma.argtypes = [c_void_p, c_ulong, ctypes.POINTER(CrtcGamma)]
+    xrandr.XRRFreeGamma.argtypes = [ctypes.POINTER(CrtcGamma)]
+    return ctypes, x11, xrandr
+
+class X11GammaBackend(DisplayBackend):
+    """Software brightness and color temperature for one X output, written to
+    its CRTC's RandR gamma ramp through libXrandr with ctypes.
+
+    The ramp is the cached color temperature table scaled by the brightness,
+    so this backend is the only writer of the output's gamma and the two
+    settings compose instead of resetting each other. With dim=False (a
+    hardware backend already controls the screen's brightness) it only
+    applies color temperature.
+    """
+
+    name = "gamma"
+    capabilities = frozenset({'brightness', 'color_temperature'})
+    RR_CONNECTED = 0
+
+    def __init__(self, output=None, dim=True):
+        self._ctypes, self._x11, self._xrandr = _randr_api()
+        self._display = self._x11.XOpenDisplay(None)
+        if not self._display:
+            raise IOError("Cannot open X display")
+        try:
+            outputs = self.outputs(self._display)
+            output = output if output is not None else next(iter(outputs), None)
+            if output not in outputs:
+                raise IOError(f"No active X output named {output}")
+            self.output = output
+            self._crtc = outputs[output][0]
+            self.size = self._xrandr.XRRGetCrtcGammaSize(self._display, self._crtc)
+            if self.size < 2:
+                raise IOError(f"Output {output} has no gamma ramp")
+        except Exception:
+            self._x11.XCloseDisplay(self._display)
+            raise
+        self._gamma = self._xrandr.XRRAllocGamma(self.size)
+        if not dim:
+            self.capabilities = frozenset({'color_temperature'})
+        self._buffer = np.empty((3, self.size), np.uint16)
+        self.kelvin = NEUTRAL_TEMPERATURE
+        self.scale = 1.0
+        self._applied = None  # (cached ramp, scale) last written
+
+    @classmethod
+    def available(cls):
+        if not os.environ.get("DISPLAY") or os.name == "nt":
+            return False
+        try:
+            _randr_api()
+        except OSError:
+            return False
+        return True
+
+    @classmethod
+    def discover(cls):
+        return list(cls.outputs()) if cls.available() else []
+
+    @staticmethod
+    def outputs(display=None):
+        """{output name: (CRTC, EDID bytes)} of the connected X outputs that are lit."""
+        ctypes, x11, xrandr = _randr_api()
+        own = display is None
+        if own:
+            display = x11.XOpenDisplay(None)
+            if not display:
+                raise IOError("Cannot open X display")
+        try:
+            resources = xrandr.XRRGetScreenResourcesCurrent(display, x11.XDefaultRootWindow(display))
+            if not resources:
+                raise IOError("The X server does not support RandR")
+            edid_atom = x11.XInternAtom(display, b"EDID", True)
+            found = {}
+            try:
+                for i in range(resources.contents.noutput):
+                    output = resources.contents.outputs[i]
+                    info = xrandr.XRRGetOutputInfo(display, resources, output)
+                    if not info:
+                        continue
+                    try:
+                        if info.contents.connection == X11GammaBackend.RR_CONNECTED and info.contents.crtc:
+                            edid = b""
+                            data = ctypes.POINTER(ctypes.c_ubyte)()
+                            kind, size = ctypes.c_ulong(), ctypes.c_int()
+                            count, remaining = ctypes.c_ulong(), ctypes.c_ulong()
+                            if edid_atom and xrandr.XRRGetOutputProperty(
+                                    display, output, edid_atom, 0, 128, False, False, 0, ctypes.byref(kind),
+                                    ctypes.byref(size), ctypes.byref(count), ctypes.byref(remaining),
+                                    ctypes.byref(data)) == 0 and data:
+                                edid = bytes(data[:count.value])
+                                x11.XFree(data)
+                            found[info.contents.name.decode()] = (info.contents.crtc, edid)
+                    finally:
+                        xrandr.XRRFreeOutputInfo(info)
+            finally:
+                xrandr.XRRFreeScreenResources(resources)
+            return found
+        finally:
+            if own:
+                x11.XCloseDisplay(display)
+
+    def set_brightness(self, percent):
+        # Never go fully black, as with xrandr; a zero scale makes the screen unreadable
+        self.scale = max(percent, 10) / 100
+        self._apply()
+
+    def set_color_temperature(self, kelvin):
+        self.kelvin = kelvin
+        self._apply()
+
+    def _apply(self):
+        ramp = gamma_ramp(self.kelvin, self.size)
+        if self._applied is not None and self._applied[0] is ramp and self._applied[1] == self.scale:
+            return  # Same cached table at the same brightness as the last write
+        np.multiply(ramp, self.scale, out=self._buffer, casting="unsafe")
+        gamma = self._gamma.contents
+        for channel, values in zip((gamma.red, gamma.green, gamma.blue), self._buffer):
+            self._ctypes.memmove(channel, values.ctypes.data, values.nbytes)
+        self._xrandr.XRRSetCrtcGamma(self._display, self._crtc, self._gamma)
+        self._x11.XFlush(self._display)
+        self._applied = (ramp, self.scale)
+
+    def close(self):
+        if self._display:
+            # Leave the screen neutral rather than tinted or dimmed
+            if self._applied is not None:
+                self.kelvin, self.scale = NEUTRAL_TEMPERATURE, 1.0
+                self._apply()
+            self._xrandr.XRRFreeGamma(self._gamma)
+            self._x11.XCloseDisplay(self._display)
+            self._display = None
+
+# Auto-detection order; the fake backend is the fallback when nothing else works
+DISPLAY_BACKENDS = {
+    "sysfs": SysfsBacklightBackend,
+    "ddcci": DdcciBackend,
+    "gamma": X11GammaBackend,
+    "xrandr": XrandrBackend,
+    "wmi": WmiBackend,
+    "fake": FakeDisplayBackend,
+}
+
+DisplayCurve = namedtuple("DisplayCurve", ["minimum", "maximum", "gamma", "offset"], defaults=(0, 100, 1.0, 0))
+
+def apply_display_curve(percent, curve):
+    """Map the engine's 0-100 brightness onto one display's usable range."""
+    x = max(min(percent, 100), 0) / 100
+    value = curve.minimum + (curve.maximum - curve.minimum) * x ** curve.gamma + curve.offset
+    return max(min(value, 100), 0)
+
+class Display:
+    """One attached screen: its backend, brightness curve and write state."""
+
+    def __init__(self, backend_class, device, **options):
+        self.kind = backend_class.name
+        self.device = device
+        self.id = f"{self.kind}:{device}"
+        self.backend = backend_class(device, **options) if device is not None else backend_class(**options)
+        # Taken from the instance; a gamma backend drops brightness when hardware dims its screen
+        self.capabilities = self.backend.capabilities
+        self.timeout = backend_class.timeout
+        self.curve = DisplayCurve()
+        self.pending = None
+        self.failures = 0
+
+    def write(self, setting, value):
+        if setting == 'brightness':
+            value = int(round(apply_display_curve(value, self.curve)))
+        getattr(self.backend, "set_" + setting)(value)
+
+    def describe(self):
+        return {'id': self.id, 'kind': self.kind, 'capabilities': sorted(self.capabilities),
+                'curve': self.curve._asdict(), 'failures': self.failures}
+
+class DisplayWriteError(IOError):
+    """Some displays failed or timed out while the others were updated."""
+
+    def __init__(self, setting, failures, attempted):
+        self.setting = setting
+        self.failures = failures
+        details = "; ".join(f"{display.id}: {error}" for display, error in failures)
+        super().__init__(f"{len(failures)} of {attempted} displays failed: {details}")
+
+class DisplayRegistry(DisplayBackend):
+    """Every attached display, discovered once and driven as one backend.
+
+    Discovery asks each backend kind for its devices when the registry is
+    created (or on refresh()). Screens are matched across backends by EDID.
+    A gamma output whose screen a hardware backend already dims only gets
+    color temperature. An xrandr output is skipped when hardware or the
+    gamma backend already controls it, so no screen is dimmed twice and
+    each output's gamma ramp has a single writer.
+    A write fans out over a bounded thread pool, with each display's value
+    taken from its own curve. A display that has not answered within its
+    backend's timeout is reported in a DisplayWriteError, and it is skipped
+    until its last write returns.
+    """
+
+    def __init__(self, kinds=None, max_workers=4):
+        self.kinds = list(kinds) if kinds else [kind for kind in DISPLAY_BACKENDS if kind != "fake"]
+        self.max_workers = max_workers
+        self.displays = []
+        self._pool = None
+        self.refresh()
+
+    @property
+    def name(self):
+        return "+".join(dict.fromkeys(display.kind for display in self.displays))
+
+    @property
+    def capabilities(self):
+        return frozenset().union(*(display.capabilities for display in self.displays))
+
+    def refresh(self):
+        """Discover the attached displays again, keeping the curves of known ones."""
+        from concurrent.futures import ThreadPoolExecutor
+        curves = {display.id: display.curve for display in self.displays}
+        self.close()
+        claimed = set()  # EDIDs of the screens a hardware backend controls
+        gamma_outputs = set()  # X outputs whose gamma ramp the gamma backend owns
+        for kind in self.kinds:
+            backend_class = DISPLAY_BACKENDS[kind]
+            edids = {}
+            try:
+                devices = backend_class.discover()
+                if kind == "gamma" and devices:
+                    edids = {output: edid for output, (_, edid) in X11GammaBackend.outputs().items()}
+                elif kind == "xrandr":
+                    devices = [device for device in devices if device not in gamma_outputs]
+                    if claimed and devices:
+                        edids = XrandrBackend.edids()
+                        devices = [device for device in devices if edids.get(device) not in claimed]
+            except Exception as e:
+                print(f"Display backend '{kind}' unavailable: {e}")
+                continue
+            for device in devices:
+                options = {}
+                if kind == "gamma":
+                    options["dim"] = edids.get(device) not in claimed
+                try:
+                    display = Display(backend_class, device, **options)
+                except Exception as e:
+                    print(f"Display '{kind}:{device}' unavailable: {e}")
+                    continue
+                display.curve = curves.get(display.id, display.curve)
+                self.displays.append(display)
+                if kind == "sysfs":
+                    claimed.update(SysfsBacklightBackend.panel_edids())
+                elif kind == "ddcci":
+                    claimed.update(edid for _, bus, edid in DdcciBackend.connectors() if bus == device and edid)
+                elif kind == "gamma":
+                    gamma_outputs.add(device)
+        if not self.displays:
+            print("No display backend available; brightness changes will not be applied")
+            self.displays.append(Display(FakeDisplayBackend, "fake0"))
+        self._pool = ThreadPoolExecutor(max_workers=min(self.max_workers, len(self.displays)),
+                                        thread_name_prefix="display")
+        return self.displays
+
+    def set_curves(self, curves):
+        """Apply {display id: {"min", "max", "gamma", "offset"}}; unlisted displays get the identity curve."""
+        for display in self.displays:
+            spec = curves.get(display.id) or curves.get(display.kind) or {}
+            display.curve = DisplayCurve(spec.get("min", 0), spec.get("max", 100),
+                                         spec.get("gamma", 1.0), spec.get("offset", 0))
+
+    def describe(self):
+        return [display.describe() for display in self.displays]
+
+    def set_brightness(self, percent):
+        self._apply('brightness', percent)
+
+    def set_color_temperature(self, kelvin):
+        self._apply('color_temperature', kelvin)
+
+    def _apply(self, setting, value):
+        import concurrent.futures
+        targets = [display for display in self.displays if setting in display.capabilities]
+        if not targets:
+            raise NotImplementedError(f"No attached display can adjust {setting.replace('_', ' ')}")
+        failures = []
+        started = time.monotonic()
+        for display in targets:
+            if display.pending is not None and not display.pending.done():
+                failures.append((display, TimeoutError("previous write has not returned")))
+                continue
+            display.pending = self._pool.submit(display.write, setting, value)
+        for display in targets:
+            if any(failed is display for failed, _ in failures):
+                continue
+            try:
+                display.pending.result(timeout=max(started + display.timeout - time.monotonic(), 0))
+            except concurrent.futures.TimeoutError:
+                failures.append((display, TimeoutError(f"no reply within {display.timeout:g} s")))
+            except Exception as e:
+                failures.append((display, e))
+        for display, _ in failures:
+            display.failures += 1
+        if failures:
+            raise DisplayWriteError(setting, failures, len(targets))
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False)
+            self._pool = None
+        for display in self.displays:
+            try:
+                display.backend.close()
+            except Exception as e:
+                print(f"Failed to close display '{display.id}': {e}")
+        self.displays = []
+
+def create_display_backend(name=None):
+    """Registry of the attached displays, limited to one backend kind if name is given."""
+    return DisplayRegistry([name] if name is not None else None)
+
+class DisplayController:
+    """Applies display settings through a backend from a single writer thread.
+
+    Callers only record the latest target. Requests that arrive within
+    coalesce_window of each other are merged into one write, and writes that
+    would not change the applied value are dropped.
+    """
+
+    def __init__(self, backend, coalesce_window=0.05, on_error=None):
+        self.backend = backend
+        self.coalesce_window = coalesce_window
+        self.on_error = on_error
+        self.applied = {}
+        self.writes = 0
+        self.merged = 0
+        self.dropped = 0
+        self._pending = {}
+        self._busy = False
+        self._cond = threading.Condition()
+        self._closed = False
+        threading.Thread(target=self._write_loop, name="display-writer", daemon=True).start()
+
+    def set_brightness(self, percent):
+        self._request('brightness', int(round(max(min(percent, 100), 0))))
+
+    def set_color_temperature(self, kelvin):
+        self._request('color_temperature', int(kelvin))
+
+    def _request(self, setting, value):
+        with self._cond:
+            if setting in self._pending:
+                self.merged += 1
+            self._pending[setting] = value
+            self._cond.notify_all()
+
+    def flush(self, timeout=None):
+        """Block until every pending request has been written or dropped."""
+        with self._cond:
+            return self._cond.wait_for(lambda: not self._pending and not self._busy, timeout)
+
+    def _write_loop(self):
+        while True:
+            with self._cond:
+                self._cond.wait_for(lambda: self._pending or self._closed)
+                if self._closed:
+                    return
+            # Let a burst of requests settle before writing
+            time.sleep(self.coalesce_window)
+            with self._cond:
+                pending, self._pending = self._pending, {}
+                self._busy = True
+
+            metrics.incr("wakeups_display_writer")
+            for setting, value in pending.items():
+                if self.applied.get(setting) == value:
+                    self.dropped += 1
+                    continue
+                try:
+                    with metrics.timer("display_write_" + setting):
+                        getattr(self.backend, "set_" + setting)(value)
+                except Exception as e:
+                    if self.on_error:
+                        self.on_error(setting, e)
+                    continue
+                self.applied[setting] = value
+                self.writes += 1
+
+            with self._cond:
+                self._busy = False
+                self._cond.notify_all()
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+        self.backend.close()
+
+def ramp_values(start, target, steps, curve="ease", gamma=2.2):
+    """Values stepping from start to target (inclusive) along a transition curve.
+
+    "linear" moves in equal steps, "ease" is an exponential ease-out and
+    "gamma" interpolates in perceptual (value ** 1/gamma) space.
+    """
+    t = np.linspace(0.0, 1.0, steps + 1)[1:]
+    if curve == "linear":
+        return start + (target - start) * t
+    if curve == "ease":
+        return start + (target - start) * (1 - np.exp(-4 * t)) / (1 - np.exp(-4))
+    if curve == "gamma":
+        scale = max(abs(start), abs(target)) or 1
+        a, b = (start / scale) ** (1 / gamma), (target / scale) ** (1 / gamma)
+        return scale * (a + (b - a) * t) ** gamma
+    raise ValueError(f"Unknown transition curve: {curve}")
+
+RampRecord = namedtuple("RampRecord", ["setting", "start", "target", "steps", "planned", "elapsed", "cancelled"])
+
+class TransitionEngine:
+    """Ramps display settings toward their targets instead of jumping.
+
+    Each ramp is computed once as a NumPy array of integer steps (repeats
+    removed) and played back by one thread at no more than max_rate writes per
+    second. A new target cancels the ramp in flight and starts from the last
+    value written. Finished and cancelled ramps are kept in ramp_log.
+    """
+
+    CURVES = ("linear", "ease", "gamma")
+    DEFAULT_DURATIONS = {'brightness': 1.5, 'color_temperature': 5.0}
+
+    def __init__(self, controller, durations=None, max_rate=10.0, curve="ease"):
+        self.controller = controller
+        self.durations = dict(self.DEFAULT_DURATIONS, **(durations or {}))
+        self.max_rate = max_rate
+        self.curve = curve
+        self.current = {}
+        self.ramp_log = deque(maxlen=64)
+        self.ramps_started = 0
+        self.ramps_cancelled = 0
+        self._ramps = {}
+        self._cond = threading.Condition()
+        self._closed = False
+        threading.Thread(target=self._play, name="transitions", daemon=True).start()
+
+    @staticmethod
+    def profile_settings(profile):
+        """configure() arguments for a profile's "transitions": {"curve", "brightness", "color_temperature"}."""
+        spec = profile.get("transitions") or {}
+        return {'curve': spec.get("curve", "ease"),
+                'durations': {setting: spec[setting] for setting in TransitionEngine.DEFAULT_DURATIONS if setting in spec}}
+
+    def configure(self, curve="ease", durations=None):
+        """Use curve and durations (seconds per setting) from the next ramp on; ramps in flight keep theirs."""
+        with self._cond:
+            self.curve = curve
+            self.durations = dict(self.DEFAULT_DURATIONS, **(durations or {}))
+
+    def set_target(self, setting, value):
+        value = int(round(value))
+        with self._cond:
+            ramp = self._ramps.pop(setting, None)
+            if ramp is not None:
+                self._finish(ramp, cancelled=True)
+            start = self.current.get(setting)
+            if start is None or start == value:
+                # Nothing to ramp from; apply directly
+                self._write(setting, value)
+            else:
+                steps = max(int(self.durations.get(setting, 1.0) * self.max_rate), 1)
+                values = np.rint(ramp_values(start, value, steps, self.curve)).astype(np.int64)
+                keep = np.empty(len(values), np.bool_)
+                keep[0] = values[0] != start
+                np.not_equal(values[1:], values[:-1], out=keep[1:])
+                values = values[keep]
+                now = time.monotonic()
+                due = now + np.arange(1, len(values) + 1) / self.max_rate
+                self._ramps[setting] = {'setting': setting, 'start': start, 'target': value,
+                                        'values': values, 'due': due, 'index': 0, 'began': now}
+                self.ramps_started += 1
+            self._cond.notify_all()
+
+    def _write(self, setting, value):
+        self.current[setting] = value
+        getattr(self.controller, "set_" + setting)(value)
+
+    def _finish(self, ramp, cancelled=False):
+        if cancelled:
+            self.ramps_cancelled += 1
+        planned = len(ramp['values']) / self.max_rate
+        elapsed = time.monotonic() - ramp['began']
+        self.ramp_log.append(RampRecord(ramp['setting'], ramp['start'], ramp['target'], len(ramp['values']),
+                                        planned, elapsed, cancelled))
+        if not cancelled:
+            # How far playback fell behind the planned ramp duration
+            metrics.observe("ramp_overrun_" + ramp['setting'], max(elapsed - planned, 0.0))
+
+    def _play(self):
+        with self._cond:
+            while not self._closed:
+                if not self._ramps:
+                    self._cond.wait()
+                    continue
+                metrics.incr("wakeups_transitions")
+                ramp = min(self._ramps.values(), key=lambda r: r['due'][r['index']])
+                timeout = ramp['due'][ramp['index']] - time.monotonic()
+                if timeout > 0:
+                    self._cond.wait(timeout)
+                    continue
+                self._write(ramp['setting'], int(ramp['values'][ramp['index']]))
+                ramp['index'] += 1
+                if ramp['index'] == len(ramp['values']):
+                    del self._ramps[ramp['setting']]
+                    self._finish(ramp)
+
+    def close(self):
+        with self._cond:
+            self._closed = True
+            self._cond.notify_all()
+
+class ResponseCurve:
+    """A profile's mapping from bright-pixel ratio to display brightness, as a lookup table.
+
+    Without points the curve is gain * ratio ** gamma + offset; points
+    ([[ratio, brightness], ...]) replace that with a piecewise-linear curve.
+    Either way the output is clamped to min..max. The table has one entry per
+    value of int(ratio * 255), the quantization of the original mapping, so
+    the default spec reproduces int(ratio * 255) - 30 clamped to 0..100
+    exactly. A compiled curve is never modified; switching profiles
+    replaces the whole object.
+    """
+
+    SIZE = 256
+    DEFAULTS = {"min": 0, "max": 100, "gain": 255.0, "gamma": 1.0, "offset": -30, "points": None}
+
+    def __init__(self, spec=None):
+        self.spec = dict(self.DEFAULTS, **(spec or {}))
+        x = np.arange(self.SIZE) / (self.SIZE - 1)
+        if self.spec["points"]:
+            xs, ys = zip(*sorted(self.spec["points"]))
+            values = np.interp(x, xs, ys)
+        else:
+            values = self.spec["gain"] * x ** self.spec["gamma"] + self.spec["offset"]
+        lut = np.clip(np.rint(values), self.spec["min"], self.spec["max"]).astype(np.int16)
+        lut.flags.writeable = False
+        self.lut = lut
+
+    @classmethod
+    def for_profile(cls, profile):
+        """The profile's curve; its brightness setting caps the output unless the curve sets max."""
+        spec = dict(profile.get("curve") or {})
+        if profile.get("brightness") is not None:
+            spec.setdefault("max", profile["brightness"])
+        return cls(spec)
+
+    def __call__(self, ratio):
+        return int(self.lut[min(max(int(ratio * (self.SIZE - 1)), 0), self.SIZE - 1)])
+
+class BrightnessFilter:
+    """Temporal smoothing and hysteresis between the estimate and the display.
+
+    smooth() filters the measured bright-pixel ratio with an exponential moving
+    average ("ema"), the median of the last window samples ("median") or a 1-D
+    Kalman filter ("kalman"); recent samples are kept in a preallocated ring
+    buffer. should_apply() holds the output until the new command leaves a
+    deadband around the last applied one, counting the writes it suppressed.
+    """
+
+    METHODS = ("ema", "median", "kalman")
+    # What the engine uses unless the profile's "smoothing" section says otherwise
+    PROFILE_DEFAULTS = {"method": "median", "window": 5, "deadband": 5}
+
+    def __init__(self, method="ema", window=5, alpha=0.3, process_noise=1e-4,
+                 measurement_noise=4e-3, deadband=3):
+        if method not in self.METHODS:
+            raise ValueError(f"Unknown filter method: {method}")
+        self.method = method
+        self.alpha = alpha
+        self.process_noise = process_noise
+        self.measurement_noise = measurement_noise
+        self.deadband = deadband
+        self.window = max(int(window), 1)
+        self._ring = None  # Allocated once, on the first sample
+        self._count = 0
+        self._estimate = None
+        self._variance = 1.0
+        self.applied = None
+        self.passed = 0
+        self.suppressed = 0
+
+    @classmethod
+    def for_profile(cls, profile):
+        """The profile's filter ("smoothing": {"method", "window", "alpha", "deadband"})."""
+        return cls(**dict(cls.PROFILE_DEFAULTS, **(profile.get("smoothing") or {})))
+
+    def smooth(self, value):
+        if self._ring is None:
+            self._ring = np.zeros(self.window)
+        self._ring[self._count % len(self._ring)] = value
+        self._count += 1
+        if self._estimate is None:
+            self._estimate = value
+        elif self.method == "ema":
+            self._estimate += self.alpha * (value - self._estimate)
+        elif self.method == "median":
+            self._estimate = float(np.median(self._ring[:min(self._count, len(self._ring))]))
+        else:
+            self._variance += self.process_noise
+            gain = self._variance / (self._variance + self.measurement_noise)
+            self._estimate += gain * (value - self._estimate)
+            self._variance *= 1 - gain
+        return self._estimate
+
+    def should_apply(self, command):
+        if self.applied is not None and abs(command - self.applied) < self.deadband:
+            self.suppressed += 1
+            return False
+        self.applied = command
+        self.passed += 1
+        return True
+
+    def suppression_rate(self):
+        total = self.passed + self.suppressed
+        return self.suppressed / total if total else 0.0
+
+    def reset(self):
+        self._count = 0
+        self._estimate = None
+        self._variance = 1.0
+        self.applied = None
+
+class UiDispatcher:
+    """Runs UI work posted by worker threads on the Tk main loop.
+
+    Workers only append to a deque (append/popleft need no lock), and one
+    root.after pump drains everything queued so far in a single batch. Posts
+    that share a key replace each other, so a burst of countdown updates
+    produces one canvas update.
+    """
+
+    def __init__(self, root, interval=50):
+        self.root = root
+        self.interval = interval
+        self.merged = 0
+        self._queue = deque()
+        self.root.after(self.interval, self._pump)
+
+    def post(self, func, *args, key=None, **kwargs):
+        self._queue.append((key, func, args, kwargs))
+
+    def _pump(self):
+        # Re-arm first so a modal dialog in this batch does not stall later updates
+        self.root.after(self.interval, self._pump)
+        metrics.incr("wakeups_ui_pump")
+        if not self._queue:
+            return
+        started = time.perf_counter()
+        batch = []
+        while True:
+            try:
+                batch.append(self._queue.popleft())
+            except IndexError:
+                break
+
+        newest = {key: i for i, (key, _, _, _) in enumerate(batch) if key is not None}
+        for i, (key, func, args, kwargs) in enumerate(batch):
+            if key is not None and newest[key] != i:
+                self.merged += 1
+                continue
+            try:
+                func(*args, **kwargs)
+            except Exception as e:
+                print(f"UI update failed: {e}")
+        metrics.incr("ui_callbacks", len(batch))
+        metrics.observe("ui_pump", time.perf_counter() - started)
+
+def validate_profile(profile):
+    """Check a profile's fields and return a normalized copy; raises ValueError."""
+    if not isinstance(profile, dict):
+        raise ValueError("profile must be an object")
+    checked = {}
+    for field, low, high, default in (("brightness", 0, 100, None),
+                                      ("color_temperature", 1000, 10000, None),
+                                      ("break_time", 1, 24 * 60, 25)):
+        value = profile.get(field, default)
+        if value is not None:
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+                raise ValueError(f"{field} must be a number between {low} and {high}")
+            value = int(value)
+        checked[field] = value
+
+    # Optional response curve from bright-pixel ratio to brightness (see ResponseCurve)
+    curve = profile.get("curve")
+    if curve is not None:
+        if not isinstance(curve, dict):
+            raise ValueError("curve must be an object")
+        spec = {}
+        for field, low, high in (("min", 0, 100), ("max", 0, 100), ("gain", 0, 1000),
+                                 ("gamma", 0.1, 10), ("offset", -100, 100)):
+            value = curve.get(field)
+            if value is not None:
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+                    raise ValueError(f"curve {field} must be a number between {low} and {high}")
+                spec[field] = value
+        if spec.get("min", 0) > spec.get("max", 100):
+            raise ValueError("curve min must not exceed its max")
+        points = curve.get("points")
+        if points is not None:
+            try:
+                points = sorted((float(x), float(y)) for x, y in points)
+            except (TypeError, ValueError):
+                raise ValueError("curve points must be [ratio, brightness] pairs")
+            if len(points) < 2 or len({x for x, _ in points}) != len(points):
+                raise ValueError("curve points need at least two distinct ratios")
+            if not all(0 <= x <= 1 and 0 <= y <= 100 for x, y in points):
+                raise ValueError("curve points must have ratios in 0-1 and brightness in 0-100")
+            spec["points"] = [list(point) for point in points]
+        checked["curve"] = spec
+
+    # Optional frame sampling for the estimate (see FrameSampler); roi is x, y, width, height in 0-1
+    sampling = profile.get("sampling")
+    if sampling is not None:
+        if not isinstance(sampling, dict) or sampling.get("mode") not in FrameSampler.MODES:
+            raise ValueError(f"sampling must be an object with a mode of {', '.join(FrameSampler.MODES)}")
+        spec = {"mode": sampling["mode"]}
+        factor = sampling.get("factor")
+        if factor is not None:
+            if isinstance(factor, bool) or not isinstance(factor, int) or not 1 <= factor <= 16:
+                raise ValueError("sampling factor must be a whole number between 1 and 16")
+            spec["factor"] = factor
+        roi = sampling.get("roi")
+        if roi is not None:
+            try:
+                x, y, width, height = (float(value) for value in roi)
+            except (TypeError, ValueError):
+                raise ValueError("sampling roi must be [x, y, width, height]")
+            if not (0 <= x < 1 and 0 <= y < 1 and 0 < width <= 1 - x and 0 < height <= 1 - y):
+                raise ValueError("sampling roi must lie within the frame, in fractions of its size")
+            spec["roi"] = [x, y, width, height]
+        elif spec["mode"] == "roi":
+            raise ValueError("sampling mode roi needs a roi")
+        checked["sampling"] = spec
+
+    # Optional smoothing and hysteresis (see BrightnessFilter); deadband is in brightness points
+    smoothing = profile.get("smoothing")
+    if smoothing is not None:
+        if not isinstance(smoothing, dict):
+            raise ValueError("smoothing must be an object")
+        spec = {}
+        method = smoothing.get("method")
+        if method is not None:
+            if method not in BrightnessFilter.METHODS:
+                raise ValueError(f"smoothing method must be one of {', '.join(BrightnessFilter.METHODS)}")
+            spec["method"] = method
+        for field, low, high in (("window", 1, 60), ("alpha", 0.01, 1), ("deadband", 0, 50)):
+            value = smoothing.get(field)
+            if value is not None:
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+                    raise ValueError(f"smoothing {field} must be a number between {low} and {high}")
+                spec[field] = int(value) if field == "window" else value
+        checked["smoothing"] = spec
+
+    # Optional change detection (see ChangeGate); false estimates every frame
+    gate = profile.get("change_gate")
+    if gate is not None and gate is not True:
+        if gate is False:
+            checked["change_gate"] = False
+        elif not isinstance(gate, dict):
+            raise ValueError("change_gate must be an object or false")
+        else:
+            spec = {}
+            mode = gate.get("mode")
+            if mode is not None:
+                if mode not in ChangeGate.MODES:
+                    raise ValueError(f"change_gate mode must be one of {', '.join(ChangeGate.MODES)}")
+                spec["mode"] = mode
+            for field, low, high in (("threshold", 0, 1), ("max_skips", 0, 1000)):
+                value = gate.get(field)
+                if value is not None:
+                    if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+                        raise ValueError(f"change_gate {field} must be a number between {low} and {high}")
+                    spec[field] = int(value) if field == "max_skips" else value
+            checked["change_gate"] = spec
+
+    # Optional ramp shape and length in seconds per setting (see TransitionEngine)
+    transitions = profile.get("transitions")
+    if transitions is not None:
+        if not isinstance(transitions, dict):
+            raise ValueError("transitions must be an object")
+        spec = {}
+        curve = transitions.get("curve")
+        if curve is not None:
+            if curve not in TransitionEngine.CURVES:
+                raise ValueError(f"transitions curve must be one of {', '.join(TransitionEngine.CURVES)}")
+            spec["curve"] = curve
+        for field in TransitionEngine.DEFAULT_DURATIONS:
+            value = transitions.get(field)
+            if value is not None:
+                if isinstance(value, bool) or not isinstance(value, (int, float)) or not 0 <= value <= 600:
+                    raise ValueError(f"transitions {field} must be a number of seconds between 0 and 600")
+                spec[field] = value
+        checked["transitions"] = spec
+
+    # Optional per-display curves, keyed by display id ("ddcci:/dev/i2c-4") or backend kind
+    displays = profile.get("displays", {})
+    if not isinstance(displays, dict):
+        raise ValueError("displays must be an object")
+    if displays:
+        checked["displays"] = {}
+    for display, curve in displays.items():
+        if not isinstance(curve, dict):
+            raise ValueError(f"curve for display {display} must be an object")
+        spec = {}
+        for field, low, high, default in (("min", 0, 100, 0), ("max", 0, 100, 100),
+                                          ("gamma", 0.1, 10, 1.0), ("offset", -100, 100, 0)):
+            value = curve.get(field, default)
+            if isinstance(value, bool) or not isinstance(value, (int, float)) or not low <= value <= high:
+                raise ValueError(f"{field} of display {display} must be a number between {low} and {high}")
+            spec[field] = value
+        if spec["min"] > spec["max"]:
+            raise ValueError(f"min of display {display} must not exceed its max")
+        checked["displays"][display] = spec
+    return checked
+
+class ProfileRepository(MutableMapping):
+    """Validated in-memory cache of the profiles in profiles.json.
+
+    Edits update the cache immediately and schedule a background write; edits
+    made within save_delay of each other share one write. Writes go to a
+    temporary file that replaces profiles.json atomically. The file's mtime is
+    watched so edits from another instance are merged into the cache, touching
+    only the profiles that changed.
+    """
+
+    def __init__(self, path, save_delay=0.5):
+        self.path = path
+        self.save_delay = save_delay
+        self._profiles = {}
+        self._raw = {}  # Last seen file contents per profile, to diff reloads
+        self._mtime = None
+        self._lock = threading.RLock()
+        self._save_due = None
+        self._save_cond = threading.Condition(self._lock)
+        self.reload()
+        threading.Thread(target=self._save_loop, name="profile-writer", daemon=True).start()
+
+    def __getitem__(self, name):
+        with self._lock:
+            return self._profiles[name]
+
+    def __setitem__(self, name, profile):
+        checked = validate_profile(profile)
+        with self._lock:
+            self._profiles[name] = checked
+            self.schedule_save()
+
+    def __delitem__(self, name):
+        with self._lock:
+            del self._profiles[name]
+            self.schedule_save()
+
+    def __iter__(self):
+        with self._lock:
+            return iter(list(self._profiles))
+
+    def __len__(self):
+        return len(self._profiles)
+
+    def reload(self):
+        """Merge changes made to the file by someone else; returns the changed names."""
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            return set()
+        with self._lock:
+            if mtime == self._mtime or self._save_due is not None:
+                return set()
+            try:
+                with open(self.path, 'r') as file:
+                    raw = json.load(file)
+            except (OSError, ValueError) as e:
+                print(f"Could not read {self.path}: {e}")
+                return set()
+            self._mtime = mtime
+
+            changed = {name for name in self._raw.keys() - raw.keys() if name in self._profiles}
+            for name in changed:
+                del self._profiles[name]
+            for name, profile in raw.items():
+                if self._raw.get(name) == profile and name in self._profiles:
+                    continue
+                try:
+                    self._profiles[name] = validate_profile(profile)
+                except ValueError as e:
+                    print(f"Ignoring invalid profile '{name}': {e}")
+                    continue
+                changed.add(name)
+            self._raw = raw
+            return changed
+
+    def watch(self, interval=2.0, on_change=None):
+        """Poll the file's mtime in the background and reload when it changes."""
+        def poll():
+            while True:
+                time.sleep(interval)
+                metrics.incr("wakeups_profile_watcher")
+                changed = self.reload()
+                if changed and on_change:
+                    on_change(changed)
+        threading.Thread(target=poll, name="profile-watcher", daemon=True).start()
+
+    def schedule_save(self):
+        with self._lock:
+            self._save_due = time.monotonic() + self.save_delay
+            self._save_cond.notify_all()
+
+    def _save_loop(self):
+        with self._lock:
+            while True:
+                if self._save_due is None:
+                    self._save_cond.wait()
+                elif self._save_due > time.monotonic():
+                    self._save_cond.wait(self._save_due - time.monotonic())
+                else:
+                    self._write()
+
+    def _write(self):
+        # Called with the lock held
+        directory = os.path.dirname(os.path.abspath(self.path))
+        try:
+            with tempfile.NamedTemporaryFile('w', dir=directory, prefix='.profiles-', suffix='.tmp',
+                                             delete=False) as file:
+                json.dump(self._profiles, file, indent=4)
+                file.flush()
+                os.fsync(file.fileno())
+            try:
+                # NamedTemporaryFile creates 0600; keep the mode profiles.json already had
+                os.chmod(file.name, stat.S_IMODE(os.stat(self.path).st_mode))
+            except FileNotFoundError:
+                pass
+            os.replace(file.name, self.path)
+            self._mtime = os.stat(self.path).st_mtime_ns
+            self._raw = json.loads(json.dumps(self._profiles))
+        except OSError as e:
+            print(f"Failed to save profiles: {e}")
+        self._save_due = None
+        self._save_cond.notify_all()
+
+    def flush(self):
+        """Write pending edits now (used at exit)."""
+        with self._lock:
+            if self._save_due is not None:
+                self._write()
+
+class BrightnessEngine:
+    """The capture -> estimate -> smooth -> apply loop, without any UI.
+
+    The Tk window and the headless daemon both drive one of these. Messages for
+    the user go through notify(title, message, level), which prints unless the
+    owner supplies something else. The display backend is opened on first start.
+    """
+
+    def __init__(self, profiles, notify=None, backend=None, camera=None, idle_source=None):
+        self.profiles = profiles
+        self.notify = notify or (lambda title, message, level="info": print(f"{title}: {message}"))
+        self.backend_name = backend
+        self.current_profile = None
+        self.current_profile_name = None
+        self.running = False
+        self.starting = False
+        # Held through start() and stop(), which the control socket and the UI may call at once
+        self._lifecycle_lock = threading.Lock()
+        self.started_at = None
+        self.camera = camera or get_camera_session(0)
+        if isinstance(self.camera, CameraSession):
+            self.camera.error_listeners.append(self.report_camera_error)
+        self.sampler = default_sampler()
+        self.change_gate = ChangeGate.for_profile({})
+        # Luminance histograms of recently estimated frames, for smoothing and diagnostics
+        self.histograms = HistogramRing(64)
+        self.scheduler = Scheduler()
+        self.sample_interval = AdaptiveInterval(minimum=1.0, maximum=60.0)
+        self.brightness_filter = BrightnessFilter.for_profile({})
+        self.camera_parked = False
+        self.process_watcher = ProcessWatcher(OVERRIDE_APPS, on_start=self.on_watched_app_started,
+                                              on_stop=self.on_watched_app_stopped)
+        self.override = None  # Name of the app holding the brightness override
+        self.idle_source_name = idle_source
+        self.idle_monitor = None  # Created on first start; None when no idle source works
+        self.user_idle = False
+        self.active_brightness = None
+        self.display = None
+        self.transitions = None
+        self.last_ratio = None
+        self.last_brightness = None
+        self.response_curve = None  # Compiled on start or profile switch, so the daemon starts without NumPy
+        self.register_gauges()
+
+    def register_gauges(self):
+        metrics.gauge("running", lambda: self.running)
+        metrics.gauge("ratio", lambda: self.last_ratio)
+        metrics.gauge("brightness", lambda: self.last_brightness)
+        metrics.gauge("sample_interval_seconds", lambda: self.sample_interval.interval)
+        metrics.gauge("camera_connected", lambda: self.camera.connected)
+        metrics.gauge("suppressed_writes", lambda: self.brightness_filter.suppressed)
+        metrics.gauge("sampling_max_error", lambda: self.sampler.error_max)
+        metrics.gauge("skip_rate", lambda: self.change_gate.skip_rate())
+        metrics.gauge("luminance_median", lambda: self.histograms.latest().median())
+        metrics.gauge("display_writes", lambda: self.display.writes)
+        metrics.gauge("display_merged", lambda: self.display.merged)
+        metrics.gauge("display_dropped", lambda: self.display.dropped)
+        metrics.gauge("ramps_started", lambda: self.transitions.ramps_started)
+        metrics.gauge("ramps_cancelled", lambda: self.transitions.ramps_cancelled)
+        metrics.gauge("gamma_ramp_cache_hits", lambda: _gamma_ramp.cache_info().hits)
+        metrics.gauge("gamma_ramp_cache_misses", lambda: _gamma_ramp.cache_info().misses)
+
+    def start(self):
+        with self._lifecycle_lock:
+            if self.running:
+                return False
+            # Marked before the slow display setup so status() shows it
+            self.starting = True
+            try:
+                self._start()
+            finally:
+                self.starting = False
+            return True
+
+    def prepare(self):
+        """Discover the displays and the idle source ahead of start(); callable from any thread."""
+        with self._lifecycle_lock:
+            self._prepare()
+
+    def _prepare(self):
+        # Backend discovery runs xrandr or PowerShell, so the window does this off the Tk thread
+        self.open_display()
+        if self.idle_monitor is None and self.idle_source_name != "none":
+            source = create_idle_source(self.idle_source_name)
+            if source is None:
+                self.idle_source_name = "none"  # Do not search again on every start
+            else:
+                self.idle_monitor = IdleMonitor(source, self.IDLE_AFTER, on_idle=self.on_user_idle,
+                                                on_active=self.on_user_active)
+
+    def _start(self):
+        self._prepare()
+        self.apply_display_curves()
+        if self.response_curve is None:
+            self.response_curve = ResponseCurve.for_profile(self.current_profile or {})
+        self.running = True
+        self.started_at = time.time()
+        self.camera.acquire()
+        self.camera_parked = False
+        self.sample_interval.reset()
+        self.brightness_filter.reset()
+        self.change_gate.reset()
+        # A stop while the user was away must not leave the new run thinking they still are
+        self.user_idle = False
+        self.active_brightness = None
+        self.scheduler.start()
+        self.scheduler.add("process_images", self.process_images)
+        if 'color_temperature' in self.display.backend.capabilities:
+            self.scheduler.add("adaptive_color_temperature", self.adaptive_color_temperature)
+        else:
+            print("No display can adjust color temperature; keeping the screen's own white point")
+        self.scheduler.add("manual_override", self.run_manual_override)
+        if self.idle_monitor is not None:
+            self.idle_monitor.idle = False
+            self.scheduler.add("energy_efficiency", self.run_energy_efficiency)
+
+    def open_display(self):
+        if self.display is None:
+            self.display = DisplayController(create_display_backend(self.backend_name), on_error=self.report_display_error)
+            settings = TransitionEngine.profile_settings(self.current_profile or {})
+            self.transitions = TransitionEngine(self.display, **settings)
+        return self.display
+
+    def stop(self):
+        with self._lifecycle_lock:
+            if not self.running:
+                return False
+            self.running = False
+            self.scheduler.stop()
+            if not self.camera_parked:
+                self.camera.release()
+            return True
+
+    def set_profile(self, name):
+        """Switch to a saved profile; raises KeyError for unknown names."""
+        profile = self.profiles[name]
+        # Compile before switching; the sampling thread picks the new table up on its next sample
+        self.response_curve = ResponseCurve.for_profile(profile)
+        self.current_profile = profile
+        self.current_profile_name = name
+        self.apply_profile_settings()
+        self.apply_display_curves()
+
+    def on_profiles_changed(self, names):
+        # Pick up new values if the loaded profile was edited elsewhere
+        if self.current_profile_name in names:
+            self.current_profile = self.profiles.get(self.current_profile_name)
+            if self.current_profile is None:
+                self.current_profile_name = None
+            self.response_curve = ResponseCurve.for_profile(self.current_profile or {})
+            self.apply_profile_settings()
+            self.apply_display_curves()
+
+    def apply_profile_settings(self):
+        """Rebuild the pipeline stages a profile can tune; the sampling thread uses them from its next sample."""
+        profile = self.current_profile or {}
+        self.sampler = FrameSampler.for_profile(profile)
+        self.brightness_filter = BrightnessFilter.for_profile(profile)
+        self.change_gate = ChangeGate.for_profile(profile)
+        if self.transitions is not None:
+            self.transitions.configure(**TransitionEngine.profile_settings(profile))
+
+    def apply_display_curves(self):
+        if self.display is not None:
+            self.display.backend.set_curves((self.current_profile or {}).get('displays', {}))
+
+    def status(self):
+        return {
+            'running': self.running,
+            'starting': self.starting,
+            'profile': self.current_profile_name,
+            'ratio': self.last_ratio,
+            'brightness': self.last_brightness,
+            'sample_interval': self.sample_interval.interval,
+            'camera_connected': self.camera.connected,
+            'camera_error': str(self.camera.last_error) if self.camera.last_error else None,
+            'backend': self.display.backend.name if self.display else None,
+            'displays': self.display.backend.describe() if self.display else None,
+            'color_temperature': self.transitions.current.get('color_temperature') if self.transitions else None,
+            'suppressed_writes': self.brightness_filter.suppressed,
+            'sampling': self.sampler.accuracy(),
+            'curve': self.response_curve.spec if self.response_curve else None,
+            'change_gate': self.change_gate.stats(),
+            'override': self.override,
+            'idle': self.user_idle,
+            'idle_source': self.idle_monitor.source.name if self.idle_monitor else None,
+            'luminance': self.histograms.latest().stats() if self.histograms.count else None,
+        }
+
+    def metrics_snapshot(self, enabled=None, reset=False):
+        """Turn metrics collection on or off if enabled is given, then return a snapshot."""
+        if enabled is not None:
+            metrics.enabled = bool(enabled)
+        if reset:
+            metrics.reset()
+        return metrics.snapshot()
+
+    # Sampling slower than this closes the camera between samples; it is
+    # reopened CAMERA_WAKE_LEAD seconds early so exposure can settle
+    CAMERA_PARK_AFTER = 15.0
+    CAMERA_WAKE_LEAD = 2.0
+
+    # While a watched app runs the brightness is held here instead of following the camera
+    OVERRIDE_BRIGHTNESS = 100
+    PROCESS_WATCH_INTERVAL = 2.0
+
+    # Seconds without keyboard or pointer input before the screen dims to
+    # IDLE_BRIGHTNESS and camera sampling stops until the user is back
+    IDLE_AFTER = 300.0
+    IDLE_BRIGHTNESS = 30
+
+    # Day and night color temperatures, and how long the sunrise/sunset transition takes
+    DAY_TEMPERATURE = 6500
+    NIGHT_TEMPERATURE = 3000
+    COLOR_TRANSITION = 3600.0
+
+    def process_images(self):
+        """Take one brightness sample and return the delay until the next one."""
+        if not self.running:
+            return None
+        if self.camera_parked:
+            self.wake_camera()
+
+        frame = self.take_picture()
+        if frame is None:
+            metrics.incr("camera_misses")
+            return self.sample_interval.minimum
+
+        if not self.change_gate.changed(frame):
+            # Same scene as the last estimate: keep its result and write nothing
+            metrics.incr("frames_skipped")
+            return self.next_delay(self.last_ratio)
+
+        with metrics.timer("estimate"):
+            estimate = self.sampler.estimate(frame)
+        self.histograms.append(estimate.histogram)
+        white_pixel_percentage = estimate.ratio
+        self.last_ratio = white_pixel_percentage
+        if self.override is not None:
+            # A watched app holds the brightness; keep measuring but do not write
+            return self.next_delay(white_pixel_percentage)
+        smoothed = self.brightness_filter.smooth(white_pixel_percentage)
+        adjusted_brightness = self.brightness_for(smoothed)
+        if self.brightness_filter.should_apply(adjusted_brightness):
+            self.last_brightness = adjusted_brightness
+            self.set_brightness(adjusted_brightness)
+        return self.next_delay(white_pixel_percentage)
+
+    def brightness_for(self, ratio):
+        """Display brightness (0-100) for a smoothed bright-pixel ratio, from the profile's curve."""
+        curve = self.response_curve
+        if curve is None:
+            # Only when the engine was never started, as in --replay
+            curve = self.response_curve = ResponseCurve.for_profile(self.current_profile or {})
+        return curve(ratio)
+
+    def next_delay(self, ratio):
+        """Update the adaptive interval and park the camera if sampling slows down."""
+        delay = self.sample_interval.update(ratio)
+        if delay >= self.CAMERA_PARK_AFTER:
+            self.camera.release()
+            self.camera_parked = True
+            self.scheduler.add("wake_camera", self.wake_camera, delay - self.CAMERA_WAKE_LEAD)
+        return delay
+
+    def wake_camera(self):
+        if self.running and self.camera_parked:
+            self.camera_parked = False
+            self.camera.acquire()
+
+    def adaptive_color_temperature(self):
+        """Scheduled job: follow the day/night color temperature, gradually around sunrise and sunset."""
+        if not self.running:
+            return None
+        kelvin, delay = color_temperature_at(datetime.now(), self.DAY_TEMPERATURE, self.NIGHT_TEMPERATURE,
+                                             duration=self.COLOR_TRANSITION)
+        self.set_color_temperature(quantize_temperature(kelvin))
+        # Wake for the next step of a transition, or sleep until the next boundary
+        return delay
+
+    def take_picture(self):
+        # Frames come from the shared capture session; camera errors are
+        # tracked on the session instead of popping dialogs from this thread
+        with metrics.timer("take_picture"):
+            return self.camera.read(timeout=2.0)
+
+    # Reference PIL implementation of the estimation chain; LuminanceEstimator
+    # must agree with it (see legacy_estimate)
+    def legacy_estimate(self, frame):
+        image = Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
+        preprocessed_img = self.preprocess_image(image)
+        adaptive_thresh_img = self.adaptive_threshold(preprocessed_img)
+        count = self.count_bright_pixels(preprocessed_img, np.mean(np.array(adaptive_thresh_img)))
+        return count / (preprocessed_img.width * preprocessed_img.height)
+
+    def preprocess_image(self, image):
+        enhancer = ImageEnhance.Contrast(image.convert('L'))
+        return enhancer.enhance(2)
+
+    def adaptive_threshold(self, image):
+        img_array = np.array(image.convert('L'))
+        threshold_img = np.where(img_array >= np.mean(img_array), 255, 0)
+        return Image.fromarray(threshold_img.astype(np.uint8))
+
+    def count_bright_pixels(self, image, threshold):
+        img_array = np.array(image)
+        return np.sum(img_array >= threshold)
+
+    def set_brightness(self, brightness):
+        brightness = max(min(brightness, 100), 0)  # Ensuring the brightness value is within acceptable range
+        with metrics.timer("set_brightness"):
+            self.transitions.set_target('brightness', brightness)
+
+    def set_color_temperature(self, temperature):
+        with metrics.timer("set_color_temperature"):
+            self.transitions.set_target('color_temperature', temperature)
+
+    def report_camera_error(self, error):
+        # Once per outage; the camera session only reports errors that changed
+        if self.running:
+            self.notify("Camera", f"Camera unavailable: {error}. Brightness is on hold until it is back.", "warning")
+
+    def report_display_error(self, setting, error):
+        # Printed rather than shown; a failing display would otherwise raise a dialog on every step
+        print(f"Failed to adjust {setting.replace('_', ' ')}: {error}")
+
+    def run_manual_override(self):
+        """Scheduled job: look for video conferencing apps starting or stopping."""
+        if not self.running:
+            return None
+        try:
+            self.process_watcher.scan()
+        except (OSError, subprocess.SubprocessError) as e:
+            print(f"Process scan failed: {e}")
+        return self.PROCESS_WATCH_INTERVAL
+
+    def on_watched_app_started(self, name, pid):
+        if self.override is None:
+            self.override = name
+            self.notify("Manual Override", f"Video conference detected. Manual override activated for {name}.")
+            self.set_brightness(self.OVERRIDE_BRIGHTNESS)
+
+    def on_watched_app_stopped(self, name, pid):
+        if self.override is not None and self.process_watcher.matches:
+            self.override = next(iter(self.process_watcher.matches.values()))
+        elif self.override is not None:
+            self.override = None
+            self.notify("Manual Override", f"{name} closed. Automatic brightness resumed.")
+            # Let the next sample be estimated and applied right away
+            self.change_gate.reset()
+            self.brightness_filter.reset()
+
+    def run_energy_efficiency(self):
+        """Scheduled job: check the time since the last user input."""
+        if not self.running:
+            return None
+        try:
+            return self.idle_monitor.poll()
+        except OSError as e:
+            print(f"Idle check failed: {e}")
+            return self.IDLE_AFTER
+
+    def on_user_idle(self, seconds):
+        if self.override is not None:
+            return  # Watching a meeting without touching the keyboard is not being away
+        self.user_idle = True
+        metrics.incr("idle_periods")
+        # Stop sampling entirely; the camera is closed until input resumes
+        self.scheduler.cancel("process_images")
+        self.scheduler.cancel("wake_camera")
+        if not self.camera_parked:
+            self.camera.release()
+            self.camera_parked = True
+        self.active_brightness = self.last_brightness
+        self.set_brightness(min(self.IDLE_BRIGHTNESS, 100 if self.last_brightness is None else self.last_brightness))
+
+    def on_user_active(self):
+        if not self.user_idle:
+            return
+        self.user_idle = False
+        if self.active_brightness is not None:
+            self.set_brightness(self.active_brightness)
+        self.change_gate.reset()
+        self.brightness_filter.reset()
+        self.sample_interval.reset()
+        self.scheduler.add("process_images", self.process_images)
+
+def default_socket_path():
+    return os.path.join(os.environ.get("XDG_RUNTIME_DIR") or tempfile.gettempdir(), "luminar.sock")
+
+class ControlServer:
+    """Local control API for a BrightnessEngine on a Unix domain socket.
+
+    Requests and replies are one JSON object per line. Commands are start,
+    stop, status and profile (with "name"); every successful reply carries the
+    engine status, e.g. {"cmd": "profile", "name": "Work"} ->
+    {"ok": true, "status": {...}}. "metrics" replies with the metrics
+    snapshot instead, after turning collection on or off if "enabled" is
+    given and clearing it if "reset" is true. Errors reply {"ok": false, "error": "..."}.
+    """
+
+    def __init__(self, engine, path=None):
+        import socket
+        import socketserver
+        self.engine = engine
+        self.path = path or default_socket_path()
+        if os.path.exists(self.path):
+            # Refuse to steal the socket of a daemon that is still running
+            probe = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+            try:
+                probe.connect(self.path)
+            except OSError:
+                os.unlink(self.path)
+            else:
+                raise RuntimeError(f"Another Luminar daemon is listening on {self.path}")
+            finally:
+                probe.close()
+
+        control = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                for line in self.rfile:
+                    try:
+                        reply = control.handle(json.loads(line))
+                    except Exception as e:
+                        reply = {"ok": False, "error": str(e)}
+                    self.wfile.write(json.dumps(reply).encode() + b"\n")
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.path, Handler)
+        self.server.daemon_threads = True
+        os.chmod(self.path, 0o600)
+
+    def handle(self, request):
+        command = request.get("cmd")
+        if command == "metrics":
+            return {"ok": True, "metrics": self.engine.metrics_snapshot(request.get("enabled"), request.get("reset", False))}
+        if command == "start":
+            self.engine.start()
+        elif command == "stop":
+            self.engine.stop()
+        elif command == "profile":
+            if request.get("name") not in self.engine.profiles:
+                raise ValueError(f"Unknown profile: {request.get('name')}")
+            self.engine.set_profile(request["name"])
+        elif command != "status":
+            raise ValueError(f"Unknown command: {command}")
+        return {"ok": True, "status": self.engine.status()}
+
+    def serve_forever(self):
+        self.server.serve_forever()
+
+    def shutdown(self):
+        self.server.shutdown()
+
+    def close(self):
+        self.server.server_close()
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+class ControlClient:
+    """Client for ControlServer; keeps one connection open between requests."""
+
+    def __init__(self, path=None, timeout=5.0):
+        self.path = path or default_socket_path()
+        self.timeout = timeout
+        self._sock = None
+        self._lock = threading.Lock()
+
+    def request(self, command, **args):
+        """Send a command and return the engine status (the metrics snapshot for
+        "metrics"); raises RuntimeError on failure."""
+        import socket
+        with self._lock:
+            for attempt in (1, 2):
+                try:
+                    if self._sock is None:
+                        self._sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+                        self._sock.settimeout(self.timeout)
+                        self._sock.connect(self.path)
+                        self._reader = self._sock.makefile('rb')
+                    self._sock.sendall(json.dumps(dict(args, cmd=command)).encode() + b"\n")
+                    line = self._reader.readline()
+                    if not line:
+                        raise ConnectionError("Luminar daemon closed the connection")
+                    break
+                except OSError as e:
+                    self.close()
+                    # Reconnect once in case the daemon restarted
+                    if attempt == 2:
+                        raise RuntimeError(f"Cannot reach Luminar daemon at {self.path}: {e}")
+        reply = json.loads(line)
+        if not reply.get("ok"):
+            raise RuntimeError(reply.get("error", "request failed"))
+        return reply["metrics"] if command == "metrics" else reply["status"]
+
+    def close(self):
+        if self._sock is not None:
+            self._sock.close()
+            self._sock = None
+
+class RemoteEngine:
+    """Stands in for BrightnessEngine when the window controls a running daemon."""
+
+    def __init__(self, profiles, path=None):
+        self.profiles = profiles
+        self.client = ControlClient(path)
+        self.scheduler = Scheduler()  # For the window's own jobs, like health alerts
+        self.current_profile = None
+        self.current_profile_name = None
+
+    on_profiles_changed = BrightnessEngine.on_profiles_changed
+
+    def apply_display_curves(self):
+        pass  # The daemon applies the curves of the profile it was sent
+
+    def apply_profile_settings(self):
+        pass  # Likewise the profile's sampling and filtering
+
+    def prepare(self):
+        pass  # The daemon owns the displays
+
+    def start(self):
+        self.client.request("start")
+        self.scheduler.start()
+
+    def stop(self):
+        self.scheduler.stop()
+        self.client.request("stop")
+
+    def set_profile(self, name):
+        self.client.request("profile", name=name)
+        self.current_profile = self.profiles[name]
+        self.current_profile_name = name
+
+    def status(self):
+        return self.client.request("status")
+
+    def metrics_snapshot(self, enabled=None, reset=False):
+        args = {} if enabled is None else {"enabled": enabled}
+        return self.client.request("metrics", reset=reset, **args)
+
+def run_headless(socket_path=None, backend=None, autostart=True, idle_source=None):
+    """Run the brightness engine without a window, controlled over the socket."""
+    import signal
+    started = time.perf_counter()
+    profiles = ProfileRepository(PROFILE_PATH)
+    engine = BrightnessEngine(profiles, backend=backend, idle_source=idle_source)
+    profiles.watch(on_change=engine.on_profiles_changed)
+    server = ControlServer(engine, socket_path)
+    print(f"Luminar daemon listening on {server.path} ({(time.perf_counter() - started) * 1000:.0f} ms)")
+
+    # Camera and display setup happen after the socket is already accepting
+    if autostart:
+        threading.Thread(target=engine.start, daemon=True).start()
+    signal.signal(signal.SIGTERM, lambda *_: threading.Thread(target=server.shutdown).start())
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        engine.stop()
+        server.close()
+        profiles.flush()
+
+class ReplayCamera:
+    """Stand-in for CameraSession that plays back recorded or synthetic frames."""
+
+    def __init__(self, frames, loop=True):
+        self.frames = frames
+        self.loop = loop
+        self.position = 0
+        self.connected = True
+        self.last_error = None
+
+    def acquire(self):
+        return self
+
+    def release(self):
+        pass
+
+    def read(self, timeout=None, copy=True):
+        if self.position >= len(self.frames):
+            if not self.loop:
+                return None
+            self.position = 0
+        frame = self.frames[self.position]
+        self.position += 1
+        return np.array(frame) if copy else np.asarray(frame)
 
-def center_window(window):
-    """Center the window on the screen."""
-    window.update_idletasks()
-    screen_width = window.winfo_screenwidth()
-    screen_height = window.winfo_screenheight()
-    window_width = window.winfo_width()
-    window_height = window.winfo_height()
+# Synthetic lighting scenes: base luma from row (y) and column (x) positions in
+# 0..1 and the frame index, before noise and a slight warm tint are added
+BENCHMARK_SCENES = {
+    "dark": lambda y, x, i: 18 + 12 * y,
+    "indoor": lambda y, x, i: 70 + 60 * y,
+    "daylight": lambda y, x, i: 175 + 40 * y,
+    "backlit": lambda y, x, i: np.where((y < 0.35) & (np.abs(x - 0.5) < 0.25), 235, 55),
+    "flicker": lambda y, x, i: (170 if i % 2 else 80) + 20 * y,
+}
+BENCHMARK_RESOLUTIONS = {"vga": (640, 480), "720p": (1280, 720), "1080p": (1920, 1080)}
 
-    x = (screen_width // 2) - (window_width // 2)
-    y = (screen_height // 2) - (window_height // 2)
-    window.geometry(f'{window_width}x{window_height}+{x}+{y}')
+# Stages of the reference chain, then the fused estimator, the sampled estimate
+# process_images uses, the change gate's frame signature, and one whole
+# process_images iteration
+BENCHMARK_STAGES = ("to_pil", "preprocess_image", "adaptive_threshold", "count_bright_pixels",
+                    "estimator", "sampler", "change_gate", "process_images")
+BENCHMARK_PERCENTILES = (50, 90, 99)
 
-def rounded_rectangle(canvas, x1, y1, x2, y2, radius=25, **kwargs):
-    """Draws a rounded rectangle with the given radius."""
-    points = [x1 + radius, y1,
-              x1 + radius, y1,
-              x2 - radius, y1,
-              x2 - radius, y1,
-              x2, y1,
-              x2, y1 + radius,
-              x2, y1 + radius,
-              x2, y2 - radius,
-              x2, y2 - radius,
-              x2, y2,
-              x2 - radius, y2,
-              x2 - radius, y2,
-              x1 + radius, y2,
-              x1 + radius, y2,
-              x1, y2,
-              x1, y2 - radius,
-              x1, y2 - radius,
-              x1, y1 + radius,
-              x1, y1 + radius,
-              x1, y1]
-    return canvas.create_polygon(points, smooth=True, **kwargs)
+def synthetic_frames(scene, width, height, count=8, seed=0):
+    """Reproducible BGR uint8 frames, shape (count, height, width, 3), for a scene in BENCHMARK_SCENES."""
+    luma = BENCHMARK_SCENES[scene]
+    rng = np.random.default_rng(seed)
+    y = np.linspace(0.0, 1.0, height, dtype=np.float32)[:, None]
+    x = np.linspace(0.0, 1.0, width, dtype=np.float32)[None, :]
+    tint = np.array([0.92, 1.0, 1.06], np.float32)
+    frames = np.empty((count, height, width, 3), np.uint8)
+    for i in range(count):
+        level = np.broadcast_to(luma(y, x, i), (height, width)).astype(np.float32)
+        level += rng.normal(0.0, 6.0, (height, width)).astype(np.float32)
+        np.clip(level[..., None] * tint, 0, 255, out=frames[i], casting='unsafe')
+    return frames
 
-def log_session_start():
-    """Logs the start of a session with the current timestamp."""
-    usage_logs.append({'start_time': datetime.now(), 'end_time': None})
+def load_frames(path, limit=300):
+    """Frames from a .npy file (H x W x 3 or N x H x W x 3 BGR uint8) or a video OpenCV can decode."""
+    path = Path(path)
+    if path.suffix == ".npy":
+        frames = np.load(path, mmap_mode="r")
+        if frames.ndim == 3:
+            frames = frames[None]
+        if frames.ndim != 4 or frames.shape[-1] != 3 or frames.dtype != np.uint8:
+            raise ValueError(f"{path}: expected BGR uint8 frames, got {frames.dtype} {frames.shape}")
+        return frames[:limit]
+    cap = cv2.VideoCapture(str(path))
+    if not cap.isOpened():
+        raise IOError(f"Cannot open video {path}")
+    frames = []
+    try:
+        while len(frames) < limit:
+            ret, frame = cap.read()
+            if not ret:
+                break
+            frames.append(frame)
+    finally:
+        cap.release()
+    if not frames:
+        raise ValueError(f"{path}: no frames decoded")
+    return np.stack(frames)
 
-def log_session_stop():
-    """Logs the stop time of the latest session."""
-    if usage_logs and usage_logs[-1]['end_time'] is None:
-        usage_logs[-1]['end_time'] = datetime.now()
+def benchmark_sources(specs=None):
+    """Yield (name, frames) for each spec: a file path or SCENE@RESOLUTION (e.g. backlit@720p).
 
-def calculate_duration(start_time, end_time):
-    """Calculates the duration between start and stop times."""
-    duration = end_time - start_time
-    hours, remainder = divmod(duration.total_seconds(), 3600)
-    minutes, _ = divmod(remainder, 60)
-    return f"{int(hours)} hours {int(minutes)} minutes"
+    Without specs every synthetic scene is generated at every resolution.
+    """
+    if not specs:
+        specs = [f"{scene}@{resolution}" for resolution in BENCHMARK_RESOLUTIONS for scene in BENCHMARK_SCENES]
+    for spec in specs:
+        scene, _, resolution = spec.partition("@")
+        if scene in BENCHMARK_SCENES:
+            width, height = BENCHMARK_RESOLUTIONS.get(resolution or "720p") or map(int, resolution.split("x"))
+            yield spec, synthetic_frames(scene, width, height)
+        else:
+            yield spec, load_frames(spec)
 
-def update_treeview():
-    """Update the Treeview with new session data."""
-    global treeview
-    if treeview:
-        # Clear existing entries
-        for item in treeview.get_children():
-            treeview.delete(item)
-
-        # Insert updated data
-        for log in usage_logs:
-            if log['end_time']:
-                date_str = log['start_time'].strftime('%m/%d/%Y')
-                duration_str = calculate_duration(log['start_time'], log['end_time'])
-                treeview.insert('', 'end', values=(date_str, duration_str))
-
-def on_start():
-    """Callback when the user starts the session."""
-    log_session_start()
-    print("Session started!")
-    update_treeview()
+def _run_stages(engine, estimator, frame, measure):
+    # One pass over every benchmark stage; measure(stage, func, *args) runs func
+    image = measure("to_pil", lambda: Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)))
+    preprocessed = measure("preprocess_image", engine.preprocess_image, image)
+    threshold_img = measure("adaptive_threshold", engine.adaptive_threshold, preprocessed)
+    measure("count_bright_pixels", lambda: engine.count_bright_pixels(preprocessed, np.mean(np.array(threshold_img))))
+    measure("estimator", estimator.estimate, frame)
+    measure("sampler", engine.sampler.estimate, frame)
+    measure("change_gate", engine.change_gate.signature, frame)
+    measure("process_images", engine.process_images)
 
-def on_stop():
-    """Callback when the user stops the session and updates the Treeview."""
-    log_session_stop()
-    print("Session stopped!")
-    update_treeview()
+def benchmark_frames(frames, iterations=50, warmup=3, alloc_iterations=5):
+    """Run frames (cycled) through every stage in BENCHMARK_STAGES.
 
-def bind_button(canvas, button_rect, button_text, hover_color, original_color, on_click_action):
-    """Bind hover and click events to both button rectangle and button text."""
-    def on_enter_combined(event):
-        canvas.master.config(cursor="hand2")
-        canvas.itemconfig(button_rect, fill=hover_color)
-    
-    def on_leave_combined(event):
-        canvas.master.config(cursor="")
-        canvas.itemconfig(button_rect, fill=original_color)
+    Returns per-stage latency percentiles in milliseconds, peak allocation per
+    call from a separate tracemalloc pass, frames per second for each pipeline,
+    and what reached the fake display backend.
+    """
+    import tracemalloc
+    camera = ReplayCamera(frames)
+    engine = BrightnessEngine({}, notify=lambda *args, **kwargs: None, backend="fake", camera=camera)
+    engine.open_display()
+    engine.running = True
+    estimator = LuminanceEstimator()
+    timings = {stage: [] for stage in BENCHMARK_STAGES}
+    peaks = dict.fromkeys(BENCHMARK_STAGES, 0)
 
-    for item in (button_rect, button_text):
-        canvas.tag_bind(item, "<Enter>", on_enter_combined)
-        canvas.tag_bind(item, "<Leave>", on_leave_combined)
-        canvas.tag_bind(item, "<Button-1>", lambda event: on_click_action())
+    def timed(stage, func, *args):
+        start = time.perf_counter()
+        result = func(*args)
+        timings[stage].append(time.perf_counter() - start)
+        return result
+
+    def traced(stage, func, *args):
+        tracemalloc.reset_peak()
+        before = tracemalloc.get_traced_memory()[0]
+        result = func(*args)
+        peaks[stage] = max(peaks[stage], tracemalloc.get_traced_memory()[1] - before)
+        return result
 
-def create_treeview(canvas, parent_frame):
-    """Create and configure the Treeview widget."""
-    global treeview
-    
     try:
-        istok_regular_font = tkFont.Font(family="Istok Web", size=17)
-        istok_bold_font = tkFont.Font(family="Istok Web", size=20, weight="bold")
-    except:
-        istok_regular_font = tkFont.Font(family="Arial", size=20)
-        istok_bold_font = tkFont.Font(family="Arial", size=20, weight="bold")
+        for i in range(warmup + iterations):
+            frame = np.asarray(frames[i % len(frames)])
+            _run_stages(engine, estimator, frame, timed if i >= warmup else (lambda stage, func, *args: func(*args)))
+        # Allocation tracing slows everything down, so it gets its own pass
+        tracemalloc.start()
+        try:
+            for i in range(alloc_iterations):
+                _run_stages(engine, estimator, np.asarray(frames[i % len(frames)]), traced)
+        finally:
+            tracemalloc.stop()
+        engine.display.flush(timeout=1.0)
+    finally:
+        engine.running = False
+        engine.transitions.close()
+        engine.display.close()
 
-    treeview_frame = tk.Frame(parent_frame, bg='#ADD8E6')
-    treeview_frame.pack(expand=True, fill="both") 
+    stages = {}
+    for stage, samples in timings.items():
+        ms = np.array(samples) * 1000
+        summary = {f"p{p}": float(v) for p, v in zip(BENCHMARK_PERCENTILES, np.percentile(ms, BENCHMARK_PERCENTILES))}
+        summary.update(mean=float(ms.mean()), max=float(ms.max()), alloc_peak_kb=peaks[stage] / 1024)
+        stages[stage] = summary
+    legacy = sum(stages[stage]['mean'] for stage in BENCHMARK_STAGES[:4])
+    return {
+        'width': int(frames.shape[2]),
+        'height': int(frames.shape[1]),
+        'frames': len(frames),
+        'iterations': iterations,
+        'stages': stages,
+        'fps': {
+            'legacy_chain': 1000 / legacy,
+            'estimator': 1000 / stages['estimator']['mean'],
+            'sampler': 1000 / stages['sampler']['mean'],
+            'process_images': 1000 / stages['process_images']['mean'],
+        },
+        'skip_rate': engine.change_gate.skip_rate(),
+        'display_writes': sum(len(display.backend.writes) for display in engine.display.backend.displays),
+        'suppressed_writes': engine.brightness_filter.suppressed,
+    }
 
-    treeview = ttk.Treeview(treeview_frame, columns=("date", "duration"), show='headings', height=3)
+def compare_benchmarks(baseline, results):
+    """Print the p50 change of every stage that appears in both result sets."""
+    previous = {run['source']: run for run in baseline['runs']}
+    for run in results['runs']:
+        old = previous.get(run['source'])
+        if old is None:
+            continue
+        changes = []
+        for stage, summary in run['stages'].items():
+            if stage in old['stages'] and old['stages'][stage]['p50']:
+                change = summary['p50'] / old['stages'][stage]['p50'] - 1
+                changes.append(f"{stage} {change:+.0%}")
+        print(f"{run['source']:<16}" + ", ".join(changes))
 
-    treeview.heading("date", text="DATE")
-    treeview.heading("duration", text="DURATION")
+def run_benchmark(specs=None, iterations=50, output="benchmark_results.json", baseline=None):
+    """Benchmark every source, print a summary and store the results as JSON."""
+    import platform
+    results = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'platform': platform.platform(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'opencv': cv2.__version__,
+        'runs': [],
+    }
+    print(f"{'source':<16}{'legacy p50':>12}{'fused p50':>12}{'sampled p50':>13}{'loop p99':>10}{'loop fps':>10}{'skipped':>9}")
+    for name, frames in benchmark_sources(specs):
+        run = dict(source=name, **benchmark_frames(frames, iterations))
+        results['runs'].append(run)
+        stages = run['stages']
+        legacy = sum(stages[stage]['p50'] for stage in BENCHMARK_STAGES[:4])
+        print(f"{name:<16}{legacy:10.2f}ms{stages['estimator']['p50']:10.2f}ms{stages['sampler']['p50']:11.2f}ms"
+              f"{stages['process_images']['p99']:8.2f}ms{run['fps']['process_images']:10.0f}{run['skip_rate']:9.0%}")
+    if output:
+        with open(output, "w") as f:
+            json.dump(results, f, indent=2)
+        print(f"Results written to {output}")
+    if baseline:
+        with open(baseline) as f:
+            compare_benchmarks(json.load(f), results)
+    return results
 
-    treeview.column("date", width=250, anchor="center")
-    treeview.column("duration", width=250, anchor="center")
+# Per-sample columns the replay workers fill in
+REPLAY_COLUMNS = ("time", "frame", "ratio", "threshold", "mean", "median", "p10", "p90")
+REPLAY_IMAGE_SUFFIXES = (".png", ".jpg", ".jpeg", ".bmp", ".npy")
 
-    treeview.pack(expand=True, fill="both", padx=10, pady=10)
-    
-    canvas.create_window(100, 400, anchor="nw", window=treeview_frame, width=800, height=200)
+def replay_plan(path, rate=1.0):
+    """Describe a recording for replay: (kind, frame count, frames per second, frame step, files).
 
-class ImageProcessor:
-    def __init__(self, root):
-        self.root = root
-        self.profile_path = 'profiles.json'
-        self.profiles = self.load_profiles()
-        self.current_profile = None
-        self.running = False
-        self.start_time = None
-        self.total_usage_time = 0
-        self.pomodoro_running = False
-        self.pomodoro_thread = None
-        self.canvas = None
-        self.setup_ui()
-        
-    def manage_profiles(self):
-        # Load custom font
-        try:
-            istok_regular_font = tkFont.Font(family="Istok Web", size=17)
-            istok_bold_font = tkFont.Font(family="Istok Web", size=20, weight="bold")
-        except:
-            istok_regular_font = tkFont.Font(family="Arial", size=20)
-            istok_bold_font = tkFont.Font(family="Arial", size=20, weight="bold")
+    Videos are read through OpenCV, .npy files hold a (N, H, W, 3) BGR stack,
+    and directories hold one image (or .npy frame) per frame, in name order,
+    taken to be one second apart.
+    """
+    path = Path(path)
+    if path.is_dir():
+        files = sorted(str(f) for f in path.iterdir() if f.suffix.lower() in REPLAY_IMAGE_SUFFIXES)
+        kind, count, fps = "directory", len(files), 1.0
+    elif path.suffix == ".npy":
+        files, kind, fps = None, "npy", 1.0
+        count = len(load_frames(path, limit=None))
+    else:
+        cap = cv2.VideoCapture(str(path))
+        if not cap.isOpened():
+            raise IOError(f"Cannot open video {path}")
+        files, kind = None, "video"
+        count = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+        cap.release()
+    if not count:
+        raise ValueError(f"{path}: no frames to replay")
+    return kind, count, fps, max(int(round(fps / rate)), 1), files
 
-        new_window = tk.Toplevel(self.root)
-        new_window.title("Manage Profiles")
-        new_window.geometry("400x300")
+def _replay_chunk(path, kind, files, fps, step, first, rows, offset, table_name, table_rows, profile):
+    """Worker: estimate rows samples starting at frame first, writing them to the shared table at offset."""
+    from multiprocessing import shared_memory
+    # Pool workers share the parent's resource tracker, so attaching does not
+    # hand the block's lifetime to this process
+    block = shared_memory.SharedMemory(name=table_name)
+    try:
+        table = np.ndarray((table_rows, len(REPLAY_COLUMNS)), np.float64, buffer=block.buf)
+        sampler = FrameSampler.for_profile(profile)  # Sample as the live loop would with this profile
+        if kind == "video":
+            cap = cv2.VideoCapture(str(path))
+            cap.set(cv2.CAP_PROP_POS_FRAMES, first)
+            frame = None
+        elif kind == "npy":
+            stack = load_frames(path, limit=None)
+        for row in range(rows):
+            index = first + row * step
+            if kind == "video":
+                ret, frame = cap.read(frame)  # Decode into the same buffer every time
+                for _ in range(step - 1):
+                    cap.grab()
+                if not ret:
+                    break
+            elif kind == "npy":
+                frame = np.asarray(stack[index])
+            elif files[index].endswith(".npy"):
+                frame = np.load(files[index])
+            else:
+                frame = cv2.imread(files[index], cv2.IMREAD_COLOR)
+                if frame is None:
+                    continue
+            estimate = sampler.estimate(frame)
+            histogram = estimate.histogram
+            table[offset + row] = (index / fps, index, estimate.ratio, estimate.threshold, estimate.mean,
+                                   histogram.median(), histogram.percentile(10), histogram.percentile(90))
+        if kind == "video":
+            cap.release()
+    finally:
+        block.close()
+    return rows
 
-        # Disable resizing the new window if desired
-        new_window.resizable(False, False)
+def replay_recordings(paths, rate=1.0, chunk=256, workers=None, profile=None):
+    """Run recordings through the estimation pipeline and the engine's filter and mapping.
 
-        # Set a background color
-        new_window.configure(bg='#ADD8E6')
+    Frames are estimated in chunks on a process pool. Each worker decodes its
+    own chunk and writes its results straight into one shared-memory table.
+    The smoothing, brightness mapping and write decisions then run in order
+    over the whole timeline, as they would live. Returns (timeline, writes):
+    a structured array with one row per sample, and (source, time, brightness)
+    for every write the engine would have issued.
+    """
+    from concurrent.futures import ProcessPoolExecutor
+    from multiprocessing import shared_memory
+    # The sequential half of the live loop, on an engine that never touches hardware
+    profiles = ProfileRepository(PROFILE_PATH) if profile else {}
+    engine = BrightnessEngine(profiles, backend="fake", camera=ReplayCamera([]), idle_source="none")
+    if profile:
+        if profile not in profiles:
+            raise ValueError(f"Unknown profile: {profile}")
+        engine.set_profile(profile)
 
-        # Header Label
-        header_label = tk.Label(new_window, text="Select a Profile", font=istok_bold_font, bg='#ADD8E6')
-        header_label.pack(pady=(20, 10))
+    plans = [(str(path), *replay_plan(path, rate)) for path in paths]
+    jobs, total = [], 0
+    for source, (path, kind, count, fps, step, files) in enumerate(plans):
+        samples = (count + step - 1) // step
+        for start in range(0, samples, chunk):
+            rows = min(chunk, samples - start)
+            jobs.append((source, path, kind, files, fps, step, start * step, rows, total + start))
+        total += samples
 
-        # Listbox for profiles
-        profile_list = tk.Listbox(new_window, font=istok_regular_font, bg='white', selectbackground='#87CEEB')
-        profile_list.pack(pady=5, fill=tk.BOTH, expand=True)
+    block = shared_memory.SharedMemory(create=True, size=max(total, 1) * len(REPLAY_COLUMNS) * 8)
+    try:
+        table = np.ndarray((total, len(REPLAY_COLUMNS)), np.float64, buffer=block.buf)
+        table.fill(np.nan)  # Rows a worker could not decode stay NaN and are dropped
+        sources = np.empty(total, np.int32)
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = []
+            for source, path, kind, files, fps, step, first, rows, offset in jobs:
+                sources[offset:offset + rows] = source
+                futures.append(pool.submit(_replay_chunk, path, kind, files, fps, step, first, rows,
+                                           offset, block.name, total, engine.current_profile or {}))
+            for future in futures:
+                future.result()
+        results = table.copy()
+    finally:
+        block.close()
+        block.unlink()
 
-        # Insert profiles into the Listbox
-        for profile in self.profiles:
-            profile_list.insert(tk.END, profile)
+    keep = ~np.isnan(results[:, 2])
+    results, sources = results[keep], sources[keep]
+    dtype = [("source", "U256")] + [(column, np.float64) for column in REPLAY_COLUMNS] + \
+            [("smoothed", np.float64), ("brightness", np.int16), ("applied", np.bool_)]
+    timeline = np.zeros(len(results), dtype)
+    timeline["source"] = [plans[source][0] for source in sources]
+    for i, column in enumerate(REPLAY_COLUMNS):
+        timeline[column] = results[:, i]
 
-        # Frame for buttons
-        button_frame = tk.Frame(new_window, bg='#ADD8E6')
-        button_frame.pack(pady=(10, 20))
+    writes = []
+    current = None
+    for row in timeline:
+        if row["source"] != current:
+            current = row["source"]
+            engine.brightness_filter.reset()  # Each recording starts from scratch
+        row["smoothed"] = engine.brightness_filter.smooth(row["ratio"])
+        row["brightness"] = engine.brightness_for(row["smoothed"])
+        if engine.brightness_filter.should_apply(int(row["brightness"])):
+            row["applied"] = True
+            writes.append((current, float(row["time"]), int(row["brightness"])))
+    return timeline, writes
 
-        # Button to close the window
-        close_button = tk.Button(button_frame, text="Close", font=istok_regular_font, bg='white', fg='black', command=new_window.destroy)
-        close_button.pack(side=tk.LEFT, padx=5)
+def save_replay(timeline, writes, output):
+    """Write the timeline as CSV, .npy or .parquet (by extension) and the writes next to it as CSV."""
+    output = Path(output)
+    if output.suffix == ".npy":
+        np.save(output, timeline)
+    elif output.suffix == ".parquet":
+        try:
+            import pyarrow
+            import pyarrow.parquet
+        except ImportError:
+            raise ValueError("Parquet output needs the pyarrow package; use .csv or .npy instead")
+        pyarrow.parquet.write_table(pyarrow.table({name: timeline[name] for name in timeline.dtype.names}), output)
+    else:
+        with open(output, "w", newline="") as f:
+            out = csv.writer(f)
+            out.writerow(timeline.dtype.names)
+            out.writerows(row.tolist() for row in timeline)
+    writes_path = output.with_name(output.stem + ".writes.csv")
+    with open(writes_path, "w", newline="") as f:
+        out = csv.writer(f)
+        out.writerow(("source", "time", "brightness"))
+        out.writerows(writes)
+    return writes_path
 
-        # Center the window on the screen
-        new_window.update_idletasks()
-        x = (new_window.winfo_screenwidth() // 2) - (new_window.winfo_width() // 2)
-        y = (new_window.winfo_screenheight() // 2) - (new_window.winfo_height() // 2)
-        new_window.geometry(f"+{x}+{y}")
+def run_replay(paths, output="replay.csv", rate=1.0, workers=None, profile=None):
+    started = time.perf_counter()
+    timeline, writes = replay_recordings(paths, rate=rate, workers=workers, profile=profile)
+    elapsed = time.perf_counter() - started
+    writes_path = save_replay(timeline, writes, output)
+    footage = sum(timeline["time"][timeline["source"] == source].max() for source in set(timeline["source"])) \
+        if len(timeline) else 0.0
+    print(f"Replayed {len(timeline)} samples ({footage / 3600:.2f} h of footage) in {elapsed:.1f} s "
+          f"({footage / max(elapsed, 1e-9):.0f}x real time) on {workers or os.cpu_count()} workers")
+    print(f"{len(writes)} brightness writes; timeline in {output}, writes in {writes_path}")
 
-        def load_profile():
-            if not profile_list.curselection():
-                messagebox.showwarning("Load Profile", "No profile selected.")
-                return
-            selected = profile_list.get(profile_list.curselection())
-            self.current_profile = self.profiles[selected]
-            messagebox.showinfo("Profile Loaded", f"Loaded profile: {selected}")
+# Longest acceptable time from process start until the window is drawn
+STARTUP_BUDGET = 0.5
 
-        def delete_profile():
-            if not profile_list.curselection():
-                messagebox.showwarning("Delete Profile", "No profile selected.")
-                return
-            selected_index = profile_list.curselection()[0]
-            selected_profile = profile_list.get(selected_index)
-            del self.profiles[selected_profile]
-            profile_list.delete(selected_index)
-            self.save_profiles()
-            messagebox.showinfo("Delete Profile", f"Profile '{selected_profile}' has been deleted.")
+class StartupProfiler:
+    """Collects the time spent in each startup phase for --profile-startup."""
 
-        load_button = tk.Button(new_window, text="Load", command=load_profile)
-        load_button.pack(pady=5)
+    def __init__(self, origin):
+        self.last = origin
+        self.origin = origin
+        self.phases = []
+        self.within_budget = None  # Set by report()
 
-        add_button = tk.Button(new_window, text="Create New", command=lambda: self.create_profile(new_window, profile_list))
-        add_button.pack(pady=5)
+    def mark(self, phase):
+        now = time.perf_counter()
+        self.phases.append((phase, now - self.last))
+        self.last = now
 
-        delete_button = tk.Button(new_window, text="Delete", command=delete_profile)
-        delete_button.pack(pady=5)
+    def report(self, background=()):
+        """Print the phases; returns False if the window missed STARTUP_BUDGET."""
+        for phase, seconds in self.phases:
+            print(f"{phase:<24}{seconds * 1000:8.1f} ms")
+        window = self.last - self.origin
+        verdict = "ok" if window <= STARTUP_BUDGET else "OVER BUDGET"
+        print(f"{'window drawn':<24}{window * 1000:8.1f} ms  (budget {STARTUP_BUDGET * 1000:.0f} ms, {verdict})")
+        for phase, seconds in background:
+            print(f"{'warm-up: ' + phase:<24}{seconds * 1000:8.1f} ms")
+        self.within_budget = window <= STARTUP_BUDGET
+        return self.within_budget
 
-    def load_profiles(self):
-        if not os.path.exists(self.profile_path):
-            return {}
-        with open(self.profile_path, 'r') as file:
-            return json.load(file)
-        # Load custom font
-        try:
-            italiana_font = tkFont.Font(family="Italiana", size=70)
-            istok_regular_font = tkFont.Font(family="Istok Web", size=17)
-            istok_bold_font = tkFont.Font(family="Istok Web", size=20, weight="bold")
-        except:
-            italiana_font = tkFont.Font(family="Arial", size=20)
-            istok_regular_font = tkFont.Font(family="Arial", size=20)
-            istok_bold_font = tkFont.Font(family="Arial", size=20, weight="bold")
+class ImageProcessor:
+    def __init__(self, root, control_socket=None, backend=None, idle_source=None):
+        self.root = root
+        self.profile_path = PROFILE_PATH
+        self.profiles = ProfileRepository(self.profile_path)
+        self.running = False
+        self.starting = False  # An engine start is running on a worker thread
+        self.start_time = None
+        self.total_usage_time = 0
+        self.pomodoro_running = False
+        self.pomodoro_stop = None
+        self.canvas = None
+        self.ui = UiDispatcher(root)
+        if control_socket:
+            self.engine = RemoteEngine(self.profiles, control_socket)
+        else:
+            self.engine = BrightnessEngine(self.profiles, notify=self.notify, backend=backend, idle_source=idle_source)
+        self.profiles.watch(on_change=lambda names: self.ui.post(self.engine.on_profiles_changed, names))
+        self.setup_ui()
+        
+    def manage_profiles(self):
+        istok_regular_font = get_font('regular')
+        istok_bold_font = get_font('bold')
 
         new_window = tk.Toplevel(self.root)
         new_window.title("Manage Profiles")
@@ -309,7 +4146,7 @@ class ImageProcessor:
                 messagebox.showwarning("Load Profile", "No profile selected.")
                 return
             selected = profile_list.get(profile_list.curselection())
-            self.current_profile = self.profiles[selected]
+            self.engine.set_profile(selected)
             messagebox.showinfo("Profile Loaded", f"Loaded profile: {selected}")
 
         def delete_profile():
@@ -320,7 +4157,6 @@ class ImageProcessor:
             selected_profile = profile_list.get(selected_index)
             del self.profiles[selected_profile]
             profile_list.delete(selected_index)
-            self.save_profiles()
             messagebox.showinfo("Delete Profile", f"Profile '{selected_profile}' has been deleted.")
 
         load_button = tk.Button(new_window, text="Load", command=load_profile)
@@ -332,30 +4168,18 @@ class ImageProcessor:
         delete_button = tk.Button(new_window, text="Delete", command=delete_profile)
         delete_button.pack(pady=5)
 
-        new_window.resizable(True, True)
-        
     def setup_ui(self):
         self.root.geometry("1000x700")
         self.root.configure(bg="#FFFFFF")
 
-        try:
-            italiana_font = tkFont.Font(family="Italiana", size=70)
-            istok_regular_font = tkFont.Font(family="Istok Web", size=17)
-            istok_bold_font = tkFont.Font(family="Istok Web", size=20, weight="bold")
-        except:
-            italiana_font = tkFont.Font(family="Arial", size=20)
-            istok_regular_font = tkFont.Font(family="Arial", size=20)
-            istok_bold_font = tkFont.Font(family="Arial", size=20, weight="bold")
-
-        self.canvas = tk.Canvas(self.root, width=1000, height=700)
-        self.canvas.pack()
+        italiana_font = get_font('title')
+        istok_regular_font = get_font('regular')
+        istok_bold_font = get_font('bold')
 
-        # Create the canvas and apply the gradient background
-        color1 = rgb_to_tuple("#89CFF0")
-        color2 = rgb_to_tuple("#96D8B9")
-        color3 = rgb_to_tuple("#C9A0DC")
-        colors = [color1, color2, color3]
-        create_horizontal_gradient(self.canvas, colors, 1000, 700)
+        # The middle gradient color shows until warm_up has rendered the
+        # gradient, so drawing the window does not wait for NumPy
+        self.canvas = tk.Canvas(self.root, width=1000, height=700, bg="#96D8B9", highlightthickness=0)
+        self.canvas.pack()
 
         # Define button colors
         green_color = "#8FBC8F"
@@ -404,23 +4228,46 @@ class ImageProcessor:
         self.screen_usage_label.pack(pady=10)
 
     def start_processing(self):
-        if not self.running:
-            self.running = True
+        if not self.running and not self.starting:
+            # Display discovery or the daemon round trip can take seconds; keep the window responsive
+            self.starting = True
 
-            # Disable buttons while processing
-            # self.disable_buttons()
+            def run():
+                try:
+                    self.engine.start()
+                except RuntimeError as e:
+                    # With --connect this fails when the daemon is unreachable
+                    self.notify("Start", f"Could not start: {e}", "error")
+                    self.ui.post(self.finish_start, False)
+                else:
+                    self.ui.post(self.finish_start, True)
 
-            if self.start_time is None:
-                self.start_time = time.time()
-            on_start()
-            threading.Thread(target=self.process_images).start()
-            threading.Thread(target=self.monitor_health).start()
-            threading.Thread(target=self.adaptive_color_temperature).start()
-            self.update_screen_usage()
+            threading.Thread(target=run, name="engine-start", daemon=True).start()
+
+    def finish_start(self, started):
+        self.starting = False
+        if not started:
+            return
+        self.running = True
+
+        # Disable buttons while processing
+        # self.disable_buttons()
+
+        if self.start_time is None:
+            self.start_time = time.time()
+        on_start(self.engine.current_profile_name)
+        self.engine.scheduler.add("monitor_health", self.monitor_health)
+        self.engine.scheduler.add("session_heartbeat", log_session_heartbeat, SESSION_HEARTBEAT)
+        self.update_screen_usage()
 
     def stop_processing(self):
         if self.running:
             self.running = False
+            try:
+                self.engine.stop()
+            except RuntimeError as e:
+                # Still end the session here; the daemon may keep running on its own
+                self.notify("Stop", f"Could not stop the brightness daemon: {e}", "error")
 
             # Enable buttons after processing
             # self.enable_buttons()
@@ -446,57 +4293,144 @@ class ImageProcessor:
         name = simpledialog.askstring("Profile Name", "Enter a new profile name:", parent=parent_window)
         if name:
             brightness = simpledialog.askinteger("Brightness", "Set brightness level (0-100):", parent=parent_window, minvalue=0, maxvalue=100)
-            break_time = simpledialog.askinteger("Break Time", "Set break time in minutes (default 25):", parent=parent_window, initialvalue=25)
-            color_temperature = simpledialog.askinteger("Color Temperature", "Set color temperature (default 6500K):", parent=parent_window, initialvalue=6500)
+            # Same bounds as validate_profile, so the dialogs reject what saving would
+            break_time = simpledialog.askinteger("Break Time", "Set break time in minutes (default 25):", parent=parent_window, initialvalue=25, minvalue=1, maxvalue=24 * 60)
+            color_temperature = simpledialog.askinteger("Color Temperature", "Set color temperature (1000-10000K, default 6500K):", parent=parent_window, initialvalue=6500, minvalue=1000, maxvalue=10000)
             if break_time is None:
                 break_time = 25
-            self.profiles[name] = {"brightness": brightness, "color_temperature": color_temperature, "break_time": break_time}
-            self.save_profiles()
+            try:
+                self.profiles[name] = {"brightness": brightness, "color_temperature": color_temperature, "break_time": break_time}
+            except ValueError as e:
+                messagebox.showerror("Create Profile", f"Profile '{name}' was not saved: {e}", parent=parent_window)
+                return
             profile_list.insert(tk.END, name)
             messagebox.showinfo("Profile Created", f"New profile '{name}' has been created.")
 
-    def save_profiles(self):
-        with open(self.profile_path, 'w') as file:
-            json.dump(self.profiles, file, indent=4)
+    BACKGROUND_COLORS = ("#89CFF0", "#96D8B9", "#C9A0DC")
+
+    def warm_up(self, on_done=None):
+        """Import the vision stack and prepare deferred UI work off the Tk thread."""
+        colors = [rgb_to_tuple(color) for color in self.BACKGROUND_COLORS]
+
+        def run():
+            timings = []
+            for name, step in (("numpy", lambda: np.ndarray),
+                               ("gradient", lambda: gradient_pixels(tuple(colors), 1000, 700)),
+                               ("usage stats", load_usage_stats),
+                               ("opencv", lambda: cv2.VideoCapture),
+                               ("displays", self.engine.prepare)):
+                started = time.perf_counter()
+                step()
+                timings.append((name, time.perf_counter() - started))
+            self.ui.post(self.draw_background, colors)
+            if on_done:
+                self.ui.post(on_done, timings)
+
+        threading.Thread(target=run, name="warm-up", daemon=True).start()
 
-    def load_profiles(self):
-        if not os.path.exists(self.profile_path):
-            return {}
-        with open(self.profile_path, 'r') as file:
-            return json.load(file)
+    def draw_background(self, colors):
+        gradient = create_horizontal_gradient(self.canvas, colors, 1000, 700)
+        self.canvas.tag_lower(gradient)
+
+    def notify(self, title, message, level="info"):
+        # Engine messages may come from worker threads
+        show = {'info': messagebox.showinfo, 'warning': messagebox.showwarning, 'error': messagebox.showerror}[level]
+        self.ui.post(show, title, message)
 
     def open_settings(self):
-        messagebox.showinfo("Settings", "Settings will be implemented soon.")
+        istok_regular_font = get_font('regular')
+        istok_bold_font = get_font('bold')
 
-    def process_images(self):
-        while self.running:
-            img = self.take_picture()
-            if img is None:
-                continue
+        new_window = tk.Toplevel(self.root)
+        new_window.title("Settings")
+        new_window.geometry("640x480")
+        new_window.configure(bg='#ADD8E6')
 
-            preprocessed_img = self.preprocess_image(img)
-            adaptive_thresh_img = self.adaptive_threshold(preprocessed_img)
-            count = self.count_bright_pixels(preprocessed_img, np.mean(np.array(adaptive_thresh_img)))
-            total_pixels = preprocessed_img.width * preprocessed_img.height
-            white_pixel_percentage = count / total_pixels
-            brightness = int(white_pixel_percentage * 255)
-            reduction_amount = 30
-            adjusted_brightness = max(min(brightness - reduction_amount, 255), 0)
-            self.set_brightness(adjusted_brightness)
-            time.sleep(10)
+        header_label = tk.Label(new_window, text="Diagnostics", font=istok_bold_font, bg='#ADD8E6')
+        header_label.pack(pady=(20, 10))
+
+        # Collection state lives in whichever process runs the engine
+        try:
+            enabled = self.engine.metrics_snapshot()['enabled']
+        except RuntimeError:
+            enabled = False
+        collect = tk.BooleanVar(value=enabled)
+        tk.Checkbutton(new_window, text="Collect performance metrics", variable=collect, bg='#ADD8E6',
+                       font=istok_regular_font,
+                       command=lambda: self.engine.metrics_snapshot(collect.get())).pack()
+
+        cpu_label = tk.Label(new_window, text="CPU: -", font=istok_regular_font, bg='#ADD8E6')
+        cpu_label.pack(pady=5)
+
+        columns = ("count", "mean", "p50", "p99", "max")
+        table = ttk.Treeview(new_window, columns=columns, height=12)
+        table.heading("#0", text="Metric")
+        table.column("#0", width=220)
+        for column in columns:
+            table.heading(column, text=column if column == "count" else f"{column} (ms)")
+            table.column(column, width=80, anchor="e")
+        table.pack(padx=10, fill=tk.BOTH, expand=True)
+
+        previous = {}
+
+        def refresh():
+            if not new_window.winfo_exists():
+                return
+            try:
+                snapshot = self.engine.metrics_snapshot()
+            except RuntimeError as e:
+                cpu_label.config(text=str(e))
+                new_window.after(1000, refresh)
+                return
+            # CPU share of the engine's process since the last refresh
+            now, cpu = time.monotonic(), snapshot['gauges'].get('process_cpu_seconds', 0.0)
+            if previous:
+                share = (cpu - previous['cpu']) / max(now - previous['at'], 1e-6)
+                cpu_label.config(text=f"CPU: {share:.1%} of one core, {snapshot['gauges'].get('threads', 0):.0f} threads")
+            previous.update(at=now, cpu=cpu)
+
+            table.delete(*table.get_children())
+            for name, timer in sorted(snapshot['timers'].items()):
+                table.insert("", tk.END, text=name, values=(timer['count'], *(f"{timer[key] * 1000:.2f}" for key in columns[1:])))
+            for name, value in sorted(snapshot['counters'].items()):
+                table.insert("", tk.END, text=name, values=(value, "", "", "", ""))
+            for name, value in sorted(snapshot['gauges'].items()):
+                table.insert("", tk.END, text=name, values=(f"{value:g}", "", "", "", ""))
+            new_window.after(1000, refresh)
+
+        def save_dump():
+            path = filedialog.asksaveasfilename(parent=new_window, defaultextension=".prom",
+                                                filetypes=[("Prometheus text", "*.prom"), ("JSON", "*.json")])
+            if not path:
+                return
+            try:
+                write_metrics(path, self.engine.metrics_snapshot())
+            except (OSError, RuntimeError) as e:
+                messagebox.showerror("Save Metrics", f"Failed to save metrics: {e}", parent=new_window)
+
+        button_frame = tk.Frame(new_window, bg='#ADD8E6')
+        button_frame.pack(pady=(10, 20))
+        tk.Button(button_frame, text="Reset", font=istok_regular_font,
+                  command=lambda: self.engine.metrics_snapshot(reset=True)).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Save Dump", font=istok_regular_font, command=save_dump).pack(side=tk.LEFT, padx=5)
+        tk.Button(button_frame, text="Close", font=istok_regular_font, bg='white', fg='black',
+                  command=new_window.destroy).pack(side=tk.LEFT, padx=5)
+        refresh()
 
     def monitor_health(self):
-        while self.running:
-            if self.current_profile:
-                recommended_break = self.current_profile.get('break_time', 25) * 60  # Use break time from the profile
-            else:
-                recommended_break = 1500  # Default break time in seconds (25 minutes)
+        if not self.running:
+            return None
+        if self.engine.current_profile:
+            recommended_break = self.engine.current_profile.get('break_time', 25) * 60  # Use break time from the profile
+        else:
+            recommended_break = 1500  # Default break time in seconds (25 minutes)
 
-            if (time.time() - self.start_time) >= 1800:  # 30 minutes for health monitoring
-                messagebox.showwarning("Health Alert", "You've been using the screen for 30 minutes. Consider taking a break!")
-                self.start_time = time.time()  # Reset timer
+        if (time.time() - self.start_time) >= 1800:  # 30 minutes for health monitoring
+            self.ui.post(messagebox.showwarning, "Health Alert", "You've been using the screen for 30 minutes. Consider taking a break!")
+            self.start_time = time.time()  # Reset timer
 
-            time.sleep(10)
+        # Wake up exactly when the next alert is due
+        return max(self.start_time + 1800 - time.time(), 0.0)
 
     def toggle_pomodoro(self):
         if not self.pomodoro_running:
@@ -509,49 +4443,50 @@ class ImageProcessor:
             self.pomodoro_running = True
             self.canvas.itemconfig(self.pomodoro_button_text, text="Stop Pomodoro")
             self.canvas.itemconfig(self.pomodoro_status_text, text="Pomodoro Status: Running")
-            self.pomodoro_thread = threading.Thread(target=self.pomodoro_timer)
-            self.pomodoro_thread.start()
+            self.pomodoro_stop = threading.Event()
+            threading.Thread(target=self.pomodoro_timer, args=(self.pomodoro_stop,), daemon=True).start()
 
     def stop_pomodoro(self):
         if self.pomodoro_running:
             self.pomodoro_running = False
+            # Signal the timer instead of joining it so the UI never blocks
+            self.pomodoro_stop.set()
             self.canvas.itemconfig(self.pomodoro_button_text, text="Start Pomodoro")
             self.canvas.itemconfig(self.pomodoro_status_text, text="Pomodoro Status: Idle")
-            if self.pomodoro_thread:
-                self.pomodoro_thread.join()
 
-    def pomodoro_timer(self):
+    def pomodoro_timer(self, stop_event):
         pomodoro_duration = 25 * 60  # 25 minutes
         break_duration = 5 * 60  # 5 minutes
-        
-        while self.pomodoro_running:
+
+        while not stop_event.is_set():
             # Work session
-            for remaining in range(pomodoro_duration, 0, -1):
-                if not self.pomodoro_running:
-                    return
-                mins, secs = divmod(remaining, 60)
-                self.canvas.itemconfig(self.pomodoro_status_text, text=f"Pomodoro Status: Working - {mins:02d}:{secs:02d}")
-                time.sleep(1)
-            
-            if not self.pomodoro_running:
+            if not self.pomodoro_countdown(stop_event, pomodoro_duration, "Working"):
                 return
 
             # Break time
-            messagebox.showinfo("Pomodoro", "Time for a 5-minute break!")
-            for remaining in range(break_duration, 0, -1):
-                if not self.pomodoro_running:
-                    return
-                mins, secs = divmod(remaining, 60)
-                self.canvas.itemconfig(self.pomodoro_status_text, text=f"Pomodoro Status: Break - {mins:02d}:{secs:02d}")
-                time.sleep(1)
-            
-            if not self.pomodoro_running:
+            self.ui.post(messagebox.showinfo, "Pomodoro", "Time for a 5-minute break!")
+            if not self.pomodoro_countdown(stop_event, break_duration, "Break"):
                 return
 
-            messagebox.showinfo("Pomodoro", "Break over! Ready to focus again?")
+            self.ui.post(messagebox.showinfo, "Pomodoro", "Break over! Ready to focus again?")
+
+    def pomodoro_countdown(self, stop_event, duration, phase):
+        """Post a status update every second; returns False if stopped early."""
+        end = time.monotonic() + duration
+        for remaining in range(duration, 0, -1):
+            mins, secs = divmod(remaining, 60)
+            self.ui.post(self.show_pomodoro_status, stop_event, f"Pomodoro Status: {phase} - {mins:02d}:{secs:02d}",
+                         key="pomodoro_status")
+            metrics.incr("wakeups_pomodoro")
+            # Wait for the next whole second of the countdown so ticks do not drift
+            if stop_event.wait(max(end - remaining + 1 - time.monotonic(), 0)):
+                return False
+        return True
 
-        self.canvas.itemconfig(self.pomodoro_status_text, text="Pomodoro Status: Idle")
-        self.canvas.itemconfig(self.pomodoro_button_text, text="Start Pomodoro")
+    def show_pomodoro_status(self, stop_event, text):
+        # Updates queued before the timer was stopped must not overwrite "Idle"
+        if not stop_event.is_set():
+            self.canvas.itemconfig(self.pomodoro_status_text, text=text)
 
     def update_screen_usage(self):
         if self.running:
@@ -560,84 +4495,84 @@ class ImageProcessor:
             self.screen_usage_label.config(text=f"Total Screen Usage Time: {total_usage_minutes} minutes")
             self.canvas.after(1000, self.update_screen_usage)
 
-    def adaptive_color_temperature(self):
-        while self.running:
-            current_hour = datetime.now().hour
-            if 8 <= current_hour < 18:
-                self.set_color_temperature(6500)  # Daytime
-            else:
-                self.set_color_temperature(3000)  # Nighttime
-            time.sleep(3600)  # Check every hour
-
-    def take_picture(self):
-        cap = cv2.VideoCapture(0)
-        if not cap.isOpened():
-            messagebox.showerror("Error", "Cannot open camera")
-            return None
-        
-        ret, frame = cap.read()
-        cap.release()
-        if not ret:
-            messagebox.showerror("Error", "Failed to capture image")
-            return None
-        
-        return Image.fromarray(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB))
-
-    def preprocess_image(self, image):
-        enhancer = ImageEnhance.Contrast(image.convert('L'))
-        return enhancer.enhance(2)
-
-    def adaptive_threshold(self, image):
-        img_array = np.array(image.convert('L'))
-        threshold_img = np.where(img_array >= np.mean(img_array), 255, 0)
-        return Image.fromarray(threshold_img.astype(np.uint8))
-
-    def count_bright_pixels(self, image, threshold):
-        img_array = np.array(image)
-        return np.sum(img_array >= threshold)
-
-    def set_brightness(self, brightness):
-        brightness = max(min(brightness, 100), 0)  # Ensuring the brightness value is within acceptable range
-        command = ["powershell", "-Command", "(Get-WmiObject -Namespace root/WMI -Class WmiMonitorBrightnessMethods).WmiSetBrightness(1, {})".format(brightness)]
-        subprocess.run(command)
-
-    def set_color_temperature(self, temperature):
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Luminar - Adaptive Screen Brightness")
+    parser.add_argument("--benchmark-gradient", action="store_true",
+                        help="compare the line-based and image-based gradient renderers and exit")
+    parser.add_argument("--benchmark", nargs="*", metavar="SOURCE",
+                        help="time the estimation stages on .npy/video files or SCENE@RESOLUTION synthetic "
+                             f"frames (scenes: {', '.join(BENCHMARK_SCENES)}; default: all) and exit")
+    parser.add_argument("--benchmark-iterations", type=int, default=50, help="frames timed per source")
+    parser.add_argument("--benchmark-output", default="benchmark_results.json", help="where to write the JSON results")
+    parser.add_argument("--benchmark-baseline", help="earlier --benchmark JSON to compare against")
+    parser.add_argument("--replay", nargs="+", metavar="RECORDING",
+                        help="run videos, .npy frame stacks or frame directories through the brightness "
+                             "pipeline and write the resulting timeline, then exit")
+    parser.add_argument("--replay-output", default="replay.csv",
+                        help="timeline file (.csv, .npy or .parquet); writes go to NAME.writes.csv")
+    parser.add_argument("--replay-rate", type=float, default=1.0, help="samples per second of footage")
+    parser.add_argument("--replay-workers", type=int, help="worker processes (default: one per CPU)")
+    parser.add_argument("--replay-profile", help="profile to apply while replaying")
+    parser.add_argument("--headless", action="store_true",
+                        help="run the brightness engine without a window, controlled over a Unix socket")
+    parser.add_argument("--idle", action="store_true", help="with --headless, wait for a start command")
+    parser.add_argument("--backend", choices=sorted(DISPLAY_BACKENDS), help="display backend to use")
+    parser.add_argument("--idle-source", choices=sorted(IDLE_SOURCES) + ["none"],
+                        help="where to read the time since the last user input (default: auto-detect)")
+    parser.add_argument("--displays", action="store_true", help="list the displays Luminar can control and exit")
+    parser.add_argument("--socket", help=f"control socket path (default {default_socket_path()})")
+    parser.add_argument("--connect", action="store_true", help="make the window a client of a running daemon")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="print the time spent in each startup phase and exit once warm-up finishes")
+    parser.add_argument("--metrics", metavar="FILE",
+                        help="collect performance metrics and write them to FILE every 10 s "
+                             "(JSON for *.json, Prometheus text otherwise)")
+    parser.add_argument("--ctl", nargs="+", metavar="COMMAND",
+                        help="send start, stop, status, metrics or 'profile NAME' to a running daemon and exit")
+    args = parser.parse_args()
+    if args.metrics:
+        import atexit
+        metrics.enabled = True
+        metrics.dump_every(args.metrics)
+        atexit.register(metrics.dump, args.metrics)
+    if args.benchmark_gradient:
+        benchmark_gradient()
+        raise SystemExit
+    if args.benchmark is not None:
         try:
-            # Attempt to set color temperature using WMI
-            command = ["powershell", "-Command", "(Get-WmiObject -Namespace root/WMI -Class WmiMonitorBrightnessMethods).WmiSetBrightness(1, {})".format(temperature)]
-            result = subprocess.run(command, capture_output=True, text=True)
-            
-            if "Invalid class" in result.stderr:
-                raise ValueError("WMI class not supported.")
-            
-            # You could further customize the message based on the result
-            messagebox.showinfo("Color Temperature", "Color temperature adjusted to {}K".format(temperature))
-            
-        except Exception as e:
-            messagebox.showerror("Error", f"Failed to adjust color temperature: {str(e)}. Your system may not support this feature.")
-
-    def run_manual_override(self):
-        # Example method to override manual settings when video meetings are active (specific implementation may vary)
-        # This placeholder checks if any video conferencing apps are running and adjusts settings accordingly
-        running_apps = subprocess.check_output("tasklist", shell=True).decode()
-        video_conference_apps = ["zoom.exe", "Teams.exe", "googletalk.exe"]
-
-        for app in video_conference_apps:
-            if app.lower() in running_apps.lower():
-                messagebox.showinfo("Manual Override", f"Video conference detected. Manual override activated for {app}.")
-                self.set_brightness(100)  # Example: max brightness for video meetings
-                break
-
-    def run_energy_efficiency(self):
-        # Example energy-saving method (simplified):
-        # Adjust the screen's refresh rate or dim the brightness after a period of inactivity
-        idle_time = time.time() - self.start_time
-        if idle_time > 300:  # 5 minutes of inactivity
-            self.set_brightness(30)  # Dim the screen to save energy
+            run_benchmark(args.benchmark, args.benchmark_iterations, args.benchmark_output, args.benchmark_baseline)
+        except (OSError, ValueError) as e:
+            raise SystemExit(str(e))
+        raise SystemExit
+    if args.replay:
+        try:
+            run_replay(args.replay, args.replay_output, args.replay_rate, args.replay_workers, args.replay_profile)
+        except (OSError, ValueError, KeyError) as e:
+            raise SystemExit(str(e))
+        raise SystemExit
+    if args.displays:
+        registry = create_display_backend(args.backend)
+        for display in registry.describe():
+            print(f"{display['id']:<32}{', '.join(display['capabilities'])}")
+        registry.close()
+        raise SystemExit
+    if args.headless:
+        run_headless(args.socket, args.backend, autostart=not args.idle, idle_source=args.idle_source)
+        raise SystemExit
+    if args.ctl:
+        extra = {"name": " ".join(args.ctl[1:])} if args.ctl[0] == "profile" else {}
+        try:
+            print(json.dumps(ControlClient(args.socket).request(args.ctl[0], **extra), indent=2))
+        except RuntimeError as e:
+            raise SystemExit(str(e))
+        raise SystemExit
 
-if __name__ == "__main__":
+    profiler = StartupProfiler(_MODULE_START)
+    profiler.mark("module import")
     root = tk.Tk()
     root.title("Luminar - Adaptive Screen Brightness")
+    profiler.mark("tk root")
 
     # Center the window after its initial configuration
     root.after(1, lambda: center_window(root))
@@ -645,5 +4580,32 @@ if __name__ == "__main__":
     # Disable window resizing
     root.resizable(False, False)
 
-    app = ImageProcessor(root)
+    def on_close():
+        # End a running session at the time the window closed, not when Luminar next starts
+        log_session_stop()
+        root.destroy()
+    root.protocol("WM_DELETE_WINDOW", on_close)
+
+    open_usage_logs()
+    profiler.mark("usage history")
+    app = ImageProcessor(root, (args.socket or default_socket_path()) if args.connect else None,
+                         args.backend, args.idle_source)
+    profiler.mark("build ui")
+    root.update()
+    profiler.mark("first draw")
+
+    def finish_profile(background):
+        profiler.report(background)
+        root.destroy()
+
+    # The vision stack loads in the background after the window is visible
+    app.warm_up(finish_profile if args.profile_startup else None)
     root.mainloop()
+    app.profiles.flush()
+    log_session_stop()
+    usage_logs.close()
+    if args.profile_startup:
+        if profiler.within_budget is None:
+            profiler.report()  # The window was closed before warm-up finished
+        if not profiler.within_budget:
+            raise SystemExit(1)
@@ -0,0 +1,87 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+
+class FakeCapture:
+    """cv2.VideoCapture stand-in; grab() takes a while, as it does on a real device."""
+
+    opened = True
+    grab_time = 0.02
+
+    def __init__(self, index):
+        self.released = False
+
+    def isOpened(self):
+        return self.opened
+
+    def grab(self):
+        time.sleep(self.grab_time)
+        return not self.released
+
+    def retrieve(self, buffer=None):
+        return True, np.zeros((4, 4, 3), np.uint8)
+
+    def release(self):
+        self.released = True
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+@pytest.fixture
+def session(luminar, monkeypatch):
+    monkeypatch.setattr(luminar.cv2, "VideoCapture", FakeCapture)
+    session = luminar.CameraSession(warmup_frames=0)
+    yield session
+    while session._refs:
+        session.release()
+
+
+def test_read_returns_the_newest_frame(session):
+    session.acquire()
+    frame = session.read(timeout=2)
+    assert frame.shape == (4, 4, 3)
+
+
+def test_exiting_grabber_leaves_a_newer_device_alone(session):
+    session.acquire()
+    assert session.read(timeout=2) is not None
+    old = session._cap
+    with session._cap_lock:
+        # A quick release/acquire: a new grabber installs its device before the old one exits
+        session.release()
+        newer = session._cap = FakeCapture(0)
+    assert wait_for(lambda: old.released)
+    time.sleep(0.05)
+    assert session._cap is newer and not newer.released
+
+
+def test_errors_reach_listeners_once_per_outage(session, monkeypatch):
+    monkeypatch.setattr(FakeCapture, "opened", False)
+    session.max_backoff = 0.05
+    errors = []
+    reported = threading.Event()
+    session.error_listeners.append(lambda error: (errors.append(str(error)), reported.set()))
+    session.acquire()
+    assert reported.wait(2)
+    time.sleep(0.3)  # Several reopen attempts fail the same way
+    assert errors == ["Cannot open camera 0"]
+    assert not session.connected
+
+
+def test_engine_shows_camera_errors_while_running(luminar, session):
+    notes = []
+    engine = luminar.BrightnessEngine({}, notify=lambda title, message, level="info": notes.append((title, level)),
+                                      backend="fake", camera=session, idle_source="none")
+    session._set_error(IOError("Cannot open camera 0"))
+    assert notes == []  # Not sampling, so nothing is on hold
+    engine.running = True
+    session._set_error(IOError("Failed to capture image"))
+    assert notes == [("Camera", "warning")]
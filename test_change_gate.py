@@ -0,0 +1,75 @@
+import numpy as np
+import pytest
+
+
+def flat(value, shape=(240, 320, 3)):
+    return np.full(shape, value, np.uint8)
+
+
+@pytest.mark.parametrize("mode", ["thumbnail", "histogram"])
+def test_first_frame_always_passes(luminar, mode):
+    gate = luminar.ChangeGate(mode)
+    assert gate.changed(flat(100))
+    assert gate.last_score is None
+
+
+@pytest.mark.parametrize("mode", ["thumbnail", "histogram"])
+def test_same_scene_is_skipped(luminar, mode):
+    gate = luminar.ChangeGate(mode)
+    gate.changed(flat(100))
+    assert not gate.changed(flat(100))
+    assert not gate.changed(flat(100))
+    assert gate.skipped == 2 and gate.skip_rate() == pytest.approx(2 / 3)
+
+
+@pytest.mark.parametrize("mode", ["thumbnail", "histogram"])
+def test_scene_change_passes(luminar, mode):
+    gate = luminar.ChangeGate(mode)
+    gate.changed(flat(40))
+    assert gate.changed(flat(200))
+    assert gate.last_score > gate.threshold
+
+
+def test_slow_drift_accumulates_against_reference(luminar):
+    # Each step is below the threshold, but the reference only moves on an estimate
+    gate = luminar.ChangeGate("thumbnail", threshold=0.01)
+    gate.changed(flat(100))
+    results = [gate.changed(flat(100 + step)) for step in range(1, 6)]
+    assert results[:2] == [False, False]
+    assert True in results
+
+
+def test_histogram_ignores_motion(luminar):
+    frame = flat(20)
+    frame[:, :160] = 220
+    moved = np.roll(frame, 80, axis=1)
+
+    thumbnail, histogram = luminar.ChangeGate("thumbnail"), luminar.ChangeGate("histogram")
+    for gate in (thumbnail, histogram):
+        gate.changed(frame)
+    assert thumbnail.changed(moved)
+    assert not histogram.changed(moved)
+
+
+def test_max_skips_forces_an_estimate(luminar):
+    gate = luminar.ChangeGate(max_skips=3)
+    results = [gate.changed(flat(100)) for _ in range(6)]
+    assert results == [True, False, False, False, True, False]
+
+
+def test_reset_forces_an_estimate(luminar):
+    gate = luminar.ChangeGate()
+    gate.changed(flat(100))
+    gate.reset()
+    assert gate.changed(flat(100))
+
+
+def test_unknown_mode_is_rejected(luminar):
+    with pytest.raises(ValueError):
+        luminar.ChangeGate("optical-flow")
+
+
+def test_disabled_gate_passes_every_frame(luminar):
+    gate = luminar.ChangeGate(enabled=False)
+    assert all(gate.changed(flat(100)) for _ in range(3))
+    assert gate.skip_rate() == 0 and gate.frames == 3
@@ -0,0 +1,91 @@
+import ctypes
+from datetime import datetime, timedelta
+from unittest import mock
+
+import numpy as np
+import pytest
+
+
+def test_whitepoint_is_neutral_at_6500_and_warm_below(luminar):
+    assert luminar.blackbody_whitepoint(6500) == pytest.approx([1.0, 1.0, 1.0])
+    red, green, blue = luminar.blackbody_whitepoint(3000)
+    assert red == 1.0 and 0 < blue < green < 1
+
+
+def test_gamma_ramps_are_cached_read_only_tables(luminar):
+    ramp = luminar.gamma_ramp(3000, 1024)
+    assert ramp.shape == (3, 1024) and ramp.dtype == np.uint16
+    assert not ramp.flags.writeable
+    assert ramp[:, 0].tolist() == [0, 0, 0]
+    # Nearby temperatures round to the same step and share the table
+    assert luminar.gamma_ramp(3040, 1024) is ramp
+    assert luminar.gamma_ramp(6500)[:, -1].tolist() == [65535, 65535, 65535]
+
+
+def test_schedule_follows_day_night_and_transitions(luminar):
+    day = datetime(2026, 10, 16)
+    assert luminar.color_temperature_at(day.replace(hour=12))[0] == 6500
+    assert luminar.color_temperature_at(day.replace(hour=23))[0] == 3000
+    kelvin, delay = luminar.color_temperature_at(day.replace(hour=18, minute=30))
+    assert kelvin == pytest.approx(4750)
+    assert 0 < delay <= 3600 * 100 / 3500
+    # Outside a transition it sleeps until the next boundary
+    assert luminar.color_temperature_at(day.replace(hour=12))[1] == 6 * 3600
+
+
+def test_sunset_reuses_cached_ramps(luminar):
+    luminar._gamma_ramp.cache_clear()
+    start = datetime(2026, 10, 16, 18)
+    for _ in range(2):
+        for second in range(0, 3600, 10):
+            kelvin, _ = luminar.color_temperature_at(start + timedelta(seconds=second))
+            luminar.gamma_ramp(kelvin)
+    info = luminar._gamma_ramp.cache_info()
+    assert info.misses <= 36
+    assert info.currsize <= info.maxsize
+
+
+def test_fake_backend_records_ramp(luminar):
+    fake = luminar.FakeDisplayBackend()
+    fake.set_color_temperature(3000)
+    assert fake.writes == [('color_temperature', 3000)]
+    assert fake.ramp is luminar.gamma_ramp(3000)
+
+
+class CrtcGamma(ctypes.Structure):
+    _fields_ = [("size", ctypes.c_int)] + [(c, ctypes.POINTER(ctypes.c_ushort)) for c in ("red", "green", "blue")]
+
+
+@pytest.fixture
+def gamma_backend(luminar):
+    """An X11GammaBackend writing into local buffers instead of an X server."""
+    size = 256
+    channels = [(ctypes.c_ushort * size)() for _ in range(3)]
+    backend = object.__new__(luminar.X11GammaBackend)
+    backend._ctypes, backend._x11, backend._xrandr = ctypes, mock.Mock(), mock.Mock()
+    backend._display, backend._crtc, backend.size = 1, 1, size
+    backend._gamma = ctypes.pointer(CrtcGamma(size, *[ctypes.cast(c, ctypes.POINTER(ctypes.c_ushort)) for c in channels]))
+    backend._buffer = np.empty((3, size), np.uint16)
+    backend.kelvin, backend.scale, backend._applied = luminar.NEUTRAL_TEMPERATURE, 1.0, None
+    return backend, channels
+
+
+def test_gamma_backend_composes_brightness_and_temperature(luminar, gamma_backend):
+    backend, channels = gamma_backend
+    backend.set_color_temperature(3000)
+    warm = [channel[255] for channel in channels]
+    backend.set_brightness(50)
+    assert [channel[255] for channel in channels] == [value // 2 for value in warm]
+    # A color temperature step keeps the dimming
+    backend.set_color_temperature(3500)
+    assert channels[0][255] == 32767
+
+
+def test_gamma_backend_skips_unchanged_writes_and_resets_on_close(luminar, gamma_backend):
+    backend, channels = gamma_backend
+    backend.set_color_temperature(3000)
+    backend.set_color_temperature(3020)
+    backend.set_brightness(100)
+    assert backend._xrandr.XRRSetCrtcGamma.call_count == 1
+    backend.close()
+    assert [channel[255] for channel in channels] == [65535, 65535, 65535]
@@ -0,0 +1,127 @@
+import subprocess
+
+import pytest
+
+
+@pytest.fixture
+def fake(luminar):
+    return luminar.FakeDisplayBackend()
+
+
+def test_controller_writes_through_backend(luminar, fake):
+    controller = luminar.DisplayController(fake, coalesce_window=0.01)
+    controller.set_brightness(42)
+    controller.set_color_temperature(4000)
+    assert controller.flush(timeout=2)
+    assert ('brightness', 42) in fake.writes
+    assert ('color_temperature', 4000) in fake.writes
+    controller.close()
+
+
+def test_controller_coalesces_bursts_and_drops_repeats(luminar, fake):
+    controller = luminar.DisplayController(fake, coalesce_window=0.2)
+    for percent in (10, 20, 30):
+        controller.set_brightness(percent)
+    assert controller.flush(timeout=2)
+    assert fake.writes == [('brightness', 30)]
+    assert controller.merged == 2
+
+    controller.set_brightness(30)
+    assert controller.flush(timeout=2)
+    assert fake.writes == [('brightness', 30)]
+    assert controller.dropped == 1
+    controller.close()
+
+
+def test_controller_clamps_brightness(luminar, fake):
+    controller = luminar.DisplayController(fake, coalesce_window=0.01)
+    controller.set_brightness(150)
+    assert controller.flush(timeout=2)
+    assert fake.brightness == 100
+    controller.close()
+
+
+def test_controller_reports_backend_errors(luminar):
+    errors = []
+    controller = luminar.DisplayController(luminar.DisplayBackend(), coalesce_window=0.01,
+                                           on_error=lambda setting, error: errors.append(setting))
+    controller.set_brightness(50)
+    assert controller.flush(timeout=2)
+    assert errors == ['brightness']
+    assert controller.writes == 0
+    controller.close()
+
+
+def test_registry_applies_display_curves(luminar):
+    registry = luminar.DisplayRegistry(["fake"])
+    registry.set_curves({"fake:fake0": {"min": 20, "max": 60}})
+    registry.set_brightness(50)
+    assert registry.displays[0].backend.brightness == 40
+    registry.close()
+
+
+def test_registry_reports_hung_displays(luminar, monkeypatch):
+    monkeypatch.setattr(luminar.FakeDisplayBackend, "timeout", 0.05)
+    registry = luminar.DisplayRegistry(["fake"])
+    registry.displays[0].backend.delay = 0.3
+    with pytest.raises(luminar.DisplayWriteError):
+        registry.set_brightness(10)
+    registry.close()
+
+
+PANEL_EDID = bytes(range(128))
+MONITOR_EDID = bytes(reversed(range(128)))
+
+XRANDR_PROP = """Screen 0: minimum 320 x 200, current 3840 x 1080, maximum 16384 x 16384
+eDP1 connected primary 1920x1080+0+0 (normal left inverted right x axis y axis) 309mm x 174mm
+\tEDID: 
+\t\t{panel0}
+\t\t{panel1}
+\tBACKLIGHT: 400
+HDMI1 connected 1920x1080+1920+0 (normal left inverted right x axis y axis) 527mm x 296mm
+\tEDID: 
+\t\t{monitor0}
+\t\t{monitor1}
+DP1 disconnected (normal left inverted right x axis y axis)
+""".format(panel0=PANEL_EDID[:64].hex(), panel1=PANEL_EDID[64:].hex(),
+           monitor0=MONITOR_EDID[:64].hex(), monitor1=MONITOR_EDID[64:].hex())
+
+
+@pytest.fixture
+def sysfs(luminar, tmp_path, monkeypatch):
+    """A laptop panel with a backlight plus an HDMI monitor, as sysfs shows them."""
+    drm = tmp_path / "drm"
+    for connector, status, edid in (("card0-eDP-1", "connected", PANEL_EDID),
+                                    ("card0-HDMI-A-1", "connected", MONITOR_EDID),
+                                    ("card0-DP-1", "disconnected", b"")):
+        (drm / connector).mkdir(parents=True)
+        (drm / connector / "status").write_text(status + "\n")
+        (drm / connector / "edid").write_bytes(edid)
+    backlight = tmp_path / "backlight" / "intel_backlight"
+    backlight.mkdir(parents=True)
+    (backlight / "max_brightness").write_text("1000\n")
+    (backlight / "brightness").write_text("500\n")
+    monkeypatch.setattr(luminar, "DRM_ROOT", drm)
+    monkeypatch.setattr(luminar.SysfsBacklightBackend, "ROOT", tmp_path / "backlight")
+    return tmp_path
+
+
+def test_drm_connectors_reports_connected_outputs(luminar, sysfs):
+    assert [(name, edid) for name, _, edid in luminar.drm_connectors()] == \
+        [("HDMI-A-1", MONITOR_EDID), ("eDP-1", PANEL_EDID)]
+    assert luminar.SysfsBacklightBackend.panel_edids() == {PANEL_EDID}
+
+
+def test_xrandr_edids_are_parsed_from_properties(luminar, monkeypatch):
+    monkeypatch.setattr(luminar.subprocess, "run",
+                        lambda *args, **kwargs: subprocess.CompletedProcess(args, 0, XRANDR_PROP, ""))
+    assert luminar.XrandrBackend.edids() == {"eDP1": PANEL_EDID, "HDMI1": MONITOR_EDID}
+
+
+def test_registry_matches_screens_by_edid_not_name(luminar, sysfs, monkeypatch):
+    # X calls the panel eDP1 while the kernel calls it eDP-1; only the EDID ties them together
+    monkeypatch.setattr(luminar.XrandrBackend, "discover", classmethod(lambda cls: ["eDP1", "HDMI1"]))
+    monkeypatch.setattr(luminar.XrandrBackend, "edids", staticmethod(lambda: {"eDP1": PANEL_EDID, "HDMI1": MONITOR_EDID}))
+    registry = luminar.DisplayRegistry(["sysfs", "xrandr"])
+    assert [display.id for display in registry.displays] == ["sysfs:intel_backlight", "xrandr:HDMI1"]
+    registry.close()
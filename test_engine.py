@@ -0,0 +1,123 @@
+import threading
+import time
+
+import numpy as np
+import pytest
+
+
+class CountingCamera:
+    """ReplayCamera that counts acquire/release calls."""
+
+    def __init__(self, luminar):
+        self._replay = luminar.ReplayCamera([np.zeros((48, 64, 3), np.uint8)])
+        self.connected, self.last_error = True, None
+        self.acquired = 0
+        self.released = 0
+
+    def acquire(self):
+        self.acquired += 1
+        return self
+
+    def release(self):
+        self.released += 1
+
+    def read(self, timeout=None, copy=True):
+        return self._replay.read(timeout, copy)
+
+
+@pytest.fixture
+def engine(luminar):
+    engine = luminar.BrightnessEngine({}, backend="fake", camera=CountingCamera(luminar), idle_source="none")
+    yield engine
+    engine.stop()
+    if engine.display is not None:
+        engine.transitions.close()
+        engine.display.close()
+
+
+def test_concurrent_starts_set_up_once(engine, monkeypatch):
+    open_display = engine.open_display
+    controllers = []
+
+    def slow_open_display():
+        time.sleep(0.1)  # Backend discovery can take this long and more
+        controllers.append(open_display())
+        return controllers[-1]
+
+    monkeypatch.setattr(engine, "open_display", slow_open_display)
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(engine.start())) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    time.sleep(0.05)
+    assert engine.status()['starting']
+    for thread in threads:
+        thread.join()
+
+    assert sorted(results) == [False, False, False, True]
+    assert len(controllers) == 1
+    assert engine.camera.acquired == 1
+    assert engine.status()['running'] and not engine.status()['starting']
+
+
+def test_stop_during_start_waits_for_it(engine, monkeypatch):
+    open_display = engine.open_display
+    monkeypatch.setattr(engine, "open_display", lambda: (time.sleep(0.1), open_display())[1])
+    starter = threading.Thread(target=engine.start)
+    starter.start()
+    time.sleep(0.05)
+    assert engine.stop()
+    starter.join()
+    assert not engine.running
+    assert engine.camera.released == engine.camera.acquired == 1
+
+
+def test_profile_tunes_the_pipeline(luminar, engine):
+    engine.profiles = {"Desk": luminar.validate_profile({"sampling": {"mode": "pyramid", "factor": 2},
+                                                         "smoothing": {"method": "ema", "deadband": 1}})}
+    assert engine.sampler.mode == "stride"
+    engine.set_profile("Desk")
+    assert (engine.sampler.mode, engine.sampler.factor) == ("pyramid", 2)
+    assert engine.status()['sampling']['mode'] == "pyramid"
+    assert (engine.brightness_filter.method, engine.brightness_filter.deadband) == ("ema", 1)
+
+
+def sample(engine, count):
+    """Run count iterations of the sampling loop on the calling thread."""
+    engine.open_display()
+    engine.running = True
+    for _ in range(count):
+        engine.process_images()
+
+
+def test_change_gate_skips_an_unchanged_scene(engine):
+    sample(engine, 4)
+    assert engine.sampler.samples == 1
+    assert engine.status()['change_gate']['skipped'] == 3
+
+
+def test_profile_can_turn_the_change_gate_off(luminar, engine):
+    engine.profiles = {"Always": luminar.validate_profile({"change_gate": False})}
+    engine.set_profile("Always")
+    sample(engine, 4)
+    assert engine.sampler.samples == 4
+    assert not engine.status()['change_gate']['enabled']
+
+
+def test_profile_sets_the_change_gate_threshold(luminar, engine):
+    engine.profiles = {"Loose": luminar.validate_profile({"change_gate": {"mode": "histogram", "threshold": 0.5}})}
+    engine.set_profile("Loose")
+    assert (engine.change_gate.mode, engine.change_gate.threshold) == ("histogram", 0.5)
+
+
+def test_profile_sets_transition_curve_and_durations(luminar, engine):
+    engine.profiles = {"Snappy": luminar.validate_profile({"transitions": {"curve": "linear", "brightness": 0.5}}),
+                       "Plain": luminar.validate_profile({})}
+    engine.set_profile("Snappy")
+    engine.open_display()
+    assert engine.transitions.curve == "linear"
+    assert engine.transitions.durations == {'brightness': 0.5, 'color_temperature': 5.0}
+
+    engine.set_profile("Plain")
+    assert engine.transitions.curve == "ease"
+    assert engine.transitions.durations == luminar.TransitionEngine.DEFAULT_DURATIONS
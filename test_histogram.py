@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def gray():
+    return np.random.default_rng(3).integers(0, 256, (97, 131), dtype=np.uint8)
+
+
+def test_counts_match_bincount(luminar, gray):
+    histogram = luminar.LuminanceHistogram.of(gray)
+    assert histogram.total == gray.size
+    assert list(histogram.counts) == list(np.bincount(gray.ravel(), minlength=256))
+
+
+def test_statistics_match_pixels(luminar, gray):
+    histogram = luminar.LuminanceHistogram.of(gray)
+    assert histogram.mean() == pytest.approx(gray.mean())
+    for level in (0, 1, 99.5, 128, 255, 256):
+        assert histogram.count_at_least(level) == int((gray >= level).sum())
+    for q in (10, 50, 90, 100):
+        # numpy's "inverted_cdf" is the same lowest-level-at-or-below definition
+        assert histogram.percentile(q) == int(np.percentile(gray, q, method="inverted_cdf"))
+
+
+def test_trimmed_mean_drops_outliers(luminar):
+    gray = np.full((10, 10), 100, np.uint8)
+    gray.flat[:5] = 0
+    gray.flat[-5:] = 255
+    histogram = luminar.LuminanceHistogram.of(gray)
+    assert histogram.trimmed_mean(0.05) == pytest.approx(100)
+    assert histogram.median() == 100
+
+
+def test_remap_applies_lookup_table(luminar, gray):
+    lut = (255 - np.arange(256)).astype(np.uint8)
+    remapped = luminar.LuminanceHistogram.of(gray).remap(lut)
+    assert list(remapped.counts) == list(np.bincount(lut[gray].ravel(), minlength=256))
+
+
+def test_ring_keeps_newest_histograms(luminar):
+    ring = luminar.HistogramRing(capacity=3)
+    assert ring.latest() is None and ring.recent().shape == (0, 256)
+    for value in range(5):
+        ring.append(luminar.LuminanceHistogram.of(np.full((2, 2), value, np.uint8)))
+
+    assert [int(np.argmax(row)) for row in ring.recent()] == [2, 3, 4]
+    assert [int(np.argmax(row)) for row in ring.recent(2)] == [3, 4]
+    assert ring.latest().mean() == 4
+    assert ring.combined().total == 12
+    ring.clear()
+    assert ring.latest() is None
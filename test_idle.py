@@ -0,0 +1,75 @@
+import time
+
+import numpy as np
+import pytest
+
+
+@pytest.fixture
+def source(luminar):
+    return luminar.FakeIdleSource()
+
+
+def test_monitor_reports_idle_and_active_once(luminar, source):
+    events = []
+    monitor = luminar.IdleMonitor(source, idle_after=300, on_idle=lambda seconds: events.append(("idle", seconds)),
+                                  on_active=lambda: events.append(("active",)))
+    assert monitor.poll() == 300
+    source.idle = 400
+    assert monitor.poll() == monitor.active_poll
+    assert monitor.poll() == monitor.active_poll
+    source.touch()
+    monitor.poll()
+    assert events == [("idle", 400), ("active",)]
+
+
+def test_monitor_sleeps_until_idle_could_be_reached(luminar, source):
+    monitor = luminar.IdleMonitor(source, idle_after=300)
+    source.idle = 250
+    assert monitor.poll() == 50
+    source.idle = 299.9
+    assert monitor.poll() == monitor.active_poll
+
+
+@pytest.fixture
+def engine(luminar):
+    camera = luminar.ReplayCamera([np.zeros((48, 64, 3), np.uint8)])
+    engine = luminar.BrightnessEngine({}, backend="fake", camera=camera, idle_source="fake")
+    yield engine
+    engine.stop()
+    engine.transitions.close()
+    engine.display.flush(timeout=2)
+    engine.display.close()
+
+
+def applied_brightness(engine, expected, timeout=5.0):
+    """Brightness on the fake display once it reaches expected (ramps take a moment), or the last value."""
+    display = engine.display.backend.displays[0].backend
+    deadline = time.monotonic() + timeout
+    while display.brightness != expected and time.monotonic() < deadline:
+        time.sleep(0.05)
+    return display.brightness
+
+
+def test_engine_dims_while_idle_and_restores(engine):
+    engine.start()
+    engine.last_brightness = 80
+    engine.on_user_idle(400)
+    assert engine.status()['idle']
+    assert engine.camera_parked
+    assert applied_brightness(engine, engine.IDLE_BRIGHTNESS) == engine.IDLE_BRIGHTNESS
+
+    # Sampling resumes right away, so check the restore request rather than the screen
+    requested = []
+    engine.set_brightness = requested.append
+    engine.on_user_active()
+    assert not engine.status()['idle']
+    assert requested == [80]
+
+
+def test_restart_clears_idle_state(engine):
+    engine.start()
+    engine.on_user_idle(400)
+    engine.stop()
+    engine.start()
+    assert not engine.status()['idle']
+    assert engine.active_brightness is None
@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+# Ratios are counts over the same pixel total, so the two chains should agree exactly
+TOLERANCE = 1e-9
+
+
+@pytest.fixture(scope="module")
+def legacy(luminar):
+    # The PIL chain only calls its own helper methods; no window is needed
+    return luminar.BrightnessEngine.__new__(luminar.BrightnessEngine).legacy_estimate
+
+
+def check(luminar, legacy, frame):
+    fused = luminar.LuminanceEstimator().estimate(frame).ratio
+    assert fused == pytest.approx(legacy(frame), abs=TOLERANCE)
+
+
+def gradient(width, height, low, high):
+    row = np.linspace(low, high, width).astype(np.uint8)
+    return np.repeat(np.broadcast_to(row, (height, width))[..., None], 3, axis=2).copy()
+
+
+@pytest.mark.parametrize("scene", ["dark", "indoor", "daylight", "backlit", "flicker"])
+def test_matches_legacy_on_benchmark_scenes(luminar, legacy, scene):
+    for frame in luminar.synthetic_frames(scene, 160, 120, 4):
+        check(luminar, legacy, frame)
+
+
+@pytest.mark.parametrize("low, high", [(0, 255), (0, 40), (200, 255), (90, 110)])
+def test_matches_legacy_on_gradients(luminar, legacy, low, high):
+    check(luminar, legacy, gradient(160, 120, low, high))
+
+
+@pytest.mark.parametrize("shape", [(120, 160, 3), (97, 131, 3), (1, 1, 3)])
+def test_matches_legacy_on_random_frames(luminar, legacy, shape):
+    rng = np.random.default_rng(1)
+    for _ in range(4):
+        check(luminar, legacy, rng.integers(0, 256, shape, dtype=np.uint8))
+
+
+@pytest.mark.parametrize("value", [0, 1, 127, 128, 254, 255])
+def test_matches_legacy_on_flat_frames(luminar, legacy, value):
+    check(luminar, legacy, np.full((48, 64, 3), value, np.uint8))
+
+
+def test_estimator_handles_changing_frame_sizes(luminar, legacy):
+    estimator = luminar.LuminanceEstimator()
+    rng = np.random.default_rng(2)
+    for shape in [(48, 64, 3), (120, 160, 3), (48, 64, 3)]:
+        frame = rng.integers(0, 256, shape, dtype=np.uint8)
+        assert estimator.estimate(frame).ratio == pytest.approx(legacy(frame), abs=TOLERANCE)
@@ -0,0 +1,149 @@
+import json
+import os
+
+import pytest
+
+
+def test_validate_profile_fills_defaults(luminar):
+    assert luminar.validate_profile({"brightness": 70.6}) == \
+        {"brightness": 70, "color_temperature": None, "break_time": 25}
+
+
+@pytest.mark.parametrize("profile", [
+    [],
+    {"brightness": 101},
+    {"brightness": "50"},
+    {"brightness": True},
+    {"color_temperature": 500},
+    {"break_time": 0},
+])
+def test_validate_profile_rejects_bad_fields(luminar, profile):
+    with pytest.raises(ValueError):
+        luminar.validate_profile(profile)
+
+
+@pytest.fixture
+def profiles_path(tmp_path):
+    return str(tmp_path / "profiles.json")
+
+
+def test_edits_are_saved_atomically(luminar, profiles_path):
+    repo = luminar.ProfileRepository(profiles_path, save_delay=60)
+    repo["Work"] = {"brightness": 40}
+    repo["Night"] = {"brightness": 10, "color_temperature": 3000}
+    # Nothing is written until the save delay elapses or flush() is called
+    assert not os.path.exists(profiles_path)
+    repo.flush()
+
+    with open(profiles_path) as file:
+        saved = json.load(file)
+    assert saved["Night"] == {"brightness": 10, "color_temperature": 3000, "break_time": 25}
+    assert [name for name in os.listdir(os.path.dirname(profiles_path)) if name.endswith(".tmp")] == []
+
+    reopened = luminar.ProfileRepository(profiles_path)
+    assert dict(reopened) == dict(repo)
+
+
+def test_rejected_edit_leaves_cache_unchanged(luminar, profiles_path):
+    repo = luminar.ProfileRepository(profiles_path, save_delay=60)
+    repo["Work"] = {"brightness": 40}
+    with pytest.raises(ValueError):
+        repo["Work"] = {"brightness": 400}
+    assert repo["Work"]["brightness"] == 40
+
+
+def test_reload_merges_external_changes(luminar, profiles_path):
+    with open(profiles_path, "w") as file:
+        json.dump({"Work": {"brightness": 40}, "Gone": {"brightness": 5}}, file)
+    repo = luminar.ProfileRepository(profiles_path)
+
+    with open(profiles_path, "w") as file:
+        json.dump({"Work": {"brightness": 60}, "Bad": {"brightness": -1}}, file)
+    os.utime(profiles_path, ns=(0, os.stat(profiles_path).st_mtime_ns + 1))
+    assert repo.reload() == {"Work", "Gone"}
+    assert repo["Work"]["brightness"] == 60
+    assert "Gone" not in repo and "Bad" not in repo
+
+
+def test_validate_profile_normalizes_sampling(luminar):
+    checked = luminar.validate_profile({"sampling": {"mode": "roi", "roi": [0.25, 0, 0.5, 1]}})
+    assert checked["sampling"] == {"mode": "roi", "roi": [0.25, 0.0, 0.5, 1.0]}
+    sampler = luminar.FrameSampler.for_profile(checked)
+    assert (sampler.mode, sampler.roi) == ("roi", [0.25, 0.0, 0.5, 1.0])
+
+
+@pytest.mark.parametrize("sampling", [
+    "stride",
+    {"factor": 2},
+    {"mode": "zoom"},
+    {"mode": "pyramid", "factor": 0},
+    {"mode": "stride", "factor": 2.5},
+    {"mode": "roi"},
+    {"mode": "roi", "roi": [0.5, 0.5, 0.75, 0.25]},
+    {"mode": "roi", "roi": [0, 0, 1]},
+])
+def test_validate_profile_rejects_bad_sampling(luminar, sampling):
+    with pytest.raises(ValueError):
+        luminar.validate_profile({"sampling": sampling})
+
+
+def test_validate_profile_normalizes_smoothing(luminar):
+    checked = luminar.validate_profile({"smoothing": {"method": "kalman", "window": 3.0, "deadband": 2}})
+    assert checked["smoothing"] == {"method": "kalman", "window": 3, "deadband": 2}
+    smoothing = luminar.BrightnessFilter.for_profile(checked)
+    assert (smoothing.method, smoothing.window, smoothing.deadband) == ("kalman", 3, 2)
+    assert luminar.BrightnessFilter.for_profile({}).method == "median"
+
+
+@pytest.mark.parametrize("smoothing", [
+    "ema",
+    {"method": "mean"},
+    {"window": 0},
+    {"alpha": 0},
+    {"deadband": -1},
+    {"deadband": True},
+])
+def test_validate_profile_rejects_bad_smoothing(luminar, smoothing):
+    with pytest.raises(ValueError):
+        luminar.validate_profile({"smoothing": smoothing})
+
+
+def test_validate_profile_normalizes_change_gate(luminar):
+    assert luminar.validate_profile({"change_gate": False})["change_gate"] is False
+    assert "change_gate" not in luminar.validate_profile({"change_gate": True})
+    checked = luminar.validate_profile({"change_gate": {"threshold": 0.05, "max_skips": 10.0}})
+    assert checked["change_gate"] == {"threshold": 0.05, "max_skips": 10}
+
+
+@pytest.mark.parametrize("gate", ["off", 0, {"mode": "flow"}, {"threshold": 2}, {"max_skips": -1}])
+def test_validate_profile_rejects_bad_change_gate(luminar, gate):
+    with pytest.raises(ValueError):
+        luminar.validate_profile({"change_gate": gate})
+
+
+def test_validate_profile_normalizes_transitions(luminar):
+    checked = luminar.validate_profile({"transitions": {"curve": "linear", "brightness": 0}})
+    assert checked["transitions"] == {"curve": "linear", "brightness": 0}
+    assert luminar.TransitionEngine.profile_settings(checked) == {'curve': "linear", 'durations': {'brightness': 0}}
+
+
+@pytest.mark.parametrize("transitions", [
+    "ease",
+    {"curve": "bounce"},
+    {"brightness": -1},
+    {"color_temperature": 3600},
+    {"brightness": "fast"},
+])
+def test_validate_profile_rejects_bad_transitions(luminar, transitions):
+    with pytest.raises(ValueError):
+        luminar.validate_profile({"transitions": transitions})
+
+
+def test_save_keeps_the_file_mode(luminar, profiles_path):
+    with open(profiles_path, "w") as file:
+        json.dump({}, file)
+    os.chmod(profiles_path, 0o644)
+    repo = luminar.ProfileRepository(profiles_path, save_delay=60)
+    repo["Work"] = {"brightness": 40}
+    repo.flush()
+    assert os.stat(profiles_path).st_mode & 0o777 == 0o644
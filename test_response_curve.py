@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+
+
+def legacy(ratio):
+    # The mapping the engine used before curves were configurable
+    return min(max(int(ratio * 255) - 30, 0), 100)
+
+
+def test_default_curve_matches_legacy_mapping(luminar):
+    curve = luminar.ResponseCurve()
+    for ratio in np.linspace(0, 1, 1001):
+        assert curve(ratio) == legacy(ratio)
+
+
+def test_profile_brightness_caps_the_curve(luminar):
+    curve = luminar.ResponseCurve.for_profile({"brightness": 60})
+    assert curve(1.0) == 60
+    assert luminar.ResponseCurve.for_profile({"brightness": 60, "curve": {"max": 80}})(1.0) == 80
+
+
+def test_points_define_a_piecewise_linear_curve(luminar):
+    curve = luminar.ResponseCurve({"points": [[1.0, 90], [0.0, 10], [0.5, 30]]})
+    assert curve(0.0) == 10
+    assert curve(0.5) == 30
+    assert curve(1.0) == 90
+    assert curve(0.25) == pytest.approx(20, abs=1)
+
+
+def test_out_of_range_ratios_are_clamped(luminar):
+    curve = luminar.ResponseCurve({"offset": 0, "min": 5})
+    assert curve(-0.5) == 5
+    assert curve(2.0) == 100
+
+
+def test_lookup_table_is_read_only(luminar):
+    with pytest.raises(ValueError):
+        luminar.ResponseCurve().lut[0] = 1
+
+
+def test_validate_profile_normalizes_curve(luminar):
+    checked = luminar.validate_profile({"curve": {"gamma": 2, "points": [[1, 80], [0, 0]]}})
+    assert checked["curve"] == {"gamma": 2, "points": [[0.0, 0.0], [1.0, 80.0]]}
+
+
+@pytest.mark.parametrize("curve", [
+    "steep",
+    {"gamma": 0},
+    {"min": 70, "max": 20},
+    {"points": [[0.5, 50]]},
+    {"points": [[0.5, 10], [0.5, 50]]},
+    {"points": [[0, 10], [1.5, 50]]},
+    {"points": [[0, "low"], [1, 50]]},
+])
+def test_validate_profile_rejects_bad_curves(luminar, curve):
+    with pytest.raises(ValueError):
+        luminar.validate_profile({"curve": curve})
@@ -0,0 +1,109 @@
+import threading
+import time
+
+import pytest
+
+
+@pytest.fixture
+def scheduler(luminar):
+    scheduler = luminar.Scheduler("test-scheduler")
+    scheduler.start()
+    yield scheduler
+    scheduler.stop()
+
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition() and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+
+def test_job_repeats_after_returned_delay_until_none(scheduler):
+    runs = []
+
+    def job():
+        runs.append(time.monotonic())
+        return 0.02 if len(runs) < 3 else None
+
+    scheduler.add("job", job)
+    assert wait_for(lambda: len(runs) == 3)
+    time.sleep(0.1)
+    assert len(runs) == 3
+
+
+def test_jobs_run_in_deadline_order(scheduler):
+    order = []
+    scheduler.add("late", lambda: order.append("late"), delay=0.1)
+    scheduler.add("early", lambda: order.append("early"), delay=0.02)
+    assert wait_for(lambda: len(order) == 2)
+    assert order == ["early", "late"]
+
+
+def test_add_replaces_a_job_with_the_same_name(scheduler):
+    runs = []
+    scheduler.add("job", lambda: runs.append("first"), delay=0.05)
+    scheduler.add("job", lambda: runs.append("second"), delay=0.05)
+    assert wait_for(lambda: runs)
+    time.sleep(0.1)
+    assert runs == ["second"]
+
+
+def test_cancel_and_stop_drop_pending_jobs(luminar, scheduler):
+    runs = []
+    scheduler.add("cancelled", lambda: runs.append("cancelled"), delay=0.05)
+    scheduler.cancel("cancelled")
+    time.sleep(0.1)
+    assert runs == []
+
+    scheduler.add("stopped", lambda: runs.append("stopped"), delay=0.05)
+    scheduler.stop()
+    time.sleep(0.1)
+    assert runs == []
+
+
+def test_stop_wakes_a_sleeping_worker(luminar):
+    scheduler = luminar.Scheduler("test-scheduler")
+    scheduler.start()
+    scheduler.add("far", lambda: None, delay=3600)
+    scheduler.stop()
+    assert wait_for(lambda: not any(t.name == "test-scheduler" for t in threading.enumerate()))
+
+
+def test_wall_clock_deadlines_survive_suspend(luminar, monkeypatch):
+    # A suspend stops the monotonic clock; fake one by jumping the wall clock ahead
+    scheduler = luminar.Scheduler("test-scheduler")
+    scheduler.WALL_CLOCK_CHECK = 0.05
+    scheduler.start()
+    runs = []
+    scheduler.add("evening", lambda: runs.append("evening"), delay=3600)
+    time.sleep(0.1)
+    assert runs == []
+
+    real_time = time.time
+    monkeypatch.setattr(luminar.time, "time", lambda: real_time() + 3600)
+    assert wait_for(lambda: runs == ["evening"])
+    scheduler.stop()
+
+
+def test_failing_job_is_retried_with_backoff(luminar):
+    scheduler = luminar.Scheduler("test-scheduler")
+    scheduler.FAILURE_RETRY, scheduler.FAILURE_RETRY_MAX = 0.05, 0.1
+    scheduler.start()
+    runs = []
+
+    def flaky():
+        runs.append(time.monotonic())
+        if len(runs) < 4:
+            raise OSError("camera busy")
+        return None
+
+    scheduler.add("flaky", flaky)
+    assert wait_for(lambda: len(runs) == 4)
+    gaps = [later - earlier for earlier, later in zip(runs, runs[1:])]
+    # 0.05, then 0.1, then capped at 0.1
+    assert gaps[0] >= 0.05 and gaps[1] >= 0.1 and gaps[2] >= 0.1
+    assert gaps[2] < 0.5
+    time.sleep(0.2)
+    assert len(runs) == 4  # Done once it stops failing and returns None
+    scheduler.stop()
@@ -0,0 +1,196 @@
+import sqlite3
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+MONDAY = datetime(2026, 1, 5, 9)
+
+
+@pytest.fixture
+def db_path(tmp_path):
+    return tmp_path / "usage.db"
+
+
+@pytest.fixture
+def store(luminar, db_path):
+    store = luminar.SessionStore(str(db_path), batch_window=0.01)
+    yield store
+    store.close()
+
+
+def record(store, start, minutes, profile=None):
+    store.start_session(start, profile)
+    store.stop_session(start + timedelta(minutes=minutes))
+
+
+def test_sessions_are_visible_before_commit(store):
+    index = store.start_session(MONDAY, "Work")
+    assert index == 0 and len(store) == 1
+    assert store[0] == {'start_time': MONDAY, 'end_time': None, 'profile': "Work"}
+    store.stop_session(MONDAY + timedelta(hours=1))
+    assert store[-1]['end_time'] == MONDAY + timedelta(hours=1)
+
+
+def test_sessions_persist_across_reopen(luminar, db_path):
+    store = luminar.SessionStore(str(db_path), batch_window=0.01)
+    for day in range(3):
+        record(store, MONDAY + timedelta(days=day), 30, "Work" if day else None)
+    store.close()
+
+    reopened = luminar.SessionStore(str(db_path))
+    assert len(reopened) == 3
+    assert reopened[0] == {'start_time': MONDAY, 'end_time': MONDAY + timedelta(minutes=30), 'profile': None}
+    assert reopened[2]['profile'] == "Work"
+    with pytest.raises(IndexError):
+        reopened[3]
+    # New sessions continue the id sequence
+    assert reopened.start_session(MONDAY + timedelta(days=5)) == 3
+    reopened.close()
+
+
+def test_between_uses_start_time_range(store):
+    for day in range(7):
+        record(store, MONDAY + timedelta(days=day), 10)
+    sessions = store.between(MONDAY + timedelta(days=2), MONDAY + timedelta(days=4))
+    assert [s['start_time'] for s in sessions] == [MONDAY + timedelta(days=2), MONDAY + timedelta(days=3)]
+
+
+def test_profile_total_counts_completed_sessions(store):
+    record(store, MONDAY, 30, "Work")
+    record(store, MONDAY + timedelta(days=1), 15, "Work")
+    record(store, MONDAY + timedelta(days=1, hours=2), 60, "Game")
+    store.start_session(MONDAY + timedelta(days=2), "Work")  # Still open
+    assert store.profile_total("Work") == pytest.approx(45 * 60)
+    assert store.profile_total("Work", start=MONDAY + timedelta(hours=12)) == pytest.approx(15 * 60)
+    assert store.profile_total(None) == 0
+
+
+def test_aggregates_roll_up_sessions(luminar, store):
+    stats = luminar.UsageAggregates(store)
+    stats.add_session(MONDAY, MONDAY + timedelta(minutes=30), "Work")
+    stats.add_session(MONDAY + timedelta(hours=2), MONDAY + timedelta(hours=3), None)
+    stats.add_session(MONDAY + timedelta(days=2), MONDAY + timedelta(days=2, minutes=3), "Work")
+
+    assert stats.session_count == 3
+    assert stats.total_seconds == pytest.approx(93 * 60)
+    assert stats.average_session() == pytest.approx(31 * 60)
+    assert stats.profiles == {"Work": [33 * 60, 2], None: [60 * 60, 1]}
+
+    dates, seconds, sessions = stats.daily_totals()
+    assert list(dates.astype(str))[:3] == ["2026-01-05", "2026-01-06", "2026-01-07"]
+    assert list(seconds[:3]) == [90 * 60, 0, 3 * 60]
+    assert list(sessions[:3]) == [2, 0, 1]
+
+    edges, counts = stats.length_histogram()
+    # 3 min -> [0, 5), 30 min -> [30, 60), 60 min -> [60, 120)
+    assert counts[0] == 1 and counts[list(edges).index(30)] == 1 and counts[list(edges).index(60)] == 1
+
+
+def test_weekly_totals_start_on_monday(luminar, store):
+    stats = luminar.UsageAggregates(store)
+    stats.add_session(MONDAY + timedelta(days=2), MONDAY + timedelta(days=2, hours=1))
+    stats.add_session(MONDAY + timedelta(days=8), MONDAY + timedelta(days=8, hours=2))
+    starts, totals = stats.weekly_totals()
+    assert list(starts.astype(str)) == ["2026-01-05", "2026-01-12"]
+    assert list(totals) == [3600, 7200]
+
+
+def test_aggregates_reload_from_rollup_tables(luminar, db_path):
+    store = luminar.SessionStore(str(db_path), batch_window=0.01)
+    stats = luminar.UsageAggregates(store)
+    stats.add_session(MONDAY, MONDAY + timedelta(minutes=20), "Work")
+    stats.add_session(MONDAY + timedelta(days=1), MONDAY + timedelta(days=1, minutes=40), "Work")
+    store.close()
+
+    store = luminar.SessionStore(str(db_path))
+    reloaded = luminar.UsageAggregates(store)
+    assert reloaded.session_count == stats.session_count
+    assert reloaded.total_seconds == pytest.approx(stats.total_seconds)
+    assert reloaded.profiles == stats.profiles
+    assert list(reloaded.length_counts) == list(stats.length_counts)
+    store.close()
+
+
+def test_aggregates_backfill_existing_history(luminar, db_path):
+    store = luminar.SessionStore(str(db_path), batch_window=0.01)
+    record(store, MONDAY, 45, "Work")
+    record(store, MONDAY + timedelta(days=1), 15)
+    store.start_session(MONDAY + timedelta(days=2))  # Open sessions are not counted
+    stats = luminar.UsageAggregates(store)
+    assert stats.session_count == 2
+    assert stats.total_seconds == pytest.approx(60 * 60)
+    assert stats.profiles == {"Work": [45 * 60, 1], None: [15 * 60, 1]}
+    store.close()
+
+
+def test_flush_does_not_wait_for_the_batch_window(luminar, db_path):
+    store = luminar.SessionStore(str(db_path), batch_window=5)
+    store.start_session(MONDAY)
+    started = time.monotonic()
+    store.flush()
+    assert time.monotonic() - started < 1
+    reader = luminar.SessionStore(str(db_path))
+    assert reader[0]['start_time'] == MONDAY
+    reader.close()
+    store.close()
+
+
+def test_daily_totals_end_at_the_last_day_with_usage(luminar, store):
+    stats = luminar.UsageAggregates(store)
+    for day in (0, 3, 5):
+        stats.add_session(MONDAY + timedelta(days=day), MONDAY + timedelta(days=day, minutes=10))
+    dates, seconds, sessions = stats.daily_totals()
+    assert len(dates) == len(seconds) == len(sessions) == 6
+    assert str(dates[-1]) == "2026-01-10"
+    assert sessions.sum() == 3
+
+
+def test_first_stop_is_counted_once(luminar, db_path, monkeypatch):
+    # The rollups are created lazily; their backfill must not see the session being closed
+    monkeypatch.setattr(luminar, "usage_logs", None)
+    monkeypatch.setattr(luminar, "usage_stats", None)
+    logs = luminar.open_usage_logs(str(db_path))
+    luminar.log_session_start("Work")
+    luminar.log_session_stop()
+    assert luminar.load_usage_stats().session_count == 1
+    logs.close()
+
+    reopened = luminar.SessionStore(str(db_path))
+    assert luminar.UsageAggregates(reopened).session_count == 1
+    reopened.close()
+
+
+def test_orphaned_session_ends_at_its_last_heartbeat(luminar, db_path, monkeypatch):
+    store = luminar.SessionStore(str(db_path), batch_window=0.01)
+    store.start_session(MONDAY, "Work")
+    store.touch(MONDAY + timedelta(minutes=20))
+    store.flush()  # The process dies here without stopping the session
+
+    monkeypatch.setattr(luminar, "usage_logs", None)
+    monkeypatch.setattr(luminar, "usage_stats", None)
+    logs = luminar.open_usage_logs(str(db_path))
+    assert logs[-1]['end_time'] == MONDAY + timedelta(minutes=20)
+    assert luminar.load_usage_stats().total_seconds == pytest.approx(20 * 60)
+    logs.close()
+    store.close()
+
+
+def test_orphan_without_heartbeat_counts_as_empty(luminar, store):
+    store.start_session(MONDAY)
+    assert store.close_orphan()['end_time'] == MONDAY
+    assert store.close_orphan() is None
+
+
+def test_old_history_gains_the_heartbeat_column(luminar, db_path):
+    connection = sqlite3.connect(str(db_path))
+    with connection:
+        connection.execute("CREATE TABLE sessions (id INTEGER PRIMARY KEY, start_time REAL NOT NULL, "
+                           "end_time REAL, profile TEXT)")
+        connection.execute("INSERT INTO sessions VALUES (1, ?, NULL, NULL)", (MONDAY.timestamp(),))
+    connection.close()
+
+    store = luminar.SessionStore(str(db_path), batch_window=0.01)
+    store.touch(MONDAY + timedelta(minutes=5))
+    assert store.close_orphan()['end_time'] == MONDAY + timedelta(minutes=5)
+    store.close()
@@ -0,0 +1,18 @@
+import time
+
+
+def test_report_records_the_budget_verdict(luminar, capsys):
+    profiler = luminar.StartupProfiler(time.perf_counter())
+    assert profiler.within_budget is None  # Readable before any report, e.g. when closed early
+    profiler.mark("tk root")
+    assert profiler.report([("numpy", 0.2)]) is True
+    assert profiler.within_budget is True
+    output = capsys.readouterr().out
+    assert "tk root" in output and "warm-up: numpy" in output
+
+
+def test_report_flags_a_slow_window(luminar, capsys):
+    profiler = luminar.StartupProfiler(time.perf_counter() - 2 * luminar.STARTUP_BUDGET)
+    profiler.mark("first draw")
+    assert profiler.report() is False
+    assert "OVER BUDGET" in capsys.readouterr().out